@@ -1,12 +1,18 @@
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, g, render_template, request, jsonify
+import hmac
 import logging
+import os
 import sys
-from rag_profiles import RAGQueryEngine
+import snapshots
+from facets import FACETS
+import rag_profiles
+from rag_profiles import RAGQueryEngine, SIMILAR_K, SNAPSHOTS_DIR
+from sessions import SESSION_ID_PATTERN, new_session_id
+from structured_logging import REQUEST_ID_PATTERN, configure_logging, new_request_id, request_id_var
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                   stream=sys.stdout)
+# Configure logging: console and JSON log file, written by a background thread
+configure_logging(rag_profiles.LOG_PATH, rag_profiles.LOG_LEVEL, rag_profiles.LOG_MAX_MB * 2**20,
+                  rag_profiles.LOG_BACKUP_COUNT, rag_profiles.LOG_MAX_FIELD_CHARS, rag_profiles.LOG_SAMPLE_RATES)
 logger = logging.getLogger(__name__)
 
 # Initialize Flask app and RAG engine
@@ -19,6 +25,32 @@ except Exception as e:
     logger.error(f"Failed to initialize RAG Query Engine: {str(e)}")
     sys.exit(1)
 
+@app.before_request
+def start_snapshot_watcher():
+    # Idempotent; starts the watcher once in every (forked) serving process
+    rag_engine.start_snapshot_watcher()
+
+@app.before_request
+def set_request_id():
+    # Every log record of the request carries its ID; a valid X-Request-ID from a proxy is kept
+    request_id = request.headers.get('X-Request-ID', '')
+    g.request_id_token = request_id_var.set(request_id if REQUEST_ID_PATTERN.match(request_id) else new_request_id())
+
+@app.after_request
+def add_request_id(response):
+    response.headers['X-Request-ID'] = request_id_var.get()
+    return response
+
+@app.teardown_request
+def reset_request_id(exc):
+    if 'request_id_token' in g:
+        request_id_var.reset(g.request_id_token)
+
+def is_admin():
+    # Admin requests need the X-Admin-Token header; they are disabled unless RAG_ADMIN_TOKEN is set
+    admin_token = os.environ.get('RAG_ADMIN_TOKEN')
+    return bool(admin_token) and hmac.compare_digest(request.headers.get('X-Admin-Token', ''), admin_token)
+
 @app.route('/')
 def home():
     return render_template('index.html')
@@ -26,18 +58,95 @@ def home():
 @app.route('/ask', methods=['POST'])
 def ask():
     try:
-        question = request.json['question']
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({'response': "The request body must be a JSON object"}), 400
+        question = body.get('question')
+        if not isinstance(question, str) or not question.strip():
+            return jsonify({'response': "Invalid question"}), 400
+        # Questions with the same session_id form a conversation; a new one is started without it
+        session_id = body.get('session_id') or new_session_id()
+        if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+            return jsonify({'response': "Invalid session_id"}), 400
         logger.info(f"Received question: {question}")
         
+        # Profile on request with an X-Profile: 1 header or ?profile=1; profiles are written on the
+        # server, so only admins may ask for them
+        if request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1':
+            if not is_admin():
+                return jsonify({'error': 'forbidden'}), 403
+            response, profile = rag_engine.profile_query(question, session_id)
+            logger.info(f"Generated response successfully (profile {profile['id']}, {profile['total_ms']:.0f} ms)")
+            return jsonify({'response': response, 'session_id': session_id, 'profile': profile})
+
         # Get response from RAG engine
-        response = rag_engine.query(question)
+        response = rag_engine.query(question, session_id=session_id)
         logger.info("Generated response successfully")
         
-        return jsonify({'response': response})
+        return jsonify({'response': response, 'session_id': session_id})
     except Exception as e:
         logger.error(f"Error processing request: {str(e)}")
         return jsonify({'response': f"An error occurred: {str(e)}"}), 500
 
+@app.route('/facets/search')
+def facet_search():
+    # e.g. /facets/search?keyword=proteomics&faculty=faculty of sciences; prefix=1 matches term prefixes
+    prefix = request.args.get('prefix') == '1'
+    filters = [(facet, text, prefix) for facet in FACETS for text in request.args.getlist(facet)]
+    if not filters:
+        return jsonify({'error': f"no facet given; use one or more of {', '.join(FACETS)}"}), 400
+    researchers = rag_engine.facet_search(filters)
+    return jsonify({'count': len(researchers), 'researchers': researchers})
+
+@app.route('/facets/terms')
+def facet_terms():
+    facet = request.args.get('facet', '')
+    if facet not in FACETS:
+        return jsonify({'error': f"unknown facet: {facet}"}), 400
+    prefix = request.args.get('prefix', '')
+    limit = request.args.get('limit', 20, type=int)
+    return jsonify({'facet': facet, 'terms': rag_engine.facet_terms(facet, prefix, limit)})
+
+@app.route('/similar')
+def similar():
+    # Answered from the precomputed similarity graph, without an LLM call
+    researcher = request.args.get('researcher', '')
+    k = request.args.get('k', SIMILAR_K, type=int)
+    try:
+        return jsonify({'researcher': researcher, 'similar': rag_engine.similar_researchers(researcher, k)})
+    except KeyError:
+        return jsonify({'error': f"unknown researcher: {researcher}"}), 404
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 503
+
+@app.route('/admin/snapshots/activate', methods=['POST'])
+def activate_snapshot():
+    if not is_admin():
+        return jsonify({'error': 'forbidden'}), 403
+    try:
+        body = request.get_json(silent=True)
+        if body is not None and not isinstance(body, dict):
+            return jsonify({'error': 'the request body must be a JSON object'}), 400
+        version = (body or {}).get('version') or snapshots.current_version(SNAPSHOTS_DIR)
+        if version is not None and not isinstance(version, str):
+            return jsonify({'error': 'invalid version'}), 400
+        if version is None:
+            return jsonify({'error': 'no snapshot to activate'}), 400
+        previous = rag_engine.index.version
+        # Other worker processes pick the new version up through their watcher
+        snapshots.activate(SNAPSHOTS_DIR, version)
+        rag_engine.swap_index(version)
+        logger.info(f"Swapped index snapshot {previous} -> {version}")
+        return jsonify({'version': version, 'previous': previous})
+    except Exception as e:
+        logger.error(f"Error activating snapshot: {str(e)}")
+        return jsonify({'error': str(e)}), 400
+
+@app.route('/metrics')
+def metrics():
+    # Metrics are per process; under serve.py each worker reports its own
+    return jsonify({'pid': os.getpid(), **rag_engine.metrics()})
+
 if __name__ == '__main__':
     try:
         logger.info("Starting Flask application...")
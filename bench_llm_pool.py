@@ -0,0 +1,272 @@
+"""Benchmark and failure drill of the LLM pool against stand-in Ollama servers.
+
+Every endpoint is a local HTTP server imitating the Ollama API: /api/tags
+lists its models and /api/chat streams a fixed answer after a set latency.
+Like Ollama, it handles a limited number of requests at a time
+(OLLAMA_NUM_PARALLEL); the others queue. Calls go through the same chains as
+RAGQueryEngine: prompt | pool | output parser.
+
+Scenarios:
+  - scaling: throughput and latency of concurrent calls over 1, 2 and 4 endpoints
+  - uneven: how calls are spread over a slow endpoint and two fast ones
+  - failover: one endpoint goes down and another returns errors mid-run; it
+    counts failed calls, circuit breaker trips and recovery
+  - grader routing: grading on a small model on its own endpoint, generation on the others
+
+Usage:
+    python bench_llm_pool.py [--calls 200] [--concurrency 16] [--latency-ms 50]
+"""
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from langchain.prompts import PromptTemplate
+from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
+
+from llm_pool import CLOSED, LLMPool
+
+GRADER_PROMPT = PromptTemplate(
+    template="Is this researcher profile relevant? Return the binary score as a JSON with a single key 'score'.\n"
+             "{document}\nQuestion: {question}",
+    input_variables=["question", "document"]
+)
+GENERATION_PROMPT = PromptTemplate(template="Question: {question}\nContext: {context}\nAnswer:",
+                                   input_variables=["question", "context"])
+
+
+class StandInOllama:
+    """Local HTTP server imitating the Ollama API (/api/tags and streaming /api/chat)."""
+
+    def __init__(self, models, latency=0.05, parallel=1):
+        self.models = models
+        self.latency = latency
+        self.parallel = parallel
+        self.failing = False
+        self.stopped = False
+        # When set to a threading.Event, calls are held until it is set
+        self.gate = None
+        self.calls = Counter()
+        self.server = None
+        self.port = 0
+        self.up()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+    def _handler(self):
+        stand_in = self
+        slots = threading.Semaphore(self.parallel)
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body):
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def handle_one_request(self):
+                # A stopped server also drops its kept-alive connections
+                if stand_in.stopped:
+                    self.close_connection = True
+                    return
+                super().handle_one_request()
+
+            def do_GET(self):
+                if self.path != "/api/tags":
+                    return self._send_json(404, {"error": "not found"})
+                self._send_json(200, {"models": [{"name": f"{model}:latest", "model": f"{model}:latest"}
+                                                 for model in stand_in.models]})
+
+            def do_POST(self):
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                model = request.get("model", "").removesuffix(":latest")
+                if self.path != "/api/chat":
+                    return self._send_json(404, {"error": "not found"})
+                if stand_in.failing:
+                    return self._send_json(500, {"error": "stand-in failure"})
+                if model not in stand_in.models:
+                    return self._send_json(404, {"error": f"model '{model}' not found"})
+                if stand_in.gate is not None:
+                    stand_in.gate.wait()
+                with slots:
+                    time.sleep(stand_in.latency)
+                stand_in.calls[model] += 1
+                prompt = request["messages"][-1]["content"]
+                content = '{"score": "yes"}' if "'score'" in prompt else f"Stand-in answer from {model}"
+                chunks = [
+                    {"model": model, "created_at": "", "message": {"role": "assistant", "content": content}, "done": False},
+                    {"model": model, "created_at": "", "message": {"role": "assistant", "content": ""}, "done": True,
+                     "done_reason": "stop", "prompt_eval_count": len(prompt.split()), "eval_count": len(content.split())},
+                ]
+                data = b"".join(json.dumps(chunk).encode("utf-8") + b"\n" for chunk in chunks)
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+    def up(self):
+        """Start serving (again, on the same port)."""
+        self.stopped = False
+        self.server = ThreadingHTTPServer(("127.0.0.1", self.port), self._handler())
+        self.server.daemon_threads = True
+        self.port = self.server.server_address[1]
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def down(self):
+        """Stop serving; connections are refused or dropped."""
+        self.stopped = True
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def make_pool(servers, model, **kwargs):
+    settings = {"failure_threshold": 3, "reset_seconds": 1.0, "health_interval": 0.5, "timeout": 10}
+    return LLMPool([server.url for server in servers], model, **{**settings, **kwargs})
+
+
+def run_calls(call, count, concurrency):
+    """Latencies (ms) of the successful calls and the number of failed ones."""
+    def timed(i):
+        started = time.perf_counter()
+        try:
+            call(i)
+        except Exception:
+            return None
+        return 1000 * (time.perf_counter() - started)
+
+    with ThreadPoolExecutor(concurrency) as executor:
+        results = list(executor.map(timed, range(count)))
+    latencies = np.array([result for result in results if result is not None])
+    return latencies, results.count(None)
+
+
+def generation_call(pool):
+    chain = GENERATION_PROMPT | pool | StrOutputParser()
+    return lambda i: chain.invoke({"question": f"Who works on topic {i}?", "context": "Name: A researcher"})
+
+
+def endpoint_calls(pool):
+    return " / ".join(str(endpoint["calls"] - endpoint["failures"]) for endpoint in pool.stats()["endpoints"])
+
+
+def scaling(args):
+    print(f"Scaling: {args.calls} calls from {args.concurrency} threads, {args.latency_ms:.0f} ms per call, "
+          f"1 call at a time per endpoint")
+    print(f"{'endpoints':>10}{'calls/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'failed':>8}  calls per endpoint")
+    for count in (1, 2, 4):
+        servers = [StandInOllama(["llama3"], args.latency_ms / 1000) for _ in range(count)]
+        pool = make_pool(servers, "llama3")
+        started = time.perf_counter()
+        latencies, failed = run_calls(generation_call(pool), args.calls, args.concurrency)
+        rate = len(latencies) / (time.perf_counter() - started)
+        print(f"{count:>10}{rate:>9.1f}{np.percentile(latencies, 50):>9.1f}{np.percentile(latencies, 95):>9.1f}"
+              f"{failed:>8}  {endpoint_calls(pool)}")
+        for server in servers:
+            server.down()
+
+
+def uneven(args):
+    latencies_ms = (args.latency_ms, args.latency_ms, 4 * args.latency_ms)
+    servers = [StandInOllama(["llama3"], latency / 1000) for latency in latencies_ms]
+    pool = make_pool(servers, "llama3")
+    latencies, failed = run_calls(generation_call(pool), args.calls, args.concurrency)
+    print(f"\nUneven: endpoints of {' / '.join(f'{latency:.0f}' for latency in latencies_ms)} ms per call")
+    print(f"  calls per endpoint: {endpoint_calls(pool)}, p50 {np.percentile(latencies, 50):.1f} ms, "
+          f"p95 {np.percentile(latencies, 95):.1f} ms, {failed} failed")
+    for server in servers:
+        server.down()
+
+
+def failover(args):
+    servers = [StandInOllama(["llama3"], args.latency_ms / 1000) for _ in range(3)]
+    pool = make_pool(servers, "llama3")
+    call = generation_call(pool)
+
+    def drill():
+        time.sleep(0.2)
+        servers[1].down()
+        servers[2].failing = True
+        time.sleep(1.0)
+        servers[2].failing = False
+
+    threading.Thread(target=drill, daemon=True).start()
+    latencies, failed = run_calls(call, args.calls, args.concurrency)
+    print("\nFailover: endpoint 2 goes down and endpoint 3 returns errors for 1 s, 0.2 s into the run")
+    print(f"  {len(latencies)} calls answered, {failed} failed, calls per endpoint {endpoint_calls(pool)}")
+    for i, endpoint in enumerate(pool.stats()["endpoints"], 1):
+        print(f"  endpoint {i}: {endpoint['failures']} failed attempts (retried elsewhere), "
+              f"breaker opened {endpoint['breaker_opened']}x, now {endpoint['breaker']}, "
+              f"{'healthy' if endpoint['healthy'] else 'unhealthy'}")
+
+    servers[1].up()
+    started = time.monotonic()
+    while time.monotonic() - started < 10:
+        run_calls(call, args.concurrency, args.concurrency)
+        endpoints = pool.stats()["endpoints"]
+        if all(endpoint["healthy"] and endpoint["breaker"] == CLOSED for endpoint in endpoints):
+            break
+        time.sleep(0.2)
+    print(f"  after endpoint 2 is back: all breakers closed and endpoints healthy within "
+          f"{time.monotonic() - started:.1f} s")
+    for server in servers:
+        server.down()
+
+
+def grader_routing(args):
+    generation_servers = [StandInOllama(["llama3"], args.latency_ms / 1000) for _ in range(2)]
+    grader_server = StandInOllama(["llama3.2:1b"], args.latency_ms / 4000, parallel=4)
+    generation_pool = make_pool(generation_servers, "llama3")
+    grader_pool = make_pool([grader_server], "llama3.2:1b")
+    grader = GRADER_PROMPT | grader_pool | JsonOutputParser()
+    generate = generation_call(generation_pool)
+
+    def query(i):
+        # Like a query: grade RETRIEVAL_K profiles, then generate from the relevant ones
+        for k in range(10):
+            assert grader.invoke({"question": f"topic {i}", "document": f"profile {k}"})["score"] == "yes"
+        generate(i)
+
+    latencies, failed = run_calls(query, args.calls // 10, args.concurrency)
+    print("\nGrader routing: 10 grades on llama3.2:1b and 1 generation on llama3 per query")
+    for name, server in [("generation 1", generation_servers[0]), ("generation 2", generation_servers[1]),
+                         ("grader", grader_server)]:
+        print(f"  {name:<13} served {dict(server.calls)}")
+    print(f"  query p50 {np.percentile(latencies, 50):.1f} ms, {failed} failed")
+    for server in generation_servers + [grader_server]:
+        server.down()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LLM pool against stand-in Ollama servers")
+    parser.add_argument("--calls", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency-ms", type=float, default=50, help="time a stand-in server takes per call")
+    args = parser.parse_args()
+    # The failover drill fails calls on purpose
+    logging.getLogger("llm_pool").setLevel(logging.ERROR)
+
+    scaling(args)
+    uneven(args)
+    failover(args)
+    grader_routing(args)
+
+
+if __name__ == "__main__":
+    main()
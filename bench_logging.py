@@ -0,0 +1,161 @@
+"""Request-latency overhead of logging, synchronous and asynchronous.
+
+Simulated requests log the same records as a query through RAGQueryEngine:
+the question, the retrieved profiles, one record per graded profile (with
+the full profile text), the generated response and the total time. The
+profiles are real ones from the corpus. Between the records, a request
+sleeps to stand in for retrieval, grading and generation. Requests run on
+several threads, like the threaded web server.
+
+Logging modes:
+  - off: no handler, the records are discarded by level
+  - sync text: a FileHandler with the old text format and full payloads,
+    written on the request thread (like the old rag_operations.log)
+  - sync json: a FileHandler with the JSON formatter, on the request thread
+  - async json: structured_logging.configure_logging, which truncates,
+    samples and writes on a background thread
+
+Usage:
+    python bench_logging.py [--requests 2000] [--threads 8] [--work-ms 1]
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+import rag_profiles
+import structured_logging
+from corpora import load_profiles
+
+logger = logging.getLogger("rag_profiles")
+
+
+def simulated_request(question, documents, response, work_seconds):
+    """Log the records of one query, sleeping between them as the query's work."""
+    with structured_logging.request_context():
+        logger.info("Processing question", extra={"event": "query_started", "question": question, "session_id": None})
+        time.sleep(work_seconds)
+        logger.info(f"Retrieved {len(documents)} profiles",
+                    extra={"event": "documents_retrieved", "profile_ids": [pid for pid, _ in documents]})
+        for i, (pid, text) in enumerate(documents):
+            time.sleep(work_seconds)
+            if structured_logging.sampled("document_graded"):
+                logger.info("Graded profile", extra={"event": "document_graded", "profile_id": pid,
+                                                     "relevant": i % 3 == 0, "cached": False, "document": text})
+        logger.info(f"Found {len(documents) // 3} relevant profiles out of {len(documents)}",
+                    extra={"event": "documents_graded"})
+        time.sleep(work_seconds)
+        logger.info(f"Generated a response from {len(documents) // 3} profiles",
+                    extra={"event": "response_generated", "cached": False, "response": response, "generation_ms": 0.0})
+        logger.info("Answered by generate", extra={"event": "query_finished", "node": "generate", "total_ms": 0.0})
+
+
+def run(requests, threads, documents, response, work_seconds):
+    """Latency of every request in milliseconds, and the wall time of the run."""
+    latencies = []
+    lock = threading.Lock()
+    per_thread = requests // threads
+
+    def worker(offset):
+        mine = []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            simulated_request(f"Who works on topic {offset + i}?", documents, response, work_seconds)
+            mine.append(1000 * (time.perf_counter() - start))
+        with lock:
+            latencies.extend(mine)
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(t * per_thread,)) for t in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return np.array(latencies), time.perf_counter() - started
+
+
+def reset_logging():
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+        handler.close()
+    root.setLevel(logging.WARNING)
+
+
+def configure(mode, path):
+    reset_logging()
+    root = logging.getLogger()
+    if mode == "off":
+        return None
+    root.setLevel(logging.INFO)
+    if mode == "async json":
+        return structured_logging.configure_logging(path, "INFO", rag_profiles.LOG_MAX_MB * 2**20,
+                                                    rag_profiles.LOG_BACKUP_COUNT, rag_profiles.LOG_MAX_FIELD_CHARS,
+                                                    rag_profiles.LOG_SAMPLE_RATES, console=False)
+    handler = logging.FileHandler(path, encoding="utf-8")
+    if mode == "sync text":
+        handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+        # The old log wrote the payloads into the message itself
+        handler.addFilter(lambda record: setattr(record, "msg", f"{record.msg}: "
+                                                 f"{getattr(record, 'document', '') or getattr(record, 'response', '')}") or True)
+    else:
+        handler.setFormatter(structured_logging.JsonFormatter(rag_profiles.LOG_MAX_FIELD_CHARS))
+        handler.addFilter(structured_logging.RequestContextFilter())
+    root.addHandler(handler)
+    return handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the request-latency overhead of logging")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--work-ms", type=float, default=1.0, help="simulated work between the records of a request")
+    parser.add_argument("--json", default="researchers.json", help="profiles to log (ai_ugent schema)")
+    args = parser.parse_args()
+
+    profiles = load_profiles(args.json, "ai_ugent")
+    documents = [(rag_profiles.profile_id(profile), rag_profiles.format_profile(profile))
+                 for profile in profiles[:rag_profiles.RETRIEVAL_K]]
+    response = "\n".join(text[:400] for _, text in documents)
+    work_seconds = args.work_ms / 1000
+    print(f"{args.requests} requests on {args.threads} threads, {len(documents)} graded profiles "
+          f"({sum(len(text) for _, text in documents) / len(documents):.0f} chars each), {args.work_ms} ms work per step\n")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_logging_")
+    try:
+        rows = []
+        for mode in ("off", "sync text", "sync json", "async json"):
+            path = os.path.join(work_dir, mode.replace(" ", "_") + ".log")
+            handler = configure(mode, path)
+            latencies, wall = run(args.requests, args.threads, documents, response, work_seconds)
+            drain_started = time.perf_counter()
+            if handler is not None:
+                handler.flush()
+            drain = time.perf_counter() - drain_started
+            dropped = handler.stats()["dropped"] if isinstance(handler, structured_logging.AsyncHandler) else 0
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            rows.append((mode, latencies, wall, drain, size, dropped))
+            reset_logging()
+
+        baseline = np.mean(rows[0][1])
+        print(f"{'mode':<12}{'mean ms':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'overhead ms':>12}"
+              f"{'req/s':>8}{'drain s':>9}{'log KiB/req':>13}{'dropped':>9}")
+        for mode, latencies, wall, drain, size, dropped in rows:
+            print(f"{mode:<12}{np.mean(latencies):>9.3f}{np.percentile(latencies, 50):>9.3f}"
+                  f"{np.percentile(latencies, 95):>9.3f}{np.percentile(latencies, 99):>9.3f}"
+                  f"{np.mean(latencies) - baseline:>12.3f}{len(latencies) / wall:>8.0f}{drain:>9.2f}"
+                  f"{size / 1024 / len(latencies):>13.2f}{dropped:>9}")
+        print("\nOverhead is the mean request latency minus that with logging off. Drain is the time the "
+              "background writer needed after the last request to write out its queue.")
+    finally:
+        reset_logging()
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Benchmark quantized retrieval against the Chroma index.
+
+For a set of query vectors, the script compares:
+  - an exact full-precision scan, which gives the true top-k,
+  - the Chroma collection (the current index),
+  - int8 and binary quantized stores with full-precision rescoring.
+
+It reports the memory held for search, the query latency (p50/p95) and
+recall@k against the exact top-k. Queries are document embeddings with noise
+added, standing in for questions close to some documents.
+
+Usage:
+    python bench_quantized.py [--version VERSION]             # the current index
+    python bench_quantized.py --synthetic 50000 --dim 384     # generated clustered embeddings
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+import numpy as np
+
+from quantized_store import MODES, RESCORE_FACTOR, QuantizedVectorStore, export_collection, normalize_rows
+
+
+def synthetic_collection(client, count, dim, seed=0, batch_size=5000):
+    """A Chroma collection of clustered, normalized embeddings (topics with spread)."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(count // 50, 1), dim))
+    collection = client.create_collection("synthetic", metadata={"hnsw:space": "cosine"})
+    for start in range(0, count, batch_size):
+        n = min(batch_size, count - start)
+        vectors = centers[rng.integers(0, len(centers), n)] + 0.6 * rng.normal(size=(n, dim))
+        collection.add(
+            ids=[f"doc-{i}" for i in range(start, start + n)],
+            embeddings=normalize_rows(vectors).tolist(),
+            documents=[f"document {i}" for i in range(start, start + n)],
+            metadatas=[{"profile_id": f"profile-{i // 5}"} for i in range(start, start + n)],
+        )
+    return collection
+
+
+def make_queries(vectors, count, noise, seed=1):
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(0, len(vectors), count)]
+    return normalize_rows(picked + noise * rng.normal(size=picked.shape) / np.sqrt(vectors.shape[1]))
+
+
+def timed(search, queries):
+    """Results and per-query latencies in milliseconds."""
+    results, latencies = [], []
+    for query in queries:
+        start = time.perf_counter()
+        results.append(search(query))
+        latencies.append(1000 * (time.perf_counter() - start))
+    return results, np.array(latencies)
+
+
+def recall(results, truth):
+    return float(np.mean([len(set(result) & set(expected)) / len(expected) for result, expected in zip(results, truth)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark quantized retrieval against the Chroma index")
+    parser.add_argument("--version", help="snapshot version (default: the active snapshot, or EMBEDDINGS_DIR)")
+    parser.add_argument("--synthetic", type=int, default=0, metavar="N", help="benchmark N generated embeddings instead")
+    parser.add_argument("--dim", type=int, default=384, help="dimension of generated embeddings")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=60, help="results per query (CHUNK_FETCH_K by default)")
+    parser.add_argument("--noise", type=float, default=0.5, help="query noise relative to a document embedding")
+    parser.add_argument("--rescore", default=None,
+                        help="comma-separated rescore factors to try (default: the mode's RESCORE_FACTOR)")
+    args = parser.parse_args()
+
+    import chromadb
+
+    work_dir = tempfile.mkdtemp(prefix="bench_quantized_")
+    try:
+        if args.synthetic:
+            client = chromadb.PersistentClient(path=os.path.join(work_dir, "chroma"))
+            print(f"Adding {args.synthetic} generated embeddings to a Chroma collection...")
+            collection = synthetic_collection(client, args.synthetic, args.dim)
+        else:
+            import rag_profiles
+            _, chroma_dir, collection_name = rag_profiles.index_location(args.version)
+            collection = chromadb.PersistentClient(path=chroma_dir).get_collection(collection_name)
+
+        stores = {}
+        for mode in MODES:
+            export_collection(collection, os.path.join(work_dir, mode), mode)
+            stores[mode] = QuantizedVectorStore(os.path.join(work_dir, mode))
+        # Every store holds the same documents in the same order
+        ids = [document[0] for document in stores["int8"].documents]
+        positions = {doc_id: i for i, doc_id in enumerate(ids)}
+        vectors = np.array(stores["int8"].vectors)
+        k = min(args.k, len(ids))
+        queries = make_queries(vectors, args.queries, args.noise)
+        full_bytes = vectors.nbytes
+        print(f"{len(ids)} documents of dimension {vectors.shape[1]}, {len(queries)} queries, k={k}\n")
+
+        rows = []
+        exact, latencies = timed(lambda q: np.argsort(-(vectors @ q), kind="stable")[:k], queries)
+        truth = [list(result) for result in exact]
+        rows.append(("exact float32 scan", full_bytes, latencies, 1.0))
+
+        def chroma_search(query):
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            return [positions[doc_id] for doc_id in result["ids"][0]]
+        results, latencies = timed(chroma_search, queries)
+        rows.append(("chroma (current index)", full_bytes, latencies, recall(results, truth)))
+
+        for mode, store in stores.items():
+            factors = [int(f) for f in args.rescore.split(",")] if args.rescore else [RESCORE_FACTOR[mode]]
+            for factor in factors:
+                results, latencies = timed(lambda q: store.search(q, k, factor)[0], queries)
+                rows.append((f"{mode} + rescore x{factor}", store.memory_bytes(), latencies, recall(results, truth)))
+
+        print(f"{'backend':<26}{'memory MiB':>11}{'vs float32':>11}{'p50 ms':>9}{'p95 ms':>9}{f'recall@{k}':>11}")
+        for name, memory, latencies, hit_rate in rows:
+            print(f"{name:<26}{memory / 2**20:>11.2f}{full_bytes / memory:>10.1f}x"
+                  f"{np.percentile(latencies, 50):>9.2f}{np.percentile(latencies, 95):>9.2f}{hit_rate:>11.3f}")
+        print("\nMemory is what a search keeps in RAM for its vectors, plus document offsets for the quantized "
+              "stores. These read the rescored candidates from the memory-mapped float32 file on disk, and Chroma adds its HNSW graph on top.")
+        for store in stores.values():
+            store.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
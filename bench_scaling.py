@@ -0,0 +1,279 @@
+"""Scaling benchmark of loading, indexing and retrieval over synthetic corpora.
+
+For every corpus size, synthetic profiles are generated (see
+synthetic_corpus.py) and a separate process measures:
+  - loading: load_documents_from_json and load_index_documents (profiles and chunks),
+  - indexing: build_index into a Chroma collection, in documents per second,
+  - every retriever backend (chroma, int8, binary): the time to open or
+    export it, its size on disk, the memory a search keeps, and the latency
+    of ProfileIndex.retrieve (the first, cold query and p50/p95 after it),
+  - the resident memory of the process after each stage.
+
+Embeddings come from a hashing stand-in (tokens hashed into a fixed number of
+dimensions), so the numbers show the cost of everything except the embedding
+model. Every size runs in its own process, so memory is not carried over and
+a size that runs out of memory or time is reported as failing at that stage.
+
+Usage:
+    python bench_scaling.py [--sizes 10k,100k,1M] [--queries 100] [--timeout SECONDS] [--work-dir DIR] [--keep]
+"""
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+import zlib
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from synthetic_corpus import write_corpus
+
+STAND_IN_DIM = 384
+BACKENDS = ("chroma", "int8", "binary")
+STAGES = ("start", "load_documents", "load_index_documents", "build_index") + BACKENDS
+QUESTION_TEMPLATES = ["Who works on {}?", "Which researchers have expertise in {}?", "Find experts in {}"]
+
+
+class HashingEmbeddings(Embeddings):
+    """Stand-in embedding model: signed token hashes summed into a normalized vector."""
+
+    def __init__(self, dim=STAND_IN_DIM):
+        self.dim = dim
+
+    def _embed(self, text):
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for token in text.lower().split():
+            digest = zlib.crc32(token.encode("utf-8"))
+            vector[digest % self.dim] += 1.0 if digest & 0x80000000 else -1.0
+        norm = np.linalg.norm(vector)
+        return (vector / norm if norm else vector).tolist()
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+
+# build_index's embedding_factory; module-level so that worker processes can unpickle it
+def stand_in_embeddings(n_threads):
+    return HashingEmbeddings()
+
+
+def parse_size(text):
+    """10000, 10k or 1M."""
+    text = text.strip().lower()
+    multiplier = {"k": 1000, "m": 1000000}.get(text[-1:], 1)
+    return int(float(text.rstrip("km")) * multiplier)
+
+
+def format_size(count):
+    if count >= 1000000 and count % 1000000 == 0:
+        return f"{count // 1000000}M"
+    if count >= 1000 and count % 1000 == 0:
+        return f"{count // 1000}k"
+    return str(count)
+
+
+def directory_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def rss_mib():
+    """Resident memory of this process."""
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def peak_rss_mib():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def make_questions(profiles, count, seed=0):
+    """Questions about the expertise of random profiles."""
+    rng = random.Random(seed)
+    keywords = [keyword for profile in rng.sample(profiles, min(len(profiles), count * 5))
+                for keyword in profile.get("expertise") or profile.get("keywords") or []]
+    return [rng.choice(QUESTION_TEMPLATES).format(rng.choice(keywords)) for _ in range(count)]
+
+
+def time_queries(index, questions):
+    """Latency of the first (cold) query and of the others, in milliseconds."""
+    latencies = []
+    for question in questions:
+        start = time.perf_counter()
+        index.retrieve(question)
+        latencies.append(1000 * (time.perf_counter() - start))
+    warm = np.array(latencies[1:] or latencies)
+    return {"cold_ms": latencies[0], "p50_ms": float(np.percentile(warm, 50)), "p95_ms": float(np.percentile(warm, 95))}
+
+
+def run_worker(args):
+    """Measure one corpus size, appending one JSON line per finished stage to args.result."""
+    from langchain_community.vectorstores import Chroma
+
+    import rag_profiles
+    from build_index import build_index
+    from corpora import load_profiles
+    from quantized_store import QuantizedVectorStore, export_collection
+
+    def record(stage, **values):
+        values.update(stage=stage, rss_mib=rss_mib(), peak_rss_mib=peak_rss_mib())
+        with open(args.result, "a", encoding="utf-8") as f:
+            f.write(json.dumps(values) + "\n")
+
+    record("start")
+    started = time.perf_counter()
+    docs_list = rag_profiles.load_documents_from_json(args.worker)
+    record("load_documents", seconds=time.perf_counter() - started, profiles=len(docs_list))
+    del docs_list
+
+    started = time.perf_counter()
+    docs_list, index_docs = rag_profiles.load_index_documents(args.worker)
+    record("load_index_documents", seconds=time.perf_counter() - started, chunks=len(index_docs))
+    questions = make_questions(load_profiles(args.worker), args.queries + 1)
+
+    chroma_dir = os.path.join(args.work_dir, "chroma")
+    started = time.perf_counter()
+    build_index(index_docs, chroma_dir, rag_profiles.COLLECTION_NAME, batch_size=args.batch_size,
+                workers=args.workers, embedding_factory=stand_in_embeddings)
+    seconds = time.perf_counter() - started
+    record("build_index", seconds=seconds, docs_per_second=len(index_docs) / seconds)
+    del index_docs
+
+    embeddings = HashingEmbeddings()
+    for backend in BACKENDS:
+        started = time.perf_counter()
+        vectorstore = Chroma(persist_directory=chroma_dir, embedding_function=embeddings,
+                             collection_name=rag_profiles.COLLECTION_NAME)
+        store, directory = None, chroma_dir
+        if backend != "chroma":
+            directory = os.path.join(args.work_dir, backend)
+            export_collection(vectorstore._collection, directory, backend)
+            store = QuantizedVectorStore(directory)
+        index = rag_profiles.ProfileIndex(docs_list, vectorstore, chunked=rag_profiles.CHUNKING, quantized_store=store)
+        setup_seconds = time.perf_counter() - started
+        latencies = time_queries(index, questions)
+        record(backend, setup_seconds=setup_seconds, disk_mib=directory_size(directory) / 2**20,
+               search_mib=store.memory_bytes() / 2**20 if store else None, **latencies)
+        index.close()
+
+
+def read_results(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return {row["stage"]: row for row in map(json.loads, f)}
+
+
+def run_size(size, args):
+    """Generate a corpus of `size` profiles and measure it in a separate process."""
+    size_dir = os.path.join(args.work_dir, format_size(size))
+    shutil.rmtree(size_dir, ignore_errors=True)
+    os.makedirs(size_dir)
+    json_path = os.path.join(size_dir, "profiles.json")
+    result_path = os.path.join(size_dir, "results.jsonl")
+
+    print(f"Generating {size} profiles...", flush=True)
+    started = time.perf_counter()
+    json_bytes = write_corpus(json_path, size, seed=args.seed)
+    generated = {"seconds": time.perf_counter() - started, "json_mib": json_bytes / 2**20}
+
+    command = [sys.executable, os.path.abspath(__file__), "--worker", json_path, "--work-dir", size_dir,
+               "--result", result_path, "--queries", str(args.queries), "--batch-size", str(args.batch_size)]
+    if args.workers:
+        command += ["--workers", str(args.workers)]
+    print(f"Measuring {size} profiles...", flush=True)
+    try:
+        completed = subprocess.run(command, timeout=args.timeout)
+        if completed.returncode < 0:
+            # SIGKILL is usually the kernel's OOM killer
+            status = f"killed by {signal.Signals(-completed.returncode).name}"
+        else:
+            status = "ok" if completed.returncode == 0 else f"exit code {completed.returncode}"
+    except subprocess.TimeoutExpired:
+        status = f"timeout after {args.timeout}s"
+    results = read_results(result_path)
+    results["generate"] = generated
+    if not args.keep:
+        shutil.rmtree(size_dir, ignore_errors=True)
+    return results, status
+
+
+def _cell(row, key, width, fmt):
+    value = (row or {}).get(key)
+    return f"{'-':>{width}}" if value is None else f"{value:>{width}{fmt}}"
+
+
+def print_tables(measured):
+    print(f"\n{'profiles':>9}{'chunks':>10}{'json MiB':>10}{'gen s':>8}{'load s':>8}{'chunk s':>9}"
+          f"{'RSS MiB':>9}{'build s':>9}{'docs/s':>8}{'chroma MiB':>11}  status")
+    for size, (results, status) in measured:
+        chunks = results.get("load_index_documents")
+        finished = [stage for stage in STAGES if stage in results]
+        failed = "" if status == "ok" else f" (after {finished[-1] if finished else 'generating'})"
+        print(f"{format_size(size):>9}{_cell(chunks, 'chunks', 10, 'd')}"
+              f"{_cell(results['generate'], 'json_mib', 10, '.1f')}{_cell(results['generate'], 'seconds', 8, '.1f')}"
+              f"{_cell(results.get('load_documents'), 'seconds', 8, '.2f')}{_cell(chunks, 'seconds', 9, '.2f')}"
+              f"{_cell(chunks, 'rss_mib', 9, '.0f')}{_cell(results.get('build_index'), 'seconds', 9, '.1f')}"
+              f"{_cell(results.get('build_index'), 'docs_per_second', 8, '.0f')}"
+              f"{_cell(results.get('chroma'), 'disk_mib', 11, '.1f')}  {status}{failed}")
+
+    print(f"\n{'profiles':>9}  {'backend':<8}{'setup s':>9}{'disk MiB':>10}{'search MiB':>11}{'RSS MiB':>9}"
+          f"{'cold ms':>9}{'p50 ms':>8}{'p95 ms':>8}")
+    for size, (results, _) in measured:
+        for backend in BACKENDS:
+            row = results.get(backend)
+            print(f"{format_size(size):>9}  {backend:<8}{_cell(row, 'setup_seconds', 9, '.2f')}"
+                  f"{_cell(row, 'disk_mib', 10, '.1f')}{_cell(row, 'search_mib', 11, '.1f')}"
+                  f"{_cell(row, 'rss_mib', 9, '.0f')}{_cell(row, 'cold_ms', 9, '.1f')}"
+                  f"{_cell(row, 'p50_ms', 8, '.2f')}{_cell(row, 'p95_ms', 8, '.2f')}")
+    print("\nRSS is the benchmark process after the stage (the build_index workers are not included). "
+          "Embeddings are hashing stand-ins, so build and query times exclude the embedding model. "
+          "Setup is opening the Chroma collection, plus exporting it for the quantized backends.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark loading, indexing and retrieval over synthetic corpora")
+    parser.add_argument("--sizes", default="10k,100k,1M", help="comma-separated corpus sizes, e.g. 10k,100k,1M")
+    parser.add_argument("--queries", type=int, default=100, help="queries per backend")
+    parser.add_argument("--batch-size", type=int, default=64, help="build_index batch size")
+    parser.add_argument("--workers", type=int, default=None, help="build_index worker processes (default: all cores)")
+    parser.add_argument("--timeout", type=float, default=None, help="seconds before a size is reported as failing")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--work-dir", help="directory for the generated corpora and indexes (default: a temporary one)")
+    parser.add_argument("--keep", action="store_true", help="keep the generated corpora and indexes")
+    parser.add_argument("--worker", metavar="JSON", help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    temporary = args.work_dir is None
+    args.work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_scaling_")
+    try:
+        measured = []
+        for size in [parse_size(size) for size in args.sizes.split(",")]:
+            measured.append((size, run_size(size, args)))
+            print_tables(measured)
+    finally:
+        if temporary and not args.keep:
+            shutil.rmtree(args.work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
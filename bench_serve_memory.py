@@ -0,0 +1,213 @@
+"""Memory per worker of the preforking server, against one engine per worker.
+
+Three ways of serving with N workers are compared, each in its own process:
+  - prefork + gc.freeze: the engine is built once in the master, which calls
+    gc.collect() and gc.freeze() and then forks the workers (serve.py)
+  - prefork: the same without gc.freeze()
+  - naive: every worker builds its own engine, as N separate app.py
+    processes would (the workers are forked before the engine is built)
+
+Every worker answers the same questions through RAGQueryEngine: facet
+lookups through the whole graph, and retrievals through ProfileIndex. It
+then runs a full garbage collection, as a long-running worker eventually
+does. When all workers are done, the master reads /proc/<pid>/smaps_rollup of every
+process. USS (Private_Clean + Private_Dirty) is the memory only that process
+uses; PSS adds its share of the pages it shares with the others.
+
+The primary index holds generated profiles (see synthetic_corpus.py), or
+the CRIG corpus with --synthetic 0, and the ai.ugent.be corpus is a shard.
+Both are built with the hashing stand-in embeddings of bench_scaling.py. The GPT4All model is therefore not loaded. Loaded in the
+master, its weights would be shared by the prefork workers as well, and
+loaded again by every naive worker.
+
+Usage:
+    python bench_serve_memory.py [--workers 4] [--synthetic 2000] [--queries 50] [--work-dir DIR] [--keep]
+"""
+import argparse
+import functools
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+
+import numpy as np
+
+from bench_scaling import QUESTION_TEMPLATES, HashingEmbeddings, stand_in_embeddings
+from serve import read_memory
+from synthetic_corpus import write_corpus
+
+MODES = ("prefork + gc.freeze", "prefork", "naive")
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+
+def configure(work_dir):
+    """Point rag_profiles at the benchmark's corpora and files, with stand-in embeddings.
+
+    The primary index holds the generated profiles if there are any, and the CRIG corpus otherwise.
+    """
+    import build_index
+    import rag_profiles
+    from embedding_service import QueryEmbeddingService
+
+    synthetic = os.path.join(work_dir, "synthetic.json")
+    rag_profiles.JSON_FILE_PATH = synthetic if os.path.exists(synthetic) else \
+        os.path.join(ROOT, "scraping", "researchers_crig.json")
+    rag_profiles.EMBEDDINGS_DIR = os.path.join(work_dir, "embeddings_db")
+    rag_profiles.CORPORA = [
+        {"name": "ai_ugent", "schema": "ai_ugent", "json_file_path": os.path.join(ROOT, "researchers.json"),
+         "embeddings_dir": os.path.join(work_dir, "shards", "ai_ugent")},
+    ]
+    rag_profiles.SNAPSHOTS_DIR = os.path.join(work_dir, "snapshots")
+    rag_profiles.GENERATION_CACHE_PATH = os.path.join(work_dir, "generation_cache.sqlite3")
+    rag_profiles.SESSION_DB_PATH = os.path.join(work_dir, "sessions.sqlite3")
+    rag_profiles.VERDICT_LOG_PATH = os.path.join(work_dir, "logs", "grader_verdicts.jsonl")
+    rag_profiles.LOG_PATH = os.path.join(work_dir, "logs", "rag_operations.jsonl")
+    rag_profiles.PROFILES_DIR = os.path.join(work_dir, "profiles")
+    rag_profiles.CLASSIFIER_PATH = os.path.join(work_dir, "relevance_classifier.npz")
+    rag_profiles.create_embedding_function = lambda: QueryEmbeddingService(
+        HashingEmbeddings(), max_batch_size=rag_profiles.EMBED_BATCH_SIZE,
+        max_wait_ms=rag_profiles.EMBED_MAX_WAIT_MS, cache_size=rag_profiles.EMBED_CACHE_SIZE
+    )
+    rag_profiles.build_index = functools.partial(build_index.build_index, embedding_factory=stand_in_embeddings,
+                                                 workers=1)
+    return rag_profiles
+
+
+def workload(json_file_path, count):
+    """Facet lookups and retrieval questions about the profiles of the primary corpus."""
+    from corpora import load_profiles
+
+    profiles = load_profiles(json_file_path)
+    keywords = sorted({keyword for profile in profiles
+                       for keyword in (profile.get("keywords") or []) + (profile.get("expertise") or [])})
+    rng = np.random.default_rng(0)
+    terms = [keywords[i] for i in rng.choice(len(keywords), min(count, len(keywords)), replace=False)]
+    return ([f"keyword {term}" for term in terms],
+            [QUESTION_TEMPLATES[i % len(QUESTION_TEMPLATES)].format(term) for i, term in enumerate(terms)])
+
+
+def answer(engine, facet_questions, questions):
+    from facets import parse_facet_query
+
+    for i, question in enumerate(facet_questions):
+        # Only exact lookups; anything else would need the LLM
+        if parse_facet_query(question, engine.index.facets):
+            engine.query(question, session_id=f"bench-{os.getpid()}-{i % 5}")
+    for question in questions:
+        engine.index.retrieve(question)
+
+
+def measure(mode, workers, work_dir, queries):
+    """Fork the workers of one mode; returns the memory (kB) of the master and every worker."""
+    rag_profiles = configure(work_dir)
+    facet_questions, questions = workload(rag_profiles.JSON_FILE_PATH, queries)
+    engine = None
+    if mode != "naive":
+        engine = rag_profiles.RAGQueryEngine()
+        # Load whatever is loaded lazily before forking, as the first requests would in the master
+        answer(engine, facet_questions[:1], questions[:1])
+        gc.collect()
+        if mode == "prefork + gc.freeze":
+            gc.freeze()
+
+    pids, ready, release = [], os.pipe(), os.pipe()
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            try:
+                worker_engine = engine or rag_profiles.RAGQueryEngine()
+                # On a fresh thread, as serve.py handles requests, so Chroma opens its own SQLite connections
+                thread = threading.Thread(target=answer, args=(worker_engine, facet_questions, questions))
+                thread.start()
+                thread.join()
+                # A long-running worker eventually runs full collections, which touch every tracked object
+                gc.collect()
+                os.write(ready[1], b".")
+                # Stay alive until the master has read the memory of every worker and closes the pipe
+                os.close(release[1])
+                os.read(release[0], 1)
+            finally:
+                os._exit(0)
+        pids.append(pid)
+    for _ in range(workers):
+        os.read(ready[0], 1)
+    memory = {"master": read_memory(os.getpid()), "workers": [read_memory(pid) for pid in pids]}
+    os.close(release[1])
+    for pid in pids:
+        os.waitpid(pid, 0)
+    return memory
+
+
+def build(work_dir, synthetic):
+    """Generate the corpus and build every index once, so the modes only load them."""
+    if synthetic:
+        print(f"Generating {synthetic} profiles...", flush=True)
+        write_corpus(os.path.join(work_dir, "synthetic.json"), synthetic)
+    rag_profiles = configure(work_dir)
+    print("Building the indexes with stand-in embeddings...", flush=True)
+    embeddings = rag_profiles.create_embedding_function()
+    index = rag_profiles.load_index(embeddings)
+    shards = rag_profiles.load_shards(embeddings)
+    print(f"{len(index.profiles)} profiles in the primary index, {sum(len(s.profiles) for s in shards)} in the shards\n")
+
+
+def mib(kb):
+    return kb / 1024
+
+
+def report(results, workers):
+    print(f"{'mode':<22}{'master PSS':>11}{'worker USS':>11}{'worker PSS':>11}{'worker RSS':>11}{'total PSS':>10}")
+    for mode, memory in results.items():
+        uss = [worker["Uss"] for worker in memory["workers"]]
+        pss = [worker["Pss"] for worker in memory["workers"]]
+        rss = [worker["Rss"] for worker in memory["workers"]]
+        total = memory["master"]["Pss"] + sum(pss)
+        print(f"{mode:<22}{mib(memory['master']['Pss']):>11.1f}{mib(np.mean(uss)):>11.1f}{mib(np.mean(pss)):>11.1f}"
+              f"{mib(np.mean(rss)):>11.1f}{mib(total):>10.1f}")
+    print(f"\nMiB; worker columns are the mean over {workers} workers. Total PSS is the memory of the whole server.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Memory per worker of prefork serving against one engine per worker")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--synthetic", type=int, default=2000, metavar="N",
+                        help="generated profiles added as the primary index (0: the CRIG corpus only)")
+    parser.add_argument("--queries", type=int, default=50, help="facet lookups and retrievals per worker")
+    parser.add_argument("--work-dir", help="directory for the corpus and indexes (default: a temporary one)")
+    parser.add_argument("--keep", action="store_true", help="keep the work directory")
+    parser.add_argument("--mode", choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--result", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        memory = measure(args.mode, args.workers, args.work_dir, args.queries)
+        with open(args.result, "w", encoding="utf-8") as f:
+            json.dump(memory, f)
+        return
+
+    work_dir = args.work_dir or tempfile.mkdtemp(prefix="bench_serve_memory_")
+    try:
+        os.makedirs(work_dir, exist_ok=True)
+        build(work_dir, args.synthetic)
+        results = {}
+        for mode in MODES:
+            print(f"Measuring {mode} with {args.workers} workers...", flush=True)
+            result = os.path.join(work_dir, "result.json")
+            # A fresh interpreter per mode, so no mode inherits another's memory
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode, "--workers", str(args.workers),
+                            "--work-dir", work_dir, "--queries", str(args.queries), "--result", result], check=True)
+            with open(result, "r", encoding="utf-8") as f:
+                results[mode] = json.load(f)
+        print()
+        report(results, args.workers)
+    finally:
+        if not args.keep and not args.work_dir:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,166 @@
+"""Parallel, batched and resumable construction of the Chroma profile index.
+
+Documents are embedded in fixed-size batches across a pool of worker
+processes (GPT4All runs on the CPU) and written to Chroma with one bulk
+upsert per batch. Every document gets a content-derived ID, so an
+interrupted build is resumed by skipping the IDs that are already stored.
+
+Usage:
+    python build_index.py [--json PATH] [--persist-dir DIR] [--batch-size 64] [--workers N]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import chromadb
+from langchain_community.embeddings import GPT4AllEmbeddings
+
+from embedding_service import QueryEmbeddingService
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 64
+
+# Embedding model of the current worker process, created by _init_worker
+_worker_embeddings = None
+
+
+def document_id(doc):
+    """Stable ID derived from a document's content and metadata."""
+    digest = hashlib.sha1(doc.page_content.encode("utf-8"))
+    if doc.metadata:
+        digest.update(json.dumps(doc.metadata, sort_keys=True).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def gpt4all_embeddings(n_threads):
+    return GPT4AllEmbeddings(n_threads=n_threads)
+
+
+def _init_worker(embedding_factory, n_threads):
+    global _worker_embeddings
+    _worker_embeddings = QueryEmbeddingService(embedding_factory(n_threads))
+
+
+def _embed_batch(texts):
+    return _worker_embeddings.embed_documents(texts)
+
+
+def existing_ids(collection, ids, chunk_size=5000):
+    """Return the subset of `ids` that is already stored in the collection."""
+    found = set()
+    for start in range(0, len(ids), chunk_size):
+        found.update(collection.get(ids=ids[start:start + chunk_size], include=[])["ids"])
+    return found
+
+
+def build_index(documents, persist_directory, collection_name, batch_size=DEFAULT_BATCH_SIZE,
+                workers=None, embedding_factory=gpt4all_embeddings):
+    """Embed `documents` into a persistent Chroma collection.
+
+    `embedding_factory(n_threads)` must be a picklable callable returning a
+    LangChain embedding model; it is called once in every worker process.
+    Returns the number of documents that were embedded by this call.
+    """
+    workers = workers or os.cpu_count() or 1
+    # Split the cores between the workers instead of letting every worker's
+    # model spin up one thread per core.
+    n_threads = max(1, (os.cpu_count() or 1) // workers)
+
+    ids = [document_id(doc) for doc in documents]
+    # Duplicate documents would otherwise be upserted twice in one batch
+    unique = {}
+    for doc_id, doc in zip(ids, documents):
+        unique.setdefault(doc_id, doc)
+
+    # Start the workers before Chroma opens its own threads and files
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(embedding_factory, n_threads)) as executor:
+        client = chromadb.PersistentClient(path=persist_directory)
+        collection = client.get_or_create_collection(collection_name)
+
+        done = existing_ids(collection, list(unique))
+        pending = [(doc_id, doc) for doc_id, doc in unique.items() if doc_id not in done]
+        if done:
+            logger.info(f"Resuming build: {len(done)} of {len(unique)} documents already embedded")
+        if not pending:
+            return 0
+
+        batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+        started = time.perf_counter()
+        embedded = 0
+        in_flight = {}
+        next_batch = 0
+        while next_batch < len(batches) or in_flight:
+            # Keep a bounded number of batches queued so memory stays flat
+            while next_batch < len(batches) and len(in_flight) < workers * 2:
+                batch = batches[next_batch]
+                future = executor.submit(_embed_batch, [doc.page_content for _, doc in batch])
+                in_flight[future] = batch
+                next_batch += 1
+
+            completed, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in completed:
+                batch = in_flight.pop(future)
+                collection.upsert(
+                    ids=[doc_id for doc_id, _ in batch],
+                    embeddings=future.result(),
+                    documents=[doc.page_content for _, doc in batch],
+                    metadatas=[doc.metadata or None for _, doc in batch],
+                )
+                embedded += len(batch)
+                elapsed = time.perf_counter() - started
+                logger.info(
+                    f"Embedded {len(done) + embedded}/{len(unique)} documents "
+                    f"({embedded / elapsed:.1f} docs/sec)"
+                )
+    return embedded
+
+
+def main():
+    import rag_profiles
+
+    parser = argparse.ArgumentParser(description="Build the Chroma profile index in parallel")
+    parser.add_argument("--json", default=rag_profiles.JSON_FILE_PATH, help="profile JSON file")
+    parser.add_argument("--persist-dir", default=rag_profiles.EMBEDDINGS_DIR, help="Chroma persist directory")
+    parser.add_argument("--collection", default=rag_profiles.COLLECTION_NAME, help="Chroma collection name")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="documents per embedding batch")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="embedding worker processes")
+    parser.add_argument("--corpus", choices=[corpus["name"] for corpus in rag_profiles.CORPORA],
+                        help="build the shard of a corpus in CORPORA (sets --json and --persist-dir)")
+    args = parser.parse_args()
+
+    schema = "crig"
+    if args.corpus:
+        corpus = next(corpus for corpus in rag_profiles.CORPORA if corpus["name"] == args.corpus)
+        args.json, args.persist_dir, schema = corpus["json_file_path"], corpus["embeddings_dir"], corpus["schema"]
+    _, documents = rag_profiles.load_index_documents(args.json, schema)
+    started = time.perf_counter()
+    embedded = build_index(documents, args.persist_dir, args.collection, args.batch_size, args.workers)
+    elapsed = time.perf_counter() - started
+    rate = embedded / elapsed if elapsed > 0 else 0.0
+    logger.info(f"Embedded {embedded} documents in {elapsed:.1f}s ({rate:.1f} docs/sec)")
+    if rag_profiles.QUANTIZATION_MODE is not None:
+        import chromadb
+        from quantized_store import QUANTIZED_DIR, export_collection
+
+        directory = os.path.join(args.persist_dir, QUANTIZED_DIR)
+        collection = chromadb.PersistentClient(path=args.persist_dir).get_collection(args.collection)
+        export_collection(collection, directory, rag_profiles.QUANTIZATION_MODE)
+        logger.info(f"Exported the {rag_profiles.QUANTIZATION_MODE} quantized store to {directory}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        stream=sys.stdout)
+    try:
+        main()
+    except Exception as e:
+        logger.error(f"Index build failed: {str(e)}")
+        sys.exit(1)
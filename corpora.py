@@ -0,0 +1,96 @@
+"""Schema adapters for the scraped profile corpora, and merging of sharded search results.
+
+Every corpus is indexed as its own shard. An adapter converts the profiles of
+its source into the CRIG schema that chunking, formatting and the facet index
+read:
+
+    name, profile_url, description, research_focus, contact_info, links,
+    keywords, expertise, current_positions, research_disciplines,
+    projects ({role: [{title, description}]}), publications ([{title, year, venue}])
+
+Adding another institute's corpus means writing an adapter for its schema and
+adding it to CORPORA in rag_profiles.py; only its own shard is built.
+"""
+import json
+import re
+
+from facets import normalize
+
+YEAR_PATTERN = re.compile(r"\b(19|20)\d{2}\b")
+NAME_TITLES = {"prof", "dr", "ir", "phd", "msc", "ing"}
+
+
+# CRIG and research.ugent.be profiles (scraping/researchers_crig.json) are already in the schema
+def adapt_crig(profile):
+    return profile
+
+
+# ai.ugent.be profiles (researchers.json, see crawl_ugent_ai.py)
+def adapt_ai_ugent(profile):
+    projects = {}
+    for project in profile.get('projects') or []:
+        # "As Promotor" -> "promotor"
+        role = " ".join((project.get('project_As') or "").split()).lower().removeprefix("as ") or "member"
+        projects.setdefault(role, []).append({
+            'title': project.get('project_Title'),
+            'url': project.get('project_URL'),
+            'description': project.get('project_Description'),
+        })
+    publications = []
+    for citation in profile.get('publications') or []:
+        publication = {'title': citation}
+        year = YEAR_PATTERN.search(citation)
+        if year:
+            publication['year'] = int(year.group())
+        publications.append(publication)
+    contact = [profile[key] for key in ('email', 'phone') if profile.get(key)]
+    return {
+        'name': profile.get('name'),
+        'profile_url': profile.get('profile_link'),
+        'description': profile.get('bio'),
+        'keywords': [keyword.strip() for keyword in (profile.get('keywords') or "").split(",") if keyword.strip()],
+        'contact_info': ", ".join(contact) or None,
+        'links': [{'text': "Website", 'url': profile['website']}] if profile.get('website') else [],
+        'current_positions': [{'department': profile['research_unit']}] if profile.get('research_unit') else [],
+        'projects': projects,
+        'publications': publications,
+    }
+
+
+SCHEMAS = {"crig": adapt_crig, "ai_ugent": adapt_ai_ugent}
+
+
+def load_profiles(json_file_path, schema="crig"):
+    """Profiles of a corpus JSON file, converted to the CRIG schema."""
+    if schema not in SCHEMAS:
+        raise ValueError(f"Unknown corpus schema {schema!r}; use one of {', '.join(SCHEMAS)}")
+    with open(json_file_path, "r", encoding="utf-8") as file:
+        return [SCHEMAS[schema](profile) for profile in json.load(file)]
+
+
+def name_key(name):
+    """Key under which the same researcher matches across corpora ("Prof. Tony Belpaeme" == "Belpaeme, Tony")."""
+    tokens = re.findall(r"[^\W\d_]+", normalize(name or ""))
+    return " ".join(sorted(token for token in tokens if token not in NAME_TITLES))
+
+
+def merge_results(shard_results, k):
+    """Merge the (document, score) hits of every shard into the k best unique researchers.
+
+    `shard_results` holds one list of hits per shard. Higher scores are
+    better; ties keep the shard order. A researcher found in several shards
+    is kept once, with its best-scoring profile. Namesakes within one shard
+    are different people and are all kept.
+    """
+    hits = [(doc, score, shard) for shard, shard_hits in enumerate(shard_results) for doc, score in shard_hits]
+    merged = []
+    # Name key -> the shard whose profile was kept for it
+    owners = {}
+    for doc, score, shard in sorted(hits, key=lambda hit: -hit[1]):
+        key = name_key(doc.metadata.get("name")) or doc.metadata.get("profile_id")
+        if owners.setdefault(key, shard) != shard:
+            continue
+        merged.append((doc, score))
+        if len(merged) == k:
+            break
+    return merged
@@ -1,14 +1,30 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import os
+import sys
+from bs4 import BeautifulSoup, SoupStrainer
 import json
 from urllib.parse import urljoin
-import time
 
-def main():
-    base_url = 'https://ai.ugent.be'
-    url = 'https://ai.ugent.be/people/'
-    response = requests.get(url)
-    soup = BeautifulSoup(response.content, 'html.parser')
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scraping'))
+from crawler import Crawler
+from http_cache import HttpCache
+import parsers
+from parsers import has_class
+
+BASE_URL = 'https://ai.ugent.be'
+PEOPLE_URL = 'https://ai.ugent.be/people/'
+
+# The blocks of a profile page that parse_profile reads, and the contact links wherever they are
+PROFILE_BLOCKS = ('person-contact', 'person-bio', 'person-keywords', 'person-publications')
+PROFILE_ELEMENTS = SoupStrainer(
+    lambda name, attrs: (name == 'div' and any(has_class(attrs, block) for block in PROFILE_BLOCKS))
+    or (name == 'a' and any(scheme in (attrs.get('href') or '') for scheme in ('mailto:', 'tel:')))
+)
+
+
+def parse_people_grid(html, base_url=BASE_URL):
+    """Extract name, profile link and image URL of everyone on the people page."""
+    soup = BeautifulSoup(html, parsers.HTML_PARSER)
 
     researchers = []
 
@@ -38,84 +54,113 @@ def main():
             figcaption = card.find('figcaption')
             name = figcaption.get_text(strip=True) if figcaption else None
 
-        researcher = {
+        researchers.append({
             'name': name,
             'profile_link': profile_link,
             'image_url': image_url
-        }
-
-        # Request the profile page
-        profile_response = requests.get(profile_link)
-        profile_soup = BeautifulSoup(profile_response.content, 'html.parser')
-
-        # Extract email
-        email_tag = profile_soup.find('a', href=lambda href: href and 'mailto:' in href)
-        email = email_tag.get_text(strip=True) if email_tag else None
-        researcher['email'] = email
-
-        # Extract phone number
-        phone_tag = profile_soup.find('a', href=lambda href: href and 'tel:' in href)
-        phone = phone_tag.get_text(strip=True) if phone_tag else None
-        researcher['phone'] = phone
-
-        # Extract research unit
-        unit = None
-        # Find all spans and look for one containing 'research unit'
-        for span in profile_soup.find_all('span'):
-            if 'research unit' in span.get_text(strip=True).lower():
-                # Get the next sibling 'a' tag
-                next_sibling = span.find_next_sibling('a')
-                if next_sibling:
-                    unit = next_sibling.get_text(strip=True)
-                break
-        researcher['research_unit'] = unit
-
-        # Extract personal website
-        website = None
-        contact_div = profile_soup.find('div', class_='person-contact')
-        if contact_div:
-            # Exclude 'mailto:' and 'tel:' links
-            website_links = contact_div.find_all('a', href=lambda href: href and not href.startswith('mailto:') and not href.startswith('tel:') and 'ugent.be' not in href)
-            if website_links:
-                website = website_links[0].get('href')
-        researcher['website'] = website
-
-        # Extract biography
-        bio_tag = profile_soup.find('div', class_='person-bio')
-        bio = bio_tag.get_text(strip=True) if bio_tag else None
-        researcher['bio'] = bio
-
-        # Extract keywords
-        keywords = None
-        keywords_tag = profile_soup.find('div', class_='person-keywords')
-        if keywords_tag:
-            strong_tag = keywords_tag.find('strong')
-            if strong_tag:
-                strong_tag.decompose()  # Remove 'Keywords:' label
-            keywords = keywords_tag.get_text(strip=True)
-        researcher['keywords'] = keywords
-
-        # Extract key publications
-        publications = []
-        publications_section = profile_soup.find('div', class_='person-publications')
-        if publications_section:
-            key_pubs_header = publications_section.find('strong', string=lambda x: x and 'Key publications' in x)
-            if key_pubs_header:
-                ul_tag = key_pubs_header.find_next_sibling('ul')
-                if ul_tag:
-                    pubs = ul_tag.find_all('li')
-                    for pub in pubs:
-                        publications.append(pub.get_text(strip=True))
-        researcher['publications'] = publications
-
-        researchers.append(researcher)
-
-        # Sleep to be polite to the server
-        time.sleep(1)
+        })
+    return researchers
+
+
+def find_research_unit(soup):
+    """The link text after the first span labelled 'research unit', or None."""
+    # Find all spans and look for one containing 'research unit'
+    for span in soup.find_all('span'):
+        if 'research unit' in span.get_text(strip=True).lower():
+            # Get the next sibling 'a' tag
+            next_sibling = span.find_next_sibling('a')
+            return next_sibling.get_text(strip=True) if next_sibling else None
+    return None
+
+
+def parse_profile(html):
+    """Extract contact details, research unit, bio, keywords and key publications from a profile page.
+
+    Only the person-* blocks and the contact links are parsed (see
+    parsers.TARGETED_PARSING), instead of the whole page.
+    """
+    profile_soup = parsers.make_soup(html, PROFILE_ELEMENTS)
+    researcher = {}
+
+    # Extract email
+    email_tag = profile_soup.find('a', href=lambda href: href and 'mailto:' in href)
+    email = email_tag.get_text(strip=True) if email_tag else None
+    researcher['email'] = email
+
+    # Extract phone number
+    phone_tag = profile_soup.find('a', href=lambda href: href and 'tel:' in href)
+    phone = phone_tag.get_text(strip=True) if phone_tag else None
+    researcher['phone'] = phone
+
+    # Extract research unit; it is labelled in the contact block, but look through the whole page if not
+    unit = find_research_unit(profile_soup)
+    if unit is None and parsers.TARGETED_PARSING:
+        unit = find_research_unit(BeautifulSoup(html, parsers.HTML_PARSER))
+    researcher['research_unit'] = unit
+
+    # Extract personal website
+    website = None
+    contact_div = profile_soup.find('div', class_='person-contact')
+    if contact_div:
+        # Exclude 'mailto:' and 'tel:' links
+        website_links = contact_div.find_all('a', href=lambda href: href and not href.startswith('mailto:') and not href.startswith('tel:') and 'ugent.be' not in href)
+        if website_links:
+            website = website_links[0].get('href')
+    researcher['website'] = website
+
+    # Extract biography
+    bio_tag = profile_soup.find('div', class_='person-bio')
+    bio = bio_tag.get_text(strip=True) if bio_tag else None
+    researcher['bio'] = bio
+
+    # Extract keywords
+    keywords = None
+    keywords_tag = profile_soup.find('div', class_='person-keywords')
+    if keywords_tag:
+        strong_tag = keywords_tag.find('strong')
+        if strong_tag:
+            strong_tag.decompose()  # Remove 'Keywords:' label
+        keywords = keywords_tag.get_text(strip=True)
+    researcher['keywords'] = keywords
+
+    # Extract key publications
+    publications = []
+    publications_section = profile_soup.find('div', class_='person-publications')
+    if publications_section:
+        key_pubs_header = publications_section.find('strong', string=lambda x: x and 'Key publications' in x)
+        if key_pubs_header:
+            ul_tag = key_pubs_header.find_next_sibling('ul')
+            if ul_tag:
+                pubs = ul_tag.find_all('li')
+                for pub in pubs:
+                    publications.append(pub.get_text(strip=True))
+    researcher['publications'] = publications
+
+    return researcher
+
+
+async def scrape_profile(crawler, researcher):
+    # Request the profile page
+    profile_response = await crawler.fetch(researcher['profile_link'])
+    researcher.update(parse_profile(profile_response.text))
+
+
+async def main():
+    cache = HttpCache()
+    async with Crawler(cache=cache) as crawler:
+        response = await crawler.fetch(PEOPLE_URL)
+        researchers = parse_people_grid(response.text)
+
+        # Fetch all profile pages concurrently; the crawler's per-host rate
+        # limit keeps this polite to the server
+        await asyncio.gather(*(scrape_profile(crawler, researcher) for researcher in researchers))
+
+    print(cache.report())
+    cache.close()
 
     # Save the data to a JSON file
     with open('researchers.json', 'w', encoding='utf-8') as f:
         json.dump(researchers, f, ensure_ascii=False, indent=4)
 
 if __name__ == '__main__':
-    main()
+    asyncio.run(main())
@@ -0,0 +1,173 @@
+"""Embedding service layer shared by every component that needs a query vector.
+
+Concurrent `embed_query` calls are collected for a few milliseconds and
+embedded as one batch, and recent query vectors are kept in an LRU cache.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from queue import Empty, Queue
+
+from langchain_core.embeddings import Embeddings
+
+from profiling import current_profile, sampled_for
+
+
+class QueryEmbeddingService(Embeddings):
+    """Micro-batching, caching wrapper around a LangChain embedding model."""
+
+    def __init__(self, embeddings, max_batch_size=32, max_wait_ms=5, cache_size=1024, timeout=30):
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.cache_size = cache_size
+        self.timeout = timeout
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._metrics_lock = threading.Lock()
+        self._reset_metrics()
+        self._pid = None
+        self._start_lock = threading.Lock()
+
+    def _reset_metrics(self):
+        self._metrics = {
+            "requests": 0,
+            "cache_hits": 0,
+            "batches": 0,
+            "batched_texts": 0,
+            "max_batch_size": 0,
+            "total_wait_ms": 0.0,
+            "max_wait_ms": 0.0,
+            "total_embed_ms": 0.0,
+        }
+
+    def _ensure_worker(self):
+        # The batching thread does not survive fork(), so (re)start it lazily
+        # in whichever process is actually serving queries.
+        if self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._pid == os.getpid():
+                return
+            self._queue = Queue()
+            self._thread = threading.Thread(target=self._run, name="query-embedding-batcher", daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def _embed_batch(self, texts):
+        # GPT4AllEmbeddings.embed_documents embeds texts one by one; its
+        # Embed4All client accepts a list and runs it as a single batch.
+        client = getattr(self.embeddings, "client", None)
+        if client is not None and hasattr(client, "embed"):
+            return [list(vector) for vector in client.embed(list(texts))]
+        return self.embeddings.embed_documents(list(texts))
+
+    def _cache_get(self, text):
+        with self._cache_lock:
+            vector = self._cache.get(text)
+            if vector is not None:
+                self._cache.move_to_end(text)
+            return vector
+
+    def _cache_put(self, text, vector):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[text] = vector
+            self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except Empty:
+                    break
+            self._process(batch)
+
+    def _process(self, batch):
+        # Every future of the batch gets a result or the exception, so no caller
+        # waits on a batch that failed and the batching thread keeps running
+        try:
+            # Profiled queries in the batch see the batching thread's work in their profile
+            with sampled_for({profile for _, _, _, profile in batch}):
+                self._embed_and_resolve(batch)
+        except Exception as e:
+            for _, future, _, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+
+    def _embed_and_resolve(self, batch):
+        started = time.perf_counter()
+        # Texts queued while an identical one was being embedded are already cached
+        vectors = {}
+        for text, _, _, _ in batch:
+            vector = self._cache_get(text)
+            if vector is not None:
+                vectors[text] = vector
+        texts = [text for text in dict.fromkeys(text for text, _, _, _ in batch) if text not in vectors]
+        if texts:
+            embedded = self._embed_batch(texts)
+            if len(embedded) != len(texts):
+                raise ValueError(f"The embedding model returned {len(embedded)} vectors for {len(texts)} texts")
+            vectors.update(zip(texts, embedded))
+        finished = time.perf_counter()
+
+        for text in texts:
+            self._cache_put(text, vectors[text])
+        waits = [(started - enqueued) * 1000 for _, _, enqueued, _ in batch]
+        with self._metrics_lock:
+            if texts:
+                self._metrics["batches"] += 1
+                self._metrics["batched_texts"] += len(texts)
+                self._metrics["max_batch_size"] = max(self._metrics["max_batch_size"], len(texts))
+                self._metrics["total_embed_ms"] += (finished - started) * 1000
+            self._metrics["total_wait_ms"] += sum(waits)
+            self._metrics["max_wait_ms"] = max(self._metrics["max_wait_ms"], max(waits))
+        for text, future, _, _ in batch:
+            future.set_result(vectors[text])
+
+    def embed_query(self, text):
+        with self._metrics_lock:
+            self._metrics["requests"] += 1
+        vector = self._cache_get(text)
+        if vector is not None:
+            with self._metrics_lock:
+                self._metrics["cache_hits"] += 1
+            return vector
+
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter(), current_profile.get()))
+        # Raises concurrent.futures.TimeoutError rather than hanging the request
+        return future.result(timeout=self.timeout)
+
+    def embed_documents(self, texts):
+        # Index-time embedding is already batched by the caller; bypass the
+        # query queue and cache.
+        if not texts:
+            return []
+        return self._embed_batch(texts)
+
+    def stats(self):
+        """Return cache and batching metrics."""
+        with self._metrics_lock:
+            metrics = dict(self._metrics)
+        with self._cache_lock:
+            metrics["cache_entries"] = len(self._cache)
+        batches = metrics["batches"]
+        metrics["cache_hit_rate"] = metrics["cache_hits"] / metrics["requests"] if metrics["requests"] else 0.0
+        metrics["avg_batch_size"] = metrics["batched_texts"] / batches if batches else 0.0
+        embedded_requests = metrics["requests"] - metrics["cache_hits"]
+        metrics["avg_wait_ms"] = metrics["total_wait_ms"] / embedded_requests if embedded_requests else 0.0
+        metrics["avg_embed_ms"] = metrics["total_embed_ms"] / batches if batches else 0.0
+        return metrics
@@ -0,0 +1,162 @@
+"""Inverted index over the structured fields of researcher profiles.
+
+Keywords and expertise, research disciplines and their categories, and the
+faculties, departments and titles of current positions are indexed as facet
+terms. Terms are normalized: accents are folded, case is ignored and
+whitespace is collapsed, so "Protéomics " and "proteomics" are the same term.
+Lookups match exact terms, or every term starting with a prefix.
+
+`parse_facet_query` recognizes questions that are nothing more than facet
+filters, such as "list researchers with keyword proteomics". The engine
+answers those from the index without embedding, grading or generation.
+"""
+import bisect
+import re
+import unicodedata
+
+FACETS = ("keyword", "discipline", "category", "faculty", "department", "position")
+
+# Words used for each facet in questions
+FACET_ALIASES = {
+    "keyword": "keyword", "keywords": "keyword", "expertise": "keyword",
+    "discipline": "discipline", "disciplines": "discipline",
+    "research discipline": "discipline", "research disciplines": "discipline",
+    "category": "category", "categories": "category", "field": "category", "research field": "category",
+    "faculty": "faculty", "faculties": "faculty",
+    "department": "department", "departments": "department",
+    "position": "position", "positions": "position", "title": "position",
+}
+
+QUERY_LEAD = re.compile(
+    r"^(?:please\s+)?(?:(?:list|show|find|get|give\s+me|which|who\s+are)\s+)?(?:(?:all|the|every)\s+)*"
+    r"(?:researchers?|people|profiles?|members?|scientists?)\s+"
+    r"(?:(?:who\s+(?:have|has|are\s+in|work\s+in))|with|having|in|from|matching|for)\s+"
+)
+ALIAS_PATTERN = "|".join(sorted((re.escape(alias).replace(r"\ ", r"\s+") for alias in FACET_ALIASES), key=len, reverse=True))
+QUERY_CLAUSE = re.compile(rf"^(?:(?:the|a|an)\s+)?(?P<alias>{ALIAS_PATTERN})\s*[:=]?\s*(?P<term>.+)$")
+CLAUSE_SEPARATOR = re.compile(rf"\s+and\s+(?=(?:(?:the|a|an)\s+)?(?:{ALIAS_PATTERN})\b)")
+
+
+def normalize(term):
+    """Accent-folded, case-folded term with collapsed whitespace."""
+    decomposed = unicodedata.normalize("NFKD", term)
+    folded = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(folded.casefold().split())
+
+
+def profile_facets(profile):
+    """(facet, term) pairs of one profile as it is stored in the profile JSON."""
+    for keyword in (profile.get("keywords") or []) + (profile.get("expertise") or []):
+        yield "keyword", keyword
+    for category in profile.get("research_disciplines") or []:
+        if category.get("category"):
+            yield "category", category["category"]
+        for discipline in category.get("disciplines") or []:
+            if discipline.get("name"):
+                yield "discipline", discipline["name"]
+    for position in profile.get("current_positions") or []:
+        for facet, key in (("faculty", "faculty"), ("department", "department"), ("position", "title")):
+            if position.get(key):
+                yield facet, position[key]
+
+
+class FacetIndex:
+    """Maps normalized facet terms to the IDs of the profiles that have them."""
+
+    def __init__(self):
+        self.postings = {facet: {} for facet in FACETS}
+        # Display form of every term (as first seen) and sorted terms for prefix lookups
+        self.labels = {facet: {} for facet in FACETS}
+        self.sorted_terms = {facet: [] for facet in FACETS}
+
+    @classmethod
+    def build(cls, profiles, profile_id):
+        """Index the profiles of a profile JSON file; `profile_id(profile)` names each profile."""
+        index = cls()
+        for profile in profiles:
+            pid = profile_id(profile)
+            for facet, label in profile_facets(profile):
+                term = normalize(label)
+                if term:
+                    index.postings[facet].setdefault(term, set()).add(pid)
+                    index.labels[facet].setdefault(term, label.strip())
+        for facet in FACETS:
+            index.sorted_terms[facet] = sorted(index.postings[facet])
+        return index
+
+    @classmethod
+    def merge(cls, indexes):
+        """One index over the profiles of several indexes (e.g. of every corpus shard)."""
+        merged = cls()
+        for index in indexes:
+            for facet in FACETS:
+                for term, ids in index.postings[facet].items():
+                    merged.postings[facet].setdefault(term, set()).update(ids)
+                    merged.labels[facet].setdefault(term, index.labels[facet][term])
+        for facet in FACETS:
+            merged.sorted_terms[facet] = sorted(merged.postings[facet])
+        return merged
+
+    def matching_terms(self, facet, text, prefix=False):
+        """Terms of a facet equal to `text`, or starting with it if `prefix`."""
+        term = normalize(text)
+        if not prefix:
+            return [term] if term in self.postings[facet] else []
+        terms = self.sorted_terms[facet]
+        start = bisect.bisect_left(terms, term)
+        end = start
+        while end < len(terms) and terms[end].startswith(term):
+            end += 1
+        return terms[start:end]
+
+    def lookup(self, facet, text, prefix=False):
+        """IDs of the profiles with a term of a facet (see matching_terms)."""
+        ids = set()
+        for term in self.matching_terms(facet, text, prefix):
+            ids |= self.postings[facet][term]
+        return ids
+
+    def search(self, filters):
+        """IDs of the profiles that match every (facet, text, prefix) filter."""
+        ids = None
+        for facet, text, prefix in filters:
+            matches = self.lookup(facet, text, prefix)
+            ids = matches if ids is None else ids & matches
+            if not ids:
+                return set()
+        return ids or set()
+
+    def terms(self, facet, prefix="", limit=20):
+        """Display forms and profile counts of the terms of a facet starting with `prefix`."""
+        return [
+            {"term": self.labels[facet][term], "count": len(self.postings[facet][term])}
+            for term in self.matching_terms(facet, prefix, prefix=True)[:limit]
+        ]
+
+
+def parse_facet_query(question, index):
+    """Facet filters if the question is exactly a facet lookup, otherwise None.
+
+    A filter is a facet word followed by a term, such as "keyword proteomics"
+    or "discipline: cell signalling*" (a trailing * matches a prefix).
+    Several filters can be joined with "and". Every term must exist in the
+    index, so questions that only resemble a lookup still go through RAG.
+    """
+    text = " ".join(question.strip().rstrip("?.!").split())
+    text = QUERY_LEAD.sub("", text.lower(), count=1)
+    filters = []
+    for clause in CLAUSE_SEPARATOR.split(text):
+        match = QUERY_CLAUSE.match(clause)
+        if not match:
+            return None
+        facet = FACET_ALIASES[" ".join(match.group("alias").split())]
+        term = match.group("term").strip().strip("\"'")
+        prefix = term.endswith("*")
+        term = term.rstrip("*").strip()
+        # "faculty of sciences" names the faculty "Faculty of Sciences"
+        if not index.matching_terms(facet, term, prefix) and facet in ("faculty", "department"):
+            term = f"{facet} {term}"
+        if not term or not index.matching_terms(facet, term, prefix):
+            return None
+        filters.append((facet, term, prefix))
+    return filters or None
@@ -0,0 +1,154 @@
+"""Persistent cache of generated answers.
+
+An answer is stored under a key made of:
+  - the normalized question (case, whitespace and trailing punctuation ignored),
+  - the IDs and content hashes of the graded documents, in order,
+  - the LLM name and the version of the generation prompt.
+
+A cached answer is only reused when the generator would see exactly the same
+input. Answers are kept in a SQLite file shared by all serving processes.
+When the stored answers exceed the size limit, the least recently used are
+evicted. Their total size is kept in a one-row table, updated in the same
+transaction as every insert and eviction, so checking the limit does not
+scan the cache. The time each answer took to generate is stored with it, so
+hits report the generation time they saved.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def normalize_question(question):
+    return " ".join(question.casefold().split()).rstrip("?.! ")
+
+
+def cache_key(question, documents, model, prompt_version):
+    """Key of the answer to a question over the (ordered) documents with a model and prompt version."""
+    key = {
+        "question": normalize_question(question),
+        "documents": [
+            [doc.metadata.get("profile_id"), hashlib.sha256(doc.page_content.encode("utf-8")).hexdigest()]
+            for doc in documents
+        ],
+        "model": model,
+        "prompt_version": prompt_version,
+    }
+    return hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """SQLite-backed, size-bounded LRU cache of generated answers."""
+
+    def __init__(self, path, max_bytes=64 * 2**20):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._stats = {
+            "lookups": 0,
+            "hits": 0,
+            "stores": 0,
+            "evictions": 0,
+            "time_saved_ms": 0.0,
+        }
+
+    def _connection(self):
+        # SQLite connections must not be shared across fork(), so each serving process opens its own
+        if self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS generations ("
+                " key TEXT PRIMARY KEY, answer TEXT, answer_bytes INTEGER,"
+                " generation_ms REAL, created_at REAL, last_used REAL, hits INTEGER DEFAULT 0)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS generations_last_used ON generations (last_used)")
+            # Running total of answer_bytes; summed once when a cache file without it is first opened
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache_size (id INTEGER PRIMARY KEY CHECK (id = 0), total_bytes INTEGER)"
+            )
+            self._conn.execute(
+                "INSERT OR IGNORE INTO cache_size (id, total_bytes)"
+                " SELECT 0, COALESCE(SUM(answer_bytes), 0) FROM generations"
+            )
+            self._conn.commit()
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, key):
+        """The cached answer for a key, or None."""
+        with self._lock:
+            conn = self._connection()
+            self._stats["lookups"] += 1
+            row = conn.execute("SELECT answer, generation_ms FROM generations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE generations SET last_used = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+            conn.commit()
+            self._stats["hits"] += 1
+            self._stats["time_saved_ms"] += row[1]
+            return row[0]
+
+    def put(self, key, answer, generation_ms):
+        """Store an answer and the time it took to generate, evicting old answers over the size limit."""
+        size = len(answer.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            # Other processes write to the same file; the write lock keeps the total consistent with the rows
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                old = conn.execute("SELECT answer_bytes FROM generations WHERE key = ?", (key,)).fetchone()
+                conn.execute(
+                    "INSERT OR REPLACE INTO generations (key, answer, answer_bytes, generation_ms, created_at, last_used)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, answer, size, generation_ms, now, now)
+                )
+                total = self._add_bytes(conn, size - (old[0] if old else 0))
+                self._stats["stores"] += 1
+                if total > self.max_bytes:
+                    self._stats["evictions"] += self._evict(conn, total)
+                conn.commit()
+            except BaseException:
+                conn.rollback()
+                raise
+
+    def _add_bytes(self, conn, delta):
+        conn.execute("UPDATE cache_size SET total_bytes = total_bytes + ? WHERE id = 0", (delta,))
+        return conn.execute("SELECT total_bytes FROM cache_size WHERE id = 0").fetchone()[0]
+
+    def _evict(self, conn, total):
+        """Delete the least recently used answers until the total is under the limit; returns how many."""
+        evicted = 0
+        while total > self.max_bytes:
+            # The oldest few at a time, through the last_used index, instead of ordering the whole table
+            rows = conn.execute("SELECT key, answer_bytes FROM generations ORDER BY last_used LIMIT 16").fetchall()
+            if not rows:
+                break
+            for key, size in rows:
+                if total <= self.max_bytes:
+                    break
+                conn.execute("DELETE FROM generations WHERE key = ?", (key,))
+                total = self._add_bytes(conn, -size)
+                evicted += 1
+        return evicted
+
+    def stats(self):
+        """Hit rate and generation time saved in this process, and the size of the (shared) cache."""
+        with self._lock:
+            stats = dict(self._stats)
+            conn = self._connection()
+            entries = conn.execute("SELECT COUNT(*) FROM generations").fetchone()[0]
+            size = conn.execute("SELECT total_bytes FROM cache_size WHERE id = 0").fetchone()[0]
+        stats["hit_rate"] = stats["hits"] / stats["lookups"] if stats["lookups"] else 0.0
+        stats["entries"] = entries
+        stats["bytes"] = size
+        stats["max_bytes"] = self.max_bytes
+        return stats
@@ -1,11 +1,13 @@
 import logging
 import sys
+import rag_profiles
 from rag_profiles import RAGQueryEngine
+from sessions import new_session_id
+from structured_logging import configure_logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, 
-                   format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                   stream=sys.stdout)
+# Configure logging: console and JSON log file, written by a background thread
+configure_logging(rag_profiles.LOG_PATH, rag_profiles.LOG_LEVEL, rag_profiles.LOG_MAX_MB * 2**20,
+                  rag_profiles.LOG_BACKUP_COUNT, rag_profiles.LOG_MAX_FIELD_CHARS, rag_profiles.LOG_SAMPLE_RATES)
 logger = logging.getLogger(__name__)
 
 def main():
@@ -17,7 +19,9 @@ def main():
 
         # Interactive loop
         print("\nWelcome to the Researcher Profile Query System!")
-        print("Enter your questions about researchers or type 'quit' to exit.\n")
+        print("Enter your questions about researchers or type 'quit' to exit.")
+        print("Follow-up questions can refer to the previous answer; type 'new' to start over.\n")
+        session_id = new_session_id()
         
         while True:
             # Get user input
@@ -30,11 +34,16 @@ def main():
             
             if not question:
                 continue
+
+            if question.lower() == 'new':
+                session_id = new_session_id()
+                print("\nStarted a new conversation.\n")
+                continue
             
             # Process question
             logger.info(f"Processing question: {question}")
             try:
-                response = rag_engine.query(question)
+                response = rag_engine.query(question, session_id=session_id)
                 print("\nSystem:", response, "\n")
             except Exception as e:
                 logger.error(f"Error processing question: {str(e)}")
@@ -0,0 +1,206 @@
+"""Load-balanced pool of Ollama endpoints, used as a LangChain chat model.
+
+RAGQueryEngine sends its grading and generation calls to an LLMPool instead
+of a single ChatOllama client. Every call goes to the available endpoint with
+the fewest calls in flight (least outstanding requests). An endpoint is not
+available when:
+  - its last health check failed: GET /api/tags must answer and list the
+    model (checked every `health_interval` seconds by a background thread), or
+  - its circuit breaker is open: after `failure_threshold` failed calls in a
+    row, it gets no calls for `reset_seconds`. Then a single trial call
+    closes the breaker again, or opens it for another `reset_seconds`.
+
+A call that fails on an endpoint (connection error, timeout, server error)
+is retried on another one. Grading can use its own pool, e.g. with a smaller
+model, so that it does not queue behind generation.
+"""
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import urllib.request
+
+from langchain_core.runnables import Runnable
+from langchain_ollama import ChatOllama
+from ollama import ResponseError
+
+logger = logging.getLogger(__name__)
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class NoEndpointAvailable(RuntimeError):
+    pass
+
+
+def serves_model(tags, model):
+    """Whether an /api/tags response lists a model ("llama3" is "llama3:latest")."""
+    names = {entry.get("name") for entry in tags.get("models", [])} | {entry.get("model") for entry in tags.get("models", [])}
+    return model in names or f"{model}:latest" in names
+
+
+def ollama_client(base_url, model, timeout):
+    return ChatOllama(model=model, base_url=base_url, temperature=0, client_kwargs={"timeout": timeout})
+
+
+class Endpoint:
+    """One Ollama server: its client, health, circuit breaker and counters."""
+
+    def __init__(self, url, client):
+        self.url = url
+        self.client = client
+        # Until the first health check says otherwise
+        self.healthy = True
+        self.breaker = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.outstanding = 0
+        self.stats = {"calls": 0, "failures": 0, "breaker_opened": 0, "total_ms": 0.0}
+
+    def describe(self):
+        return {"url": self.url, "healthy": self.healthy, "breaker": self.breaker, "outstanding": self.outstanding,
+                **self.stats, "avg_ms": self.stats["total_ms"] / self.stats["calls"] if self.stats["calls"] else 0.0}
+
+
+class LLMPool(Runnable):
+    """Chat model Runnable spreading calls over the endpoints serving `model`."""
+
+    def __init__(self, urls, model, failure_threshold=3, reset_seconds=30, health_interval=10, health_timeout=2,
+                 timeout=120, client_factory=ollama_client):
+        if not urls:
+            raise ValueError(f"No endpoints configured for {model}")
+        self.model = model
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.health_interval = health_interval
+        self.health_timeout = health_timeout
+        self.endpoints = [Endpoint(url.rstrip("/"), client_factory(url.rstrip("/"), model, timeout)) for url in urls]
+        self._lock = threading.Lock()
+        self._turn = itertools.count()
+        self._health_pid = None
+
+    def _available(self, endpoint, now, check_health=True):
+        if check_health and not endpoint.healthy:
+            return False
+        if endpoint.breaker == OPEN:
+            return now - endpoint.opened_at >= self.reset_seconds
+        # A half-open endpoint gets one trial call at a time
+        return endpoint.breaker != HALF_OPEN or endpoint.outstanding == 0
+
+    def _acquire(self, tried):
+        """Reserve the endpoint for the next call, or None if none is left to try."""
+        now = time.monotonic()
+        with self._lock:
+            untried = [endpoint for endpoint in self.endpoints if endpoint not in tried]
+            candidates = [endpoint for endpoint in untried if self._available(endpoint, now)]
+            if not candidates and not any(endpoint.healthy for endpoint in self.endpoints):
+                # Every health check failing is more likely a check problem than a total outage
+                candidates = [endpoint for endpoint in untried if self._available(endpoint, now, check_health=False)]
+            if not candidates:
+                return None
+            # Least outstanding requests; ties rotate so that idle endpoints share the calls
+            start = next(self._turn)
+            endpoint = min((candidates[(start + i) % len(candidates)] for i in range(len(candidates))),
+                           key=lambda candidate: candidate.outstanding)
+            if endpoint.breaker == OPEN:
+                endpoint.breaker = HALF_OPEN
+            endpoint.outstanding += 1
+            return endpoint
+
+    def _release(self, endpoint, succeeded, started):
+        """Return a reserved endpoint; succeeded is None when the call failed through no fault of the endpoint."""
+        elapsed_ms = 1000 * (time.perf_counter() - started)
+        with self._lock:
+            endpoint.outstanding -= 1
+            endpoint.stats["calls"] += 1
+            endpoint.stats["total_ms"] += elapsed_ms
+            if succeeded is None:
+                if endpoint.breaker == HALF_OPEN:
+                    endpoint.breaker = OPEN
+                return
+            if succeeded:
+                endpoint.consecutive_failures = 0
+                endpoint.breaker = CLOSED
+                return
+            endpoint.stats["failures"] += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.breaker == HALF_OPEN or endpoint.consecutive_failures >= self.failure_threshold:
+                if endpoint.breaker != OPEN:
+                    endpoint.stats["breaker_opened"] += 1
+                    logger.warning(f"Circuit breaker of {endpoint.url} ({self.model}) opened for {self.reset_seconds}s",
+                                   extra={"event": "llm_breaker_opened", "endpoint": endpoint.url, "model": self.model})
+                endpoint.breaker = OPEN
+                endpoint.opened_at = time.monotonic()
+
+    def invoke(self, input, config=None, **kwargs):
+        self.start_health_checks()
+        tried = []
+        last_error = None
+        while True:
+            endpoint = self._acquire(tried)
+            if endpoint is None:
+                raise NoEndpointAvailable(
+                    f"No endpoint available for {self.model} ({len(tried)} of {len(self.endpoints)} tried)"
+                ) from last_error
+            tried.append(endpoint)
+            started = time.perf_counter()
+            try:
+                result = endpoint.client.invoke(input, config, **kwargs)
+            except ResponseError as e:
+                # A bad request fails on every endpoint; a missing model or a server error is the endpoint's
+                if 400 <= e.status_code < 500 and e.status_code != 404:
+                    self._release(endpoint, None, started)
+                    raise
+                self._release(endpoint, False, started)
+                last_error = e
+            except Exception as e:
+                self._release(endpoint, False, started)
+                last_error = e
+            else:
+                self._release(endpoint, True, started)
+                return result
+            logger.warning(f"LLM call to {endpoint.url} ({self.model}) failed: {last_error}",
+                           extra={"event": "llm_call_failed", "endpoint": endpoint.url, "model": self.model})
+
+    def check_health(self):
+        """Check every endpoint once: /api/tags must answer and list the model."""
+        for endpoint in self.endpoints:
+            try:
+                with urllib.request.urlopen(f"{endpoint.url}/api/tags", timeout=self.health_timeout) as response:
+                    healthy = serves_model(json.load(response), self.model)
+            except (OSError, ValueError):
+                healthy = False
+            if healthy != endpoint.healthy:
+                logger.warning(f"LLM endpoint {endpoint.url} ({self.model}) is {'up' if healthy else 'down'}",
+                               extra={"event": "llm_endpoint_health", "endpoint": endpoint.url, "model": self.model,
+                                      "healthy": healthy})
+            endpoint.healthy = healthy
+
+    def start_health_checks(self):
+        """Check the endpoints every health_interval seconds in a background thread.
+
+        Safe to call repeatedly; after fork() the checker is restarted in the
+        calling process.
+        """
+        if not self.health_interval or self._health_pid == os.getpid():
+            return
+        with self._lock:
+            if self._health_pid == os.getpid():
+                return
+            self._health_pid = os.getpid()
+
+        def check():
+            while True:
+                try:
+                    self.check_health()
+                except Exception as e:
+                    logger.error(f"Error checking LLM endpoints: {e}")
+                time.sleep(self.health_interval)
+
+        threading.Thread(target=check, name=f"llm-health-{self.model}", daemon=True).start()
+
+    def stats(self):
+        with self._lock:
+            return {"model": self.model, "endpoints": [endpoint.describe() for endpoint in self.endpoints]}
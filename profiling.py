@@ -0,0 +1,243 @@
+"""Per-request sampling profiler for RAG queries.
+
+A profiled query samples the call stack of the thread that runs it every few
+milliseconds. Threads that do part of its work elsewhere, such as the shard
+search pool and the query-embedding batcher, are sampled too while they work
+for it (see `sampled_for`). The samples are written as a speedscope file
+(https://www.speedscope.app, which shows them as a flame graph, one profile
+per thread), next to a JSON file with the time spent in each graph node.
+Queries that are not profiled only pay for a flag check.
+
+Usage:
+    with RequestProfile(question, output_dir) as profile:
+        ...
+        profile.node_finished("retrieve")
+    profile.summary()
+"""
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+
+logger = logging.getLogger(__name__)
+
+# The profile of the query being answered, if it is profiled
+current_profile = contextvars.ContextVar("current_profile", default=None)
+
+
+class SamplingProfiler:
+    """Samples the call stack of one thread, and of the threads helping it, at a fixed interval.
+
+    Helper threads are sampled between add_thread() and remove_thread(), into
+    a profile of their own per thread name.
+    """
+
+    def __init__(self, thread_id=None, interval=0.005):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.frames = []
+        self.frame_indexes = {}
+        self.samples = []
+        self.weights = []
+        self.helper_samples = {}
+        self._helpers = {}
+        self._helpers_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def add_thread(self, ident, name):
+        """Sample another thread (until remove_thread) as working for this request."""
+        with self._helpers_lock:
+            count = self._helpers.get(ident, (name, 0))[1]
+            self._helpers[ident] = (name, count + 1)
+
+    def remove_thread(self, ident):
+        with self._helpers_lock:
+            name, count = self._helpers[ident]
+            if count > 1:
+                self._helpers[ident] = (name, count - 1)
+            else:
+                del self._helpers[ident]
+
+    def _frame_index(self, code):
+        index = self.frame_indexes.get(code)
+        if index is None:
+            index = len(self.frames)
+            self.frame_indexes[code] = index
+            self.frames.append({
+                "name": getattr(code, "co_qualname", code.co_name),
+                "file": code.co_filename,
+                "line": code.co_firstlineno,
+            })
+        return index
+
+    def _stack(self, frame):
+        stack = []
+        while frame is not None:
+            stack.append(self._frame_index(frame.f_code))
+            frame = frame.f_back
+        # Speedscope expects stacks from the root to the leaf
+        stack.reverse()
+        return stack
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            now = time.perf_counter()
+            frame = frames.get(self.thread_id)
+            if frame is None:
+                break
+            self.samples.append(self._stack(frame))
+            self.weights.append(now - last)
+            with self._helpers_lock:
+                helpers = list(self._helpers.items())
+            for ident, (name, _) in helpers:
+                if frames.get(ident) is not None:
+                    samples, weights = self.helper_samples.setdefault(name, ([], []))
+                    samples.append(self._stack(frames[ident]))
+                    weights.append(now - last)
+            last = now
+
+    def speedscope(self, name):
+        """The samples as a speedscope file (a dict ready for json.dump)."""
+        return {
+            "$schema": SPEEDSCOPE_SCHEMA,
+            "name": name,
+            "exporter": "langgraph_advanced_RAG profiling.py",
+            "shared": {"frames": self.frames},
+            "profiles": [
+                self._profile(name, self.samples, self.weights),
+                *(self._profile(f"{name} [{thread}]", samples, weights)
+                  for thread, (samples, weights) in self.helper_samples.items()),
+            ],
+        }
+
+    @staticmethod
+    def _profile(name, samples, weights):
+        return {
+            "type": "sampled",
+            "name": name,
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        }
+
+
+class RequestProfile:
+    """Sampling profile and per-node timings of one query, written to `output_dir` on exit.
+
+    Only the newest `keep` profiles are kept in `output_dir`.
+    """
+
+    def __init__(self, name, output_dir, interval=0.005, keep=100):
+        self.name = name
+        self.output_dir = output_dir
+        self.keep = keep
+        self.id = f"{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.profiler = SamplingProfiler(interval=interval)
+        self.nodes = []
+        self.total = None
+
+    def __enter__(self):
+        self.started_at = time.time()
+        self.start = self.last_mark = time.perf_counter()
+        self._token = current_profile.set(self)
+        self.profiler.start()
+        return self
+
+    def node_finished(self, node):
+        """Record the time since the previous node finished (or the query started)."""
+        now = time.perf_counter()
+        self.nodes.append((node, now - self.last_mark))
+        self.last_mark = now
+
+    def __exit__(self, exc_type, exc, tb):
+        self.total = time.perf_counter() - self.start
+        self.profiler.stop()
+        current_profile.reset(self._token)
+        try:
+            self.write()
+        except OSError as e:
+            logger.error(f"Error writing request profile: {e}")
+
+    def path(self, suffix):
+        return os.path.join(self.output_dir, f"{self.id}.{suffix}")
+
+    def timings(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "total_ms": round(1000 * self.total, 3),
+            "nodes": [
+                {"node": node, "ms": round(1000 * seconds, 3), "share": round(seconds / self.total, 4) if self.total else 0.0}
+                for node, seconds in self.nodes
+            ],
+            "samples": len(self.profiler.samples),
+            "helper_thread_samples": {thread: len(samples) for thread, (samples, _) in self.profiler.helper_samples.items()},
+            "interval_ms": 1000 * self.profiler.interval,
+        }
+
+    def write(self):
+        os.makedirs(self.output_dir, exist_ok=True)
+        with open(self.path("speedscope.json"), "w") as f:
+            json.dump(self.profiler.speedscope(self.name), f)
+        with open(self.path("timings.json"), "w") as f:
+            json.dump(self.timings(), f, indent=2)
+        prune_profiles(self.output_dir, self.keep)
+
+    def summary(self):
+        """Timings plus the names of the written files (in the output directory), e.g. for an API response."""
+        return {
+            **self.timings(),
+            "speedscope_file": f"{self.id}.speedscope.json",
+            "timings_file": f"{self.id}.timings.json",
+        }
+
+
+@contextmanager
+def sampled_for(profiles):
+    """Sample the calling thread as part of each of `profiles` (None entries are skipped) inside the block.
+
+    For threads that work for a profiled query outside its own thread, e.g. a
+    pool thread searching a shard; they do not see the query's current_profile.
+    """
+    profilers = [profile.profiler for profile in profiles if profile is not None]
+    ident, name = threading.get_ident(), threading.current_thread().name
+    for profiler in profilers:
+        profiler.add_thread(ident, name)
+    try:
+        yield
+    finally:
+        for profiler in profilers:
+            profiler.remove_thread(ident)
+
+
+def prune_profiles(output_dir, keep):
+    """Delete all but the newest `keep` profiles."""
+    timings = [name for name in os.listdir(output_dir) if name.endswith(".timings.json")]
+    timings.sort(key=lambda name: os.path.getmtime(os.path.join(output_dir, name)))
+    ids = [name.split(".", 1)[0] for name in timings]
+    for profile_id in ids[:-keep] if keep else ids:
+        for suffix in ("speedscope.json", "timings.json"):
+            path = os.path.join(output_dir, f"{profile_id}.{suffix}")
+            if os.path.exists(path):
+                os.remove(path)
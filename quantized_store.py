@@ -0,0 +1,260 @@
+"""Quantized vector store with two-stage rescoring.
+
+The embeddings of a Chroma collection are exported once into a directory:
+
+    <dir>/codes.npy         int8 codes (one byte per dimension) or packed sign
+                            bits (one bit per dimension), kept in memory
+    <dir>/quantizer.npz     per-dimension int8 scales, or the binary centre
+    <dir>/vectors.f32       full-precision vectors, memory-mapped from disk
+    <dir>/documents.jsonl   document IDs, texts and metadata, one JSON line each,
+                            read from disk when a result is returned
+    <dir>/offsets.npy       byte offset of every line in documents.jsonl
+    <dir>/manifest.json     format, mode, document count and dimension
+
+A search first scans every code: int8 dot products in blocks, or Hamming
+distances via XOR and a popcount lookup table for binary codes. It then
+rescores the best candidates against their full-precision vectors, reading
+only those rows from disk. Vectors are L2-normalized, so scores are cosine
+similarities.
+
+Usage:
+    python quantized_store.py build [--mode int8|binary] [--version VERSION]
+"""
+import argparse
+import json
+import mmap
+import os
+import shutil
+import sys
+from typing import Any
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+MODES = ("int8", "binary")
+QUANTIZED_DIR = "quantized"
+# Bumped when the files of a store change; older exports must be rebuilt
+FORMAT_VERSION = 2
+# Candidates rescored at full precision per requested result
+RESCORE_FACTOR = {"int8": 4, "binary": 10}
+SCAN_BLOCK_SIZE = 16384
+
+# Number of set bits in every byte and every 16-bit value (numpy 1.26 has no bitwise_count)
+POPCOUNT = np.array([bin(byte).count("1") for byte in range(256)], dtype=np.uint8)
+POPCOUNT16 = (POPCOUNT[:, None] + POPCOUNT[None, :]).reshape(-1)
+
+
+def normalize_rows(vectors):
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return (vectors / np.maximum(norms, 1e-12)).astype(np.float32)
+
+
+def fit_quantizer(vectors, mode):
+    """Per-dimension int8 scales, or the per-dimension mean that binary codes are centred on."""
+    if mode == "int8":
+        return {"scale": np.maximum(np.abs(vectors).max(axis=0), 1e-12).astype(np.float32) / 127}
+    return {"center": vectors.mean(axis=0).astype(np.float32)}
+
+
+def encode(vectors, mode, quantizer):
+    if mode == "int8":
+        return np.clip(np.rint(vectors / quantizer["scale"]), -127, 127).astype(np.int8)
+    return np.packbits(vectors > quantizer["center"], axis=1)
+
+
+def export_collection(collection, directory, mode="int8", page_size=5000):
+    """Write the quantized store of a Chroma collection to `directory` (replacing it)."""
+    if mode not in MODES:
+        raise ValueError(f"Unknown quantization mode {mode!r}; use one of {', '.join(MODES)}")
+    count = collection.count()
+    tmp_dir = f"{directory}.tmp.{os.getpid()}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    vectors = None
+    offset = 0
+    line_offsets = [0]
+    with open(os.path.join(tmp_dir, "documents.jsonl"), "wb") as documents:
+        while offset < count:
+            page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            embeddings = normalize_rows(np.asarray(page["embeddings"], dtype=np.float32))
+            if vectors is None:
+                vectors = np.memmap(os.path.join(tmp_dir, "vectors.f32"), dtype=np.float32, mode="w+",
+                                    shape=(count, embeddings.shape[1]))
+            vectors[offset:offset + len(embeddings)] = embeddings
+            for doc_id, text, metadata in zip(page["ids"], page["documents"], page["metadatas"]):
+                line_offsets.append(line_offsets[-1] + documents.write(
+                    (json.dumps([doc_id, text, metadata or {}], ensure_ascii=False) + "\n").encode("utf-8")))
+            offset += len(page["ids"])
+    if vectors is None:
+        raise ValueError("Cannot quantize an empty collection")
+    vectors.flush()
+
+    quantizer = fit_quantizer(vectors[:offset], mode)
+    codes = np.concatenate([
+        encode(vectors[start:min(start + SCAN_BLOCK_SIZE, offset)], mode, quantizer)
+        for start in range(0, offset, SCAN_BLOCK_SIZE)
+    ])
+    np.save(os.path.join(tmp_dir, "codes.npy"), codes)
+    np.savez(os.path.join(tmp_dir, "quantizer.npz"), **quantizer)
+    np.save(os.path.join(tmp_dir, "offsets.npy"), np.array(line_offsets, dtype=np.int64))
+    with open(os.path.join(tmp_dir, "manifest.json"), "w", encoding="utf-8") as f:
+        json.dump({"format": FORMAT_VERSION, "mode": mode, "count": offset, "dim": int(vectors.shape[1])}, f)
+    del vectors
+
+    # Move the old store aside before moving the new one in, so the directory
+    # is only missing between two renames rather than during a whole rmtree
+    old_dir = f"{directory}.old.{os.getpid()}"
+    if os.path.exists(directory):
+        os.rename(directory, old_dir)
+    os.rename(tmp_dir, directory)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def read_manifest(directory):
+    try:
+        with open(os.path.join(directory, "manifest.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def is_current(directory, mode, count):
+    """Whether `directory` holds a store of this format and mode with `count` documents."""
+    manifest = read_manifest(directory)
+    return (manifest is not None and manifest.get("format") == FORMAT_VERSION
+            and manifest["mode"] == mode and manifest["count"] == count)
+
+
+class DocumentFile:
+    """The documents of a store, read from documents.jsonl on demand.
+
+    Only the line offsets are kept in memory; items are (id, text, metadata).
+    """
+
+    def __init__(self, directory):
+        self.offsets = np.load(os.path.join(directory, "offsets.npy"))
+        with open(os.path.join(directory, "documents.jsonl"), "rb") as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return json.loads(self.data[self.offsets[i]:self.offsets[i + 1]])
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def close(self):
+        self.data.close()
+
+
+class QuantizedVectorStore:
+    """Read-only store searching quantized codes and rescoring memory-mapped vectors."""
+
+    def __init__(self, directory):
+        manifest = read_manifest(directory)
+        if manifest is None:
+            raise ValueError(f"No quantized store in {directory}")
+        if manifest.get("format") != FORMAT_VERSION:
+            raise ValueError(f"The quantized store in {directory} has an old format; rebuild it")
+        self.directory = directory
+        self.mode = manifest["mode"]
+        self.codes = np.load(os.path.join(directory, "codes.npy"))
+        with np.load(os.path.join(directory, "quantizer.npz")) as data:
+            self.quantizer = {key: data[key] for key in data.files}
+        # Binary codes with an even number of bytes are scanned 16 bits per lookup
+        self.wide_codes = self.mode == "binary" and self.codes.shape[1] % 2 == 0
+        self.vectors = np.memmap(os.path.join(directory, "vectors.f32"), dtype=np.float32, mode="r",
+                                 shape=(manifest["count"], manifest["dim"]))
+        self.documents = DocumentFile(directory)
+
+    def memory_bytes(self):
+        """Bytes held in memory: codes, quantizer and document offsets (vectors and documents stay on disk)."""
+        return (self.codes.nbytes + sum(value.nbytes for value in self.quantizer.values())
+                + self.documents.offsets.nbytes)
+
+    def scan(self, query, n):
+        """Stage 1: indexes of the n best candidates by their codes."""
+        if self.mode == "int8":
+            weights = query * self.quantizer["scale"]
+            scores = np.concatenate([
+                self.codes[start:start + SCAN_BLOCK_SIZE].astype(np.float32) @ weights
+                for start in range(0, len(self.codes), SCAN_BLOCK_SIZE)
+            ])
+        else:
+            bits = np.packbits(query > self.quantizer["center"])
+            if self.wide_codes:
+                distances = POPCOUNT16[np.bitwise_xor(self.codes.view(np.uint16), bits.view(np.uint16))]
+            else:
+                distances = POPCOUNT[np.bitwise_xor(self.codes, bits)]
+            # Fewer differing bits is better; negate so that larger is better
+            scores = -distances.sum(axis=1, dtype=np.int32)
+        if n >= len(scores):
+            return np.arange(len(scores))
+        return np.argpartition(-scores, n - 1)[:n]
+
+    def search(self, query, k, rescore_factor=None):
+        """Indexes and cosine similarities of the k nearest documents, best first."""
+        query = normalize_rows(np.asarray(query, dtype=np.float32)[None, :])[0]
+        candidates = np.sort(self.scan(query, k * (rescore_factor or RESCORE_FACTOR[self.mode])))
+        # Stage 2: exact scores for the candidates only
+        scores = self.vectors[candidates] @ query
+        best = np.argsort(-scores, kind="stable")[:k]
+        return candidates[best], scores[best]
+
+    def similarity_search_by_vector(self, embedding, k=4):
+        indexes, _ = self.search(embedding, k)
+        return [self.document(i) for i in indexes]
+
+    def document(self, i):
+        _, text, metadata = self.documents[i]
+        return Document(page_content=text, metadata=metadata)
+
+    def close(self):
+        self.vectors._mmap.close()
+        self.documents.close()
+
+
+class QuantizedRetriever(BaseRetriever):
+    """LangChain retriever over a QuantizedVectorStore."""
+
+    store: Any
+    embeddings: Any
+    k: int = 4
+
+    def _get_relevant_documents(self, query, *, run_manager=None):
+        return self.store.similarity_search_by_vector(self.embeddings.embed_query(query), self.k)
+
+
+def main():
+    import chromadb
+    import rag_profiles
+
+    parser = argparse.ArgumentParser(description="Build a quantized store from an index's Chroma collection")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="export and quantize the embeddings")
+    build_parser.add_argument("--mode", choices=MODES, default=rag_profiles.QUANTIZATION_MODE or "int8")
+    build_parser.add_argument("--version", help="snapshot version (default: the active snapshot, or EMBEDDINGS_DIR)")
+    args = parser.parse_args()
+
+    index_dir, chroma_dir, collection_name = rag_profiles.index_location(args.version)
+    directory = os.path.join(index_dir, QUANTIZED_DIR)
+    collection = chromadb.PersistentClient(path=chroma_dir).get_collection(collection_name)
+    export_collection(collection, directory, args.mode)
+    store = QuantizedVectorStore(directory)
+    print(f"Quantized {len(store.documents)} documents ({args.mode}) into {directory}: "
+          f"{store.memory_bytes() / 2**20:.1f} MiB in memory instead of {store.vectors.nbytes / 2**20:.1f} MiB")
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
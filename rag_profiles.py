@@ -1,19 +1,126 @@
+import logging
 import os
-import json
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
 from typing_extensions import TypedDict
-from typing import List
+from typing import Any, Dict, List
 from langchain_community.vectorstores import Chroma
 from langchain_community.embeddings import GPT4AllEmbeddings
 from langchain.prompts import PromptTemplate
-from langchain_ollama import ChatOllama
 from langchain_core.output_parsers import JsonOutputParser, StrOutputParser
 from langgraph.graph import END, StateGraph
 from langchain.schema import Document
+from chromadb.api.shared_system_client import SharedSystemClient
+from build_index import build_index, document_id
+from corpora import load_profiles, merge_results
+from embedding_service import QueryEmbeddingService
+from facets import FacetIndex, parse_facet_query
+from generation_cache import GenerationCache, cache_key
+from llm_pool import LLMPool
+from profiling import RequestProfile, current_profile, sampled_for
+from relevance_classifier import GradingStats, configure_verdict_log, load_classifier, log_verdict
+from quantized_store import QUANTIZED_DIR, QuantizedRetriever, QuantizedVectorStore, export_collection, is_current
+from sessions import SessionStore, new_session_id
+import similarity
+import snapshots
+import structured_logging
+from structured_logging import request_context, request_id_var
+
+logger = logging.getLogger(__name__)
 
 # Constants
 LOCAL_LLM = 'llama3'
+# Ollama servers that LLM calls are balanced over (least outstanding requests). Each is health-checked
+# (GET /api/tags) every LLM_HEALTH_INTERVAL seconds; one that fails LLM_FAILURE_THRESHOLD calls in a
+# row gets no calls for LLM_BREAKER_RESET_SECONDS. Grading can use a smaller, faster model (GRADER_LLM)
+# and its own servers (GRADER_ENDPOINTS; None uses LLM_ENDPOINTS).
+LLM_ENDPOINTS = ["http://localhost:11434"]
+GRADER_LLM = LOCAL_LLM
+GRADER_ENDPOINTS = None
+LLM_HEALTH_INTERVAL = 10
+LLM_FAILURE_THRESHOLD = 3
+LLM_BREAKER_RESET_SECONDS = 30
+LLM_TIMEOUT_SECONDS = 300
 JSON_FILE_PATH = "/home/svend/projects/langgraph_advanced_RAG/scraping/researchers_crig.json"
 EMBEDDINGS_DIR = "/home/svend/projects/langgraph_advanced_RAG/embeddings_db"
+# Index field-aware chunks (focus, keywords, positions, each project and
+# publication) and aggregate chunk hits back to unique profiles
+CHUNKING = True
+COLLECTION_NAME = "rag-chroma-chunks" if CHUNKING else "rag-chroma"
+# Number of unique profiles to retrieve and grade
+RETRIEVAL_K = 10
+# Number of chunks fetched before aggregating them to RETRIEVAL_K profiles
+CHUNK_FETCH_K = 60
+# Matched chunks (e.g. publications, projects) shown with a profile to the grader and generator
+MATCHED_CHUNKS_MAX = 5
+# Versioned index snapshots; EMBEDDINGS_DIR and JSON_FILE_PATH are used until one is activated
+SNAPSHOTS_DIR = "/home/svend/projects/langgraph_advanced_RAG/snapshots"
+# Retired snapshots are closed and deleted after this many seconds
+SNAPSHOT_GRACE_SECONDS = 600
+SNAPSHOT_WATCH_INTERVAL = 10
+# Query embeddings are batched for up to EMBED_MAX_WAIT_MS and cached (LRU); a query
+# waits at most EMBED_TIMEOUT_SECONDS for its embedding
+EMBED_BATCH_SIZE = 32
+EMBED_MAX_WAIT_MS = 5
+EMBED_CACHE_SIZE = 1024
+EMBED_TIMEOUT_SECONDS = 30
+# Request profiling: profiles are written here; a fraction of all queries is profiled
+PROFILES_DIR = "/home/svend/projects/langgraph_advanced_RAG/profiles"
+PROFILE_SAMPLE_RATE = 0.0
+PROFILE_INTERVAL_MS = 5
+PROFILE_KEEP = 100
+# Similar researchers: neighbours stored per profile, and returned by default
+SIMILAR_TOP_N = 20
+SIMILAR_K = 10
+# Retrieve from quantized codes with full-precision rescoring: None (Chroma), "int8" or "binary"
+QUANTIZATION_MODE = None
+# Conversation sessions for follow-up questions, shared by all serving processes through
+# SESSION_DB_PATH: at most SESSION_MAX, evicted after SESSION_TTL_SECONDS idle, each
+# remembering its last SESSION_MAX_TURNS turns
+SESSION_DB_PATH = "/home/svend/projects/langgraph_advanced_RAG/sessions.sqlite3"
+SESSION_MAX = 1000
+SESSION_TTL_SECONDS = 1800
+SESSION_MAX_TURNS = 5
+# Generated answers are cached by question, graded documents, LLM and prompt version;
+# bump GENERATION_PROMPT_VERSION when rag_generation_prompt changes. None disables the cache.
+GENERATION_CACHE_PATH = "/home/svend/projects/langgraph_advanced_RAG/generation_cache.sqlite3"
+GENERATION_CACHE_MAX_MB = 64
+GENERATION_PROMPT_VERSION = 1
+# Grading: "llm" (retrieval_grader), "classifier" (the local relevance classifier) or
+# "hybrid" (the classifier, asking the LLM when its probability is within CLASSIFIER_CONFIDENCE
+# of undecided). LLM verdicts are logged to VERDICT_LOG_PATH as training data.
+GRADING_MODE = "llm"
+CLASSIFIER_CONFIDENCE = 0.9
+# Share of the classifier's own decisions in hybrid mode also graded by the LLM, to measure their agreement
+CLASSIFIER_AUDIT_RATE = 0.02
+CLASSIFIER_PATH = "/home/svend/projects/langgraph_advanced_RAG/relevance_classifier.npz"
+# The verdict log is rotated at VERDICT_LOG_MAX_MB into VERDICT_LOG_BACKUP_COUNT gzipped files, which training reads too
+VERDICT_LOG_PATH = "/home/svend/projects/langgraph_advanced_RAG/logs/grader_verdicts.jsonl"
+VERDICT_LOG_MAX_MB = 100
+VERDICT_LOG_BACKUP_COUNT = 10
+LEGACY_LOG_PATH = "/home/svend/projects/langgraph_advanced_RAG/rag_operations.log"
+# Operational log: JSON lines written off the request path (see structured_logging.py), rotated
+# at LOG_MAX_MB into LOG_BACKUP_COUNT gzipped files. Fields longer than LOG_MAX_FIELD_CHARS are
+# truncated; the events in LOG_SAMPLE_RATES are only logged for that fraction of the requests.
+LOG_PATH = "/home/svend/projects/langgraph_advanced_RAG/logs/rag_operations.jsonl"
+LOG_LEVEL = "INFO"
+LOG_MAX_MB = 50
+LOG_BACKUP_COUNT = 5
+LOG_MAX_FIELD_CHARS = 1000
+LOG_SAMPLE_RATES = {"document_graded": 0.1}
+# Additional profile corpora, each indexed as its own shard (built on first use) and
+# searched in parallel with the primary index; see corpora.py for the schemas
+CORPORA = [
+    {
+        "name": "ai_ugent",
+        "schema": "ai_ugent",
+        "json_file_path": "/home/svend/projects/langgraph_advanced_RAG/researchers.json",
+        "embeddings_dir": "/home/svend/projects/langgraph_advanced_RAG/shards/ai_ugent",
+    },
+]
 
 # Define the state class
 class GraphState(TypedDict):
@@ -24,69 +131,487 @@ class GraphState(TypedDict):
         question (str): The user's question.
         generation (str): The generated response from the LLM.
         documents (List[str]): A list of retrieved documents.
+        session (Session): The conversation session, if any.
+        from_previous_turn (bool): Whether the documents are the previous turn's relevant profiles.
+        previous_question (str): The question a follow-up refers to.
+        verdicts (Dict[str, bool]): The grader's verdict on every graded profile.
     """
     question: str
     generation: str
     documents: List[str]
+    session: Any
+    from_previous_turn: bool
+    previous_question: str
+    verdicts: Dict[str, bool]
 
-# Load documents from the JSON file.
-def load_documents_from_json(json_file_path):
-    docs_list = []
-    with open(json_file_path, "r", encoding="utf-8") as file:
-        data = json.load(file)
-        for profile in data:
-            content = (
-                f"Name: {profile.get('name', 'N/A')}\n"
-                f"Profile URL: {profile.get('profile_url', 'N/A')}\n"
-                f"Description: {profile.get('description', 'N/A')}\n"
-                f"Keywords: {', '.join(profile.get('keywords', []))}\n"
-                f"Research Focus: {profile.get('research_focus', 'N/A')}\n"
-                f"Contact Info: {profile.get('contact_info', 'N/A')}\n"
-                f"Links: {', '.join([link['text'] + ' (' + link['url'] + ')' for link in profile.get('links', [])])}"
-            )
-            # Create one document per researcher profile
-            docs_list.append(Document(page_content=content))
-    return docs_list
+# Identify a researcher profile; chunks refer back to their profile with it.
+def profile_id(profile):
+    return profile.get('profile_url') or profile.get('name', 'N/A')
+
+# Format the full profile shown to the grader and the generator.
+def format_profile(profile):
+    return (
+        f"Name: {profile.get('name', 'N/A')}\n"
+        f"Profile URL: {profile.get('profile_url', 'N/A')}\n"
+        f"Description: {profile.get('description', 'N/A')}\n"
+        f"Keywords: {', '.join(profile.get('keywords', []))}\n"
+        f"Research Focus: {profile.get('research_focus', 'N/A')}\n"
+        f"Contact Info: {profile.get('contact_info', 'N/A')}\n"
+        f"Links: {', '.join([link['text'] + ' (' + link['url'] + ')' for link in profile.get('links', [])])}"
+    )
+
+# Split a profile into field-aware chunks, each tagged with its parent profile.
+def chunk_profile(profile):
+    name = profile.get('name', 'N/A')
+    chunks = []
+
+    def add(field, text):
+        if text:
+            chunks.append(Document(
+                page_content=f"Name: {name}\n{text}",
+                metadata={"profile_id": profile_id(profile), "name": name, "field": field}
+            ))
+
+    add("description", profile.get('description') and f"Description: {profile['description']}")
+    add("research_focus", profile.get('research_focus') and f"Research Focus: {profile['research_focus']}")
+    keywords = profile.get('keywords', []) + profile.get('expertise', [])
+    add("keywords", keywords and f"Keywords: {', '.join(keywords)}")
+    positions = [
+        ", ".join(position[key] for key in ('title', 'department', 'faculty') if position.get(key))
+        for position in profile.get('current_positions', [])
+    ]
+    add("positions", positions and "Positions: " + "; ".join(positions))
+    disciplines = [
+        discipline['name']
+        for category in profile.get('research_disciplines', [])
+        for discipline in category.get('disciplines', [])
+    ]
+    add("disciplines", disciplines and f"Research Disciplines: {', '.join(disciplines)}")
+
+    # Projects are grouped by role (promotor, copromotor, fellow)
+    for role, projects in (profile.get('projects') or {}).items():
+        for project in projects:
+            text = f"Project ({role}): {project.get('title', 'N/A')}"
+            if project.get('description'):
+                text += f"\nDescription: {project['description']}"
+            add("project", text)
+
+    for publication in profile.get('publications', []):
+        text = f"Publication ({publication.get('year', 'N/A')}): {publication.get('title', 'N/A')}"
+        if publication.get('venue'):
+            text += f"\nVenue: {publication['venue']}"
+        add("publication", text)
+
+    # Keep profiles without any of these fields retrievable (e.g. by name)
+    if not chunks:
+        add("profile", f"Profile URL: {profile.get('profile_url', 'N/A')}")
+    return chunks
+
+# Create one document per researcher profile.
+def profile_documents(profiles):
+    return [
+        Document(
+            page_content=format_profile(profile),
+            metadata={"profile_id": profile_id(profile), "name": profile.get('name', 'N/A')}
+        )
+        for profile in profiles
+    ]
+
+# Load documents from the JSON file (of a corpus schema, see corpora.py).
+def load_documents_from_json(json_file_path, schema="crig"):
+    return profile_documents(load_profiles(json_file_path, schema))
+
+# Load the profile documents and the documents to embed (chunks if CHUNKING).
+def load_index_documents(json_file_path, schema="crig"):
+    profiles = load_profiles(json_file_path, schema)
+    docs_list = profile_documents(profiles)
+    if not CHUNKING:
+        return docs_list, docs_list
+    return docs_list, [chunk for profile in profiles for chunk in chunk_profile(profile)]
+
+# Aggregate chunk hits (ordered by similarity) into at most k unique profiles.
+# The text of the matched chunks that the profile text lacks (publications,
+# projects, positions, ...) is appended, so the grader sees why it matched.
+def aggregate_chunks(chunks, profiles, k, max_matched=MATCHED_CHUNKS_MAX):
+    matched = {}
+    for chunk in chunks:
+        pid = chunk.metadata.get("profile_id")
+        if pid not in profiles:
+            continue
+        if pid not in matched:
+            if len(matched) == k:
+                continue
+            matched[pid] = {"fields": [], "texts": []}
+        field = chunk.metadata.get("field")
+        if field not in matched[pid]["fields"]:
+            matched[pid]["fields"].append(field)
+        # Chunks start with the researcher's name, which the profile text already has
+        text = chunk.page_content.split("\n", 1)[-1]
+        if (len(matched[pid]["texts"]) < max_matched and text not in matched[pid]["texts"]
+                and text not in profiles[pid].page_content):
+            matched[pid]["texts"].append(text)
+    return [
+        Document(
+            page_content=profiles[pid].page_content
+            + ("\nMatched:\n" + "\n".join(match["texts"]) if match["texts"] else ""),
+            metadata={**profiles[pid].metadata, "matched_fields": ", ".join(match["fields"])}
+        )
+        for pid, match in matched.items()
+    ]
+
+# Build the facet index over the structured fields of the profiles.
+def load_facet_index(json_file_path, schema="crig"):
+    return FacetIndex.build(load_profiles(json_file_path, schema), profile_id)
+
+# Describe facet filters for a facet lookup answer, e.g. 'keyword "proteomics"'.
+def describe_filters(filters, facet_index):
+    parts = []
+    for facet, text, prefix in filters:
+        terms = facet_index.matching_terms(facet, text)
+        label = f"{text}*" if prefix or not terms else facet_index.labels[facet][terms[0]]
+        parts.append(f'{facet} "{label}"')
+    return " and ".join(parts)
+
+# Create the embedding function shared by every retriever and cache.
+def create_embedding_function():
+    return QueryEmbeddingService(
+        GPT4AllEmbeddings(),
+        max_batch_size=EMBED_BATCH_SIZE,
+        max_wait_ms=EMBED_MAX_WAIT_MS,
+        cache_size=EMBED_CACHE_SIZE,
+        timeout=EMBED_TIMEOUT_SECONDS
+    )
 
 # Create or load a vector store using the Chroma library.
-def create_vector_store(documents):
-    embedding_function = GPT4AllEmbeddings()
-    
+def create_vector_store(documents, embedding_function, persist_directory=EMBEDDINGS_DIR, collection_name=COLLECTION_NAME,
+                        quantized_directory=None):
     # Try to load existing embeddings
-    if os.path.exists(EMBEDDINGS_DIR):
+    if os.path.exists(persist_directory):
         try:
             vectorstore = Chroma(
-                persist_directory=EMBEDDINGS_DIR,
+                persist_directory=persist_directory,
                 embedding_function=embedding_function,
-                collection_name="rag-chroma"
+                collection_name=collection_name
             )
-            # If collection exists and has documents, return it
-            if vectorstore._collection.count() > 0:
+            # If the collection holds every document, return it; a partial
+            # collection is left by an interrupted build and is resumed below.
+            # Identical chunks share an ID and are stored once.
+            if vectorstore._collection.count() >= len({document_id(doc) for doc in documents}):
                 return vectorstore
         except Exception as e:
-            print(f"Error loading existing embeddings: {e}")
+            logger.error(f"Error loading existing embeddings: {e}")
     
     # Create new embeddings if none exist or loading failed
-    vectorstore = Chroma.from_documents(
-        documents=documents,
-        embedding=embedding_function,
-        persist_directory=EMBEDDINGS_DIR,
-        collection_name="rag-chroma"
+    build_index(documents, persist_directory, collection_name)
+    vectorstore = Chroma(
+        persist_directory=persist_directory,
+        embedding_function=embedding_function,
+        collection_name=collection_name
     )
-    vectorstore.persist()
+    # Export the quantized store with the index it belongs to
+    if QUANTIZATION_MODE is not None and quantized_directory is not None:
+        export_collection(vectorstore._collection, quantized_directory, QUANTIZATION_MODE)
     return vectorstore
 
+# Release the Chroma system behind a vector store. Chroma caches one system per
+# persist directory for the lifetime of the process, so swapped-out snapshots
+# would otherwise stay in memory.
+def close_vector_store(vectorstore):
+    client = vectorstore._client
+    system = SharedSystemClient._identifier_to_system.pop(client._identifier, None)
+    if system is not None:
+        system.stop()
+
+# Build the vector store of a new snapshot (see snapshots.build_snapshot).
+def build_snapshot_store(profiles_path, chroma_dir):
+    docs_list, index_docs = load_index_documents(profiles_path)
+    vectorstore = create_vector_store(index_docs, create_embedding_function(), chroma_dir)
+    # Update the active snapshot's similarity graph instead of recomputing it
+    version = snapshots.current_version(SNAPSHOTS_DIR)
+    previous = version and os.path.join(snapshots.snapshot_path(SNAPSHOTS_DIR, version), similarity.SIMILARITY_FILE)
+    similarity.update_graph_file(
+        vectorstore._collection,
+        os.path.join(os.path.dirname(chroma_dir), similarity.SIMILARITY_FILE),
+        SIMILAR_TOP_N,
+        previous_path=previous if previous and os.path.exists(previous) else None
+    )
+    if QUANTIZATION_MODE is not None:
+        export_collection(vectorstore._collection, os.path.join(os.path.dirname(chroma_dir), QUANTIZED_DIR), QUANTIZATION_MODE)
+    close_vector_store(vectorstore)
+    return {
+        "profile_count": len(docs_list),
+        "document_count": len(index_docs),
+        "chunked": CHUNKING,
+        "collection_name": COLLECTION_NAME,
+        "embedding_model": "GPT4AllEmbeddings",
+        "similar_top_n": SIMILAR_TOP_N,
+        "quantization_mode": QUANTIZATION_MODE,
+    }
+
+class ProfileIndex:
+    """A loaded, read-only profile index: documents, vector store, retriever, similarity graph and facets."""
+
+    def __init__(self, docs_list, vectorstore, version=None, chunked=False, similarity_graph=None, facets=None,
+                 quantized_store=None, name="crig"):
+        self.name = name
+        self.docs_list = docs_list
+        self.profiles = {doc.metadata["profile_id"]: doc for doc in docs_list}
+        self.names = {doc.metadata["name"].lower(): doc.metadata["profile_id"] for doc in docs_list}
+        self.similarity_graph = similarity_graph
+        self.facets = facets or FacetIndex()
+        self.vectorstore = vectorstore
+        self.chunked = chunked
+        self.quantized_store = quantized_store
+        # Chunked indexes fetch more hits, which are aggregated to RETRIEVAL_K profiles
+        k = CHUNK_FETCH_K if chunked else RETRIEVAL_K
+        if quantized_store is not None:
+            self.retriever = QuantizedRetriever(store=quantized_store, embeddings=vectorstore.embeddings, k=k)
+        else:
+            self.retriever = vectorstore.as_retriever(search_kwargs={"k": k})
+        self.version = version
+
+    def retrieve(self, question):
+        documents = self.retriever.invoke(question)
+        if self.chunked:
+            documents = aggregate_chunks(documents, self.profiles, RETRIEVAL_K)
+        return documents
+
+    def search(self, embedding):
+        """The RETRIEVAL_K profiles nearest to a query embedding as (document, score), best first.
+
+        Scores are comparable between indexes with the same embedding model
+        and retrieval backend, so results of several shards can be merged.
+        """
+        k = CHUNK_FETCH_K if self.chunked else RETRIEVAL_K
+        if self.quantized_store is not None:
+            indexes, scores = self.quantized_store.search(embedding, k)
+            hits = [
+                (self.quantized_store.document(i), float(score))
+                for i, score in zip(indexes, scores)
+            ]
+        else:
+            relevance = self.vectorstore._select_relevance_score_fn()
+            hits = [
+                (doc, relevance(distance))
+                for doc, distance in self.vectorstore.similarity_search_by_vector_with_relevance_scores(embedding, k)
+            ]
+        # A profile scores as its best-matching chunk
+        best = {}
+        for doc, score in hits:
+            best.setdefault(doc.metadata.get("profile_id"), score)
+        if self.chunked:
+            documents = aggregate_chunks([doc for doc, _ in hits], self.profiles, RETRIEVAL_K)
+        else:
+            documents = [self.profiles[pid] for pid in best if pid in self.profiles]
+        return [(doc, best[doc.metadata["profile_id"]]) for doc in documents]
+
+    def profile_scores(self, embedding, profile_ids):
+        """Similarity of the mean embedding of profiles (of this index) to a query embedding."""
+        graph = self.similarity_graph
+        if graph is None:
+            return {}
+        query = np.asarray(embedding, dtype=np.float32)
+        return {pid: float(graph.vectors[graph.rows[pid]] @ query) for pid in profile_ids if pid in graph}
+
+    def rerank(self, question, profile_ids):
+        """Profiles (of this index) ordered by the similarity of their mean embedding to a question."""
+        profile_ids = [pid for pid in profile_ids if pid in self.profiles]
+        if self.similarity_graph is None or not profile_ids:
+            return [self.profiles[pid] for pid in profile_ids]
+        scores = self.profile_scores(self.vectorstore.embeddings.embed_query(question), profile_ids)
+        # Profiles missing from the graph keep their order after the scored ones
+        ranked = sorted(profile_ids, key=lambda pid: -scores.get(pid, -np.inf))
+        return [self.profiles[pid] for pid in ranked]
+
+    def similar(self, researcher, k):
+        """The k profiles most similar to a researcher (profile ID or name), from the precomputed graph."""
+        if self.similarity_graph is None:
+            raise ValueError("No similarity graph was built for this index; run python similarity.py")
+        pid = researcher if researcher in self.profiles else self.names.get(researcher.strip().lower())
+        if pid is None or pid not in self.similarity_graph:
+            raise KeyError(researcher)
+        return [
+            {"profile_id": neighbor, "name": self.profiles[neighbor].metadata["name"], "score": score}
+            for neighbor, score in self.similarity_graph.similar(pid, k)
+            if neighbor in self.profiles
+        ]
+
+    def facet_search(self, filters):
+        """Profiles matching every (facet, text, prefix) filter, sorted by name."""
+        docs = [self.profiles[pid] for pid in self.facets.search(filters) if pid in self.profiles]
+        return sorted(docs, key=lambda doc: doc.metadata["name"].lower())
+
+    def close(self):
+        if self.quantized_store is not None:
+            self.quantized_store.close()
+        close_vector_store(self.vectorstore)
+
+class ShardedIndex:
+    """The primary index and the shards of the other corpora, searched in parallel as one index.
+
+    Retrieval embeds the question once, searches every shard on a thread
+    pool and merges the hits by score; researchers found in several corpora
+    are kept once. The extra shards are shared between the primary indexes
+    of successive snapshots, so close() only closes the primary.
+    """
+
+    def __init__(self, primary, shards):
+        self.primary = primary
+        self.shards = [primary] + list(shards)
+        self.version = primary.version
+        self.profiles = {}
+        for shard in reversed(self.shards):
+            self.profiles.update(shard.profiles)
+        self.facets = FacetIndex.merge([shard.facets for shard in self.shards])
+        self._executor = None
+        self._executor_pid = None
+
+    def _map(self, function, shards):
+        # Threads do not survive fork(), so the pool is created in the serving process
+        if self._executor_pid != os.getpid():
+            self._executor = ThreadPoolExecutor(max_workers=len(self.shards), thread_name_prefix="shard-search")
+            self._executor_pid = os.getpid()
+        profile = current_profile.get()
+        if profile is not None:
+            # Pool threads do not inherit the query's context; sample them as part of its profile
+            return list(self._executor.map(lambda shard: self._sampled(profile, function, shard), shards))
+        return list(self._executor.map(function, shards))
+
+    @staticmethod
+    def _sampled(profile, function, shard):
+        with sampled_for([profile]):
+            return function(shard)
+
+    def _embed(self, question):
+        return self.primary.vectorstore.embeddings.embed_query(question)
+
+    def retrieve(self, question):
+        embedding = self._embed(question)
+        hits = self._map(lambda shard: shard.search(embedding), self.shards)
+        return [doc for doc, _ in merge_results(hits, RETRIEVAL_K)]
+
+    def rerank(self, question, profile_ids):
+        profile_ids = [pid for pid in profile_ids if pid in self.profiles]
+        if not profile_ids:
+            return []
+        embedding = self._embed(question)
+        scores = {}
+        for shard in self.shards:
+            scores.update(shard.profile_scores(embedding, [pid for pid in profile_ids if pid in shard.profiles]))
+        ranked = sorted(profile_ids, key=lambda pid: -scores.get(pid, -np.inf))
+        return [self.profiles[pid] for pid in ranked]
+
+    def similar(self, researcher, k):
+        """Similar researchers from the graph of the (first) shard that has the researcher."""
+        for shard in self.shards:
+            if shard.similarity_graph is None:
+                continue
+            try:
+                return shard.similar(researcher, k)
+            except KeyError:
+                continue
+        if all(shard.similarity_graph is None for shard in self.shards):
+            raise ValueError("No similarity graph was built for this index; run python similarity.py")
+        raise KeyError(researcher)
+
+    def facet_search(self, filters):
+        """Profiles of every shard matching every filter, sorted by name, once per researcher."""
+        ids = self.facets.search(filters)
+        # The primary index comes first, so its profile is kept for researchers in several corpora
+        hits = [[(shard.profiles[pid], 0.0) for pid in ids if pid in shard.profiles] for shard in self.shards]
+        hits = merge_results(hits, sum(len(shard_hits) for shard_hits in hits))
+        return sorted((doc for doc, _ in hits), key=lambda doc: doc.metadata["name"].lower())
+
+    def describe(self):
+        return [{"name": shard.name, "version": shard.version, "profiles": len(shard.profiles)} for shard in self.shards]
+
+    def close(self):
+        if self._executor is not None and self._executor_pid == os.getpid():
+            self._executor.shutdown(wait=False)
+        self.primary.close()
+
+# Load the quantized store of a vector store (if QUANTIZATION_MODE is set). Stores are
+# exported when an index is built; a missing or stale store falls back to Chroma.
+def load_quantized_store(vectorstore, directory):
+    if QUANTIZATION_MODE is None:
+        return None
+    if not is_current(directory, QUANTIZATION_MODE, vectorstore._collection.count()):
+        logger.warning(f"No up-to-date {QUANTIZATION_MODE} store in {directory}; searching Chroma instead. "
+                       f"Run python quantized_store.py build to export it.")
+        return None
+    return QuantizedVectorStore(directory)
+
+# Locate an index (default: the active snapshot, or EMBEDDINGS_DIR): the directory
+# for files stored with it, its Chroma directory and its collection name.
+def index_location(version=None):
+    version = version or snapshots.current_version(SNAPSHOTS_DIR)
+    if version is None:
+        return EMBEDDINGS_DIR, EMBEDDINGS_DIR, COLLECTION_NAME
+    path = snapshots.snapshot_path(SNAPSHOTS_DIR, version)
+    metadata = snapshots.read_json(os.path.join(path, snapshots.METADATA_FILE), {})
+    return path, os.path.join(path, snapshots.CHROMA_DIR), metadata.get("collection_name", COLLECTION_NAME)
+
+# Load (building it if needed) the index of a profile JSON file in its own Chroma directory.
+def load_corpus_index(json_file_path, embedding_function, embeddings_dir, schema="crig", name="crig"):
+    docs_list, index_docs = load_index_documents(json_file_path, schema)
+    vectorstore = create_vector_store(index_docs, embedding_function, embeddings_dir,
+                                      quantized_directory=os.path.join(embeddings_dir, QUANTIZED_DIR))
+    similarity_graph = similarity.update_graph_file(
+        vectorstore._collection, os.path.join(embeddings_dir, similarity.SIMILARITY_FILE), SIMILAR_TOP_N
+    )
+    return ProfileIndex(docs_list, vectorstore, chunked=CHUNKING, similarity_graph=similarity_graph,
+                        facets=load_facet_index(json_file_path, schema),
+                        quantized_store=load_quantized_store(vectorstore, os.path.join(embeddings_dir, QUANTIZED_DIR)),
+                        name=name)
+
+# Load the shard of every corpus in CORPORA.
+def load_shards(embedding_function):
+    return [
+        load_corpus_index(corpus["json_file_path"], embedding_function, corpus["embeddings_dir"],
+                          schema=corpus["schema"], name=corpus["name"])
+        for corpus in CORPORA
+    ]
+
+# Load the active snapshot, or the legacy EMBEDDINGS_DIR index if none is active.
+def load_index(embedding_function, version=None):
+    version = version or snapshots.current_version(SNAPSHOTS_DIR)
+    if version is None:
+        return load_corpus_index(JSON_FILE_PATH, embedding_function, EMBEDDINGS_DIR)
+
+    path = snapshots.snapshot_path(SNAPSHOTS_DIR, version)
+    if snapshots.read_manifest(path) is None:
+        raise ValueError(f"Snapshot {version} does not exist in {SNAPSHOTS_DIR}")
+    metadata = snapshots.read_json(os.path.join(path, snapshots.METADATA_FILE), {})
+    docs_list = load_documents_from_json(os.path.join(path, snapshots.PROFILES_FILE))
+    vectorstore = Chroma(
+        persist_directory=os.path.join(path, snapshots.CHROMA_DIR),
+        embedding_function=embedding_function,
+        collection_name=metadata.get("collection_name", COLLECTION_NAME)
+    )
+    similarity_graph = similarity.load_graph(os.path.join(path, similarity.SIMILARITY_FILE))
+    return ProfileIndex(docs_list, vectorstore, version=version, chunked=metadata.get("chunked", False),
+                        similarity_graph=similarity_graph,
+                        facets=load_facet_index(os.path.join(path, snapshots.PROFILES_FILE)),
+                        quantized_store=load_quantized_store(vectorstore, os.path.join(path, QUANTIZED_DIR)))
+
+# Create the pool of Ollama endpoints serving a model.
+def create_llm_pool(endpoints, model):
+    return LLMPool(endpoints, model, failure_threshold=LLM_FAILURE_THRESHOLD, reset_seconds=LLM_BREAKER_RESET_SECONDS,
+                   health_interval=LLM_HEALTH_INTERVAL, timeout=LLM_TIMEOUT_SECONDS)
+
 # Format documents for use as context
 def format_docs(docs):
     return "\n\n".join(doc.page_content for doc in docs)
 
 class RAGQueryEngine:
     def __init__(self):
-        # Load documents and create vector store directly without splitting
-        self.docs_list = load_documents_from_json(JSON_FILE_PATH)
-        self.vectorstore = create_vector_store(self.docs_list)
-        # Set the number of documents to retrieve (e.g., 10)
-        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 10})
+        # Load profile documents and their (chunked) vector store
+        self.embeddings = create_embedding_function()
+        self.shards = load_shards(self.embeddings)
+        self.index = self._with_shards(load_index(self.embeddings))
+        self._swap_lock = threading.Lock()
+        self._retired_indexes = []
+        self._watcher_pid = None
         
         # Create prompt templates
         self.retrieval_grader_prompt = PromptTemplate(
@@ -152,65 +677,326 @@ You are allowed to end with a suggestion for a beter user query if that would be
             input_variables=["question", "context"]
         )
 
-        # Set up LLM and chains
-        self.llm = ChatOllama(model=LOCAL_LLM, temperature=0)
-        self.retrieval_grader = self.retrieval_grader_prompt | self.llm | JsonOutputParser()
+        # Set up LLM and chains; the grader shares the generation pool unless it is configured apart
+        self.llm = create_llm_pool(LLM_ENDPOINTS, LOCAL_LLM)
+        grader_endpoints = GRADER_ENDPOINTS or LLM_ENDPOINTS
+        self.grader_llm = self.llm if (GRADER_LLM, grader_endpoints) == (LOCAL_LLM, LLM_ENDPOINTS) \
+            else create_llm_pool(grader_endpoints, GRADER_LLM)
+        self.retrieval_grader = self.retrieval_grader_prompt | self.grader_llm | JsonOutputParser()
+        configure_verdict_log(VERDICT_LOG_PATH, VERDICT_LOG_MAX_MB * 2**20, VERDICT_LOG_BACKUP_COUNT)
+        self.grading_stats = GradingStats()
+        self.relevance_classifier = None
+        if GRADING_MODE != "llm":
+            self.relevance_classifier = load_classifier(CLASSIFIER_PATH, self.embeddings)
+            if self.relevance_classifier is None:
+                logger.warning(f"No relevance classifier at {CLASSIFIER_PATH}; grading with the LLM. "
+                               f"Train one with python relevance_classifier.py train")
         self.rag_chain = self.rag_generation_prompt | self.llm | StrOutputParser()
 
         # Set up workflow
         self.workflow = self._create_workflow()
         self.app = self.workflow.compile()
+        self.sessions = SessionStore(SESSION_DB_PATH, SESSION_MAX, SESSION_TTL_SECONDS, SESSION_MAX_TURNS)
+        self.generation_cache = GenerationCache(GENERATION_CACHE_PATH, GENERATION_CACHE_MAX_MB * 2**20) \
+            if GENERATION_CACHE_PATH else None
 
     def _create_workflow(self):
         workflow = StateGraph(GraphState)
         
+        workflow.add_node("facet_lookup", self.facet_lookup)
+        workflow.add_node("follow_up", self.follow_up)
         workflow.add_node("retrieve", self.retrieve)
         workflow.add_node("grade_documents", self.grade_documents)
         workflow.add_node("generate", self.generate)
         
-        workflow.set_entry_point("retrieve")
+        # Questions that are exact facet lookups skip retrieval and the LLM;
+        # follow-ups start from the previous turn's relevant profiles
+        workflow.set_conditional_entry_point(
+            self.route_question,
+            {"facet_lookup": "facet_lookup", "follow_up": "follow_up", "retrieve": "retrieve"}
+        )
+        workflow.add_edge("facet_lookup", END)
+        workflow.add_edge("follow_up", "grade_documents")
         workflow.add_edge("retrieve", "grade_documents")
-        workflow.add_edge("grade_documents", "generate")
+        workflow.add_conditional_edges(
+            "grade_documents",
+            self.decide_to_generate,
+            {"retrieve": "retrieve", "generate": "generate"}
+        )
         
         return workflow
 
+    def route_question(self, state):
+        if parse_facet_query(state["question"], self.index.facets):
+            return "facet_lookup"
+        session = state.get("session")
+        if session is not None and session.is_follow_up(state["question"]):
+            return "follow_up"
+        return "retrieve"
+
+    def decide_to_generate(self, state):
+        # A follow-up none of the previous profiles answer falls back to retrieval
+        if state.get("from_previous_turn") and not state["documents"]:
+            self.sessions.record("follow_up_fallbacks")
+            return "retrieve"
+        if state.get("from_previous_turn"):
+            self.sessions.record("follow_ups_from_cache")
+        return "generate"
+
+    def facet_lookup(self, state):
+        question = state["question"]
+        index = self.index
+        filters = parse_facet_query(question, index.facets) or []
+        documents = index.facet_search(filters)
+        description = describe_filters(filters, index.facets)
+        if not documents:
+            generation = f"No researchers in the database match {description}."
+        else:
+            lines = [
+                f"{i}. **{doc.metadata['name']}** - {doc.metadata['profile_id']}"
+                for i, doc in enumerate(documents, 1)
+            ]
+            generation = f"Researchers with {description} ({len(documents)}):\n" + "\n".join(lines)
+        if state.get("session") is not None:
+            profile_ids = [doc.metadata["profile_id"] for doc in documents]
+            self.sessions.add_turn(state["session"], question, profile_ids, dict.fromkeys(profile_ids, True))
+        return {"documents": documents, "question": question, "generation": generation}
+
+    def follow_up(self, state):
+        question = state["question"]
+        last_turn = state["session"].last_turn()
+        self.sessions.record("follow_ups")
+        # Re-rank the profiles the previous turn found relevant; grading filters them
+        documents = self.index.rerank(question, last_turn.relevant())
+        return {"documents": documents, "question": question, "from_previous_turn": True,
+                "previous_question": last_turn.question}
+
     def retrieve(self, state):
         question = state["question"]
-        documents = self.retriever.invoke(question)
-        return {"documents": documents, "question": question}
+        # A follow-up falling back to retrieval searches with the question it refers to
+        query = f"{state['previous_question']} {question}" if state.get("previous_question") else question
+        # Only this node reads the index; a query keeps using the snapshot it
+        # retrieved from even if a swap happens while it is being graded.
+        documents = self.index.retrieve(query)
+        logger.info(f"Retrieved {len(documents)} profiles",
+                    extra={"event": "documents_retrieved", "profile_ids": [doc.metadata["profile_id"] for doc in documents]})
+        return {"documents": documents, "question": question, "from_previous_turn": False}
 
     def generate(self, state):
         question = state["question"]
         documents = state["documents"]
+        session = state.get("session")
+        if session is not None:
+            verdicts = state.get("verdicts") or {}
+            self.sessions.add_turn(session, question, list(verdicts), verdicts)
         
-        # Check if there are any relevant documents
-        generation = self.rag_chain.invoke({"context": format_docs(documents), "question": question})
+        # Keep the conversation's context for follow-ups
+        if state.get("previous_question"):
+            question = f"{question}\n(Follow-up to the previous question: {state['previous_question']})"
+        # The same question over the same graded profiles gets the same answer
+        key = cache_key(question, documents, LOCAL_LLM, GENERATION_PROMPT_VERSION)
+        generation = self.generation_cache.get(key) if self.generation_cache is not None else None
+        cached = generation is not None
+        started = time.perf_counter()
+        if not cached:
+            generation = self.rag_chain.invoke({"context": format_docs(documents), "question": question})
+            if self.generation_cache is not None:
+                self.generation_cache.put(key, generation, 1000 * (time.perf_counter() - started))
+        logger.info(f"Generated a response from {len(documents)} profiles",
+                    extra={"event": "response_generated", "cached": cached, "response": generation,
+                           "generation_ms": round(1000 * (time.perf_counter() - started), 1)})
         
-        return {"documents": documents, "question": question, "generation": generation}
+        return {"documents": documents, "question": state["question"], "generation": generation}
 
     def grade_documents(self, state):
         question = state["question"]
         documents = state["documents"]
+        session = state.get("session")
+        # Verdicts of a follow-up's first pass, when it falls back to retrieval
+        known = state.get("verdicts") or {}
         filtered_docs = []
+        verdicts = {}
         for d in documents:
-            score = self.retrieval_grader.invoke({"question": question, "document": d.page_content})
-            if score['score'].lower() == "yes":
+            pid = d.metadata["profile_id"]
+            # Reuse the verdict if the same question was already asked in this session
+            relevant = known.get(pid)
+            if relevant is None and session is not None:
+                relevant = session.cached_verdict(question, pid)
+            cached = relevant is not None
+            if cached:
+                self.sessions.record("cached_verdicts")
+            else:
+                relevant = self.grade(question, d)
+            if structured_logging.sampled("document_graded"):
+                logger.info("Graded profile", extra={"event": "document_graded", "profile_id": pid, "relevant": relevant,
+                                                     "cached": cached, "document": d.page_content})
+            verdicts[pid] = relevant
+            if relevant:
                 filtered_docs.append(d)
-        return {"documents": filtered_docs, "question": question}
+        logger.info(f"Found {len(filtered_docs)} relevant profiles out of {len(documents)}",
+                    extra={"event": "documents_graded"})
+        return {"documents": filtered_docs, "question": question, "verdicts": verdicts}
+
+    def grade(self, question, document):
+        """Relevance of a profile to a question, by the LLM and/or the classifier (see GRADING_MODE)."""
+        probability = None
+        if self.relevance_classifier is not None:
+            started = time.perf_counter()
+            probability = self.relevance_classifier.probability(question, document.page_content)
+            confident = probability >= CLASSIFIER_CONFIDENCE or probability <= 1 - CLASSIFIER_CONFIDENCE
+            decided = GRADING_MODE == "classifier" or confident
+            self.grading_stats.record("classifier", 1000 * (time.perf_counter() - started), decided)
+            if decided:
+                # The verdict stands; in hybrid mode a sample is checked against the LLM so that agreement also covers these grades
+                if GRADING_MODE == "hybrid" and CLASSIFIER_AUDIT_RATE and random.random() < CLASSIFIER_AUDIT_RATE:
+                    self.grading_stats.compare(probability >= 0.5, self.llm_grade(question, document), audited=True)
+                return probability >= 0.5
+
+        relevant = self.llm_grade(question, document)
+        if probability is not None:
+            self.grading_stats.compare(probability >= 0.5, relevant)
+        return relevant
+
+    def llm_grade(self, question, document):
+        started = time.perf_counter()
+        score = self.retrieval_grader.invoke({"question": question, "document": document.page_content})
+        relevant = score['score'].lower() == "yes"
+        elapsed_ms = 1000 * (time.perf_counter() - started)
+        self.grading_stats.record("llm", elapsed_ms)
+        log_verdict(question, document, relevant, elapsed_ms)
+        return relevant
+
+    def swap_index(self, version=None):
+        """Load a snapshot (default: the active one) and atomically switch to it.
+
+        In-flight queries finish on the index they started with; the old index
+        is closed SNAPSHOT_GRACE_SECONDS after its retirement. That is the
+        activation time of the new version in history.json, the same time
+        `snapshots.collect_garbage` deletes its directory by.
+        """
+        with self._swap_lock:
+            version = version or snapshots.current_version(SNAPSHOTS_DIR)
+            if version is None or version == self.index.version:
+                return self.index.version
+            new_index = self._with_shards(load_index(self.embeddings, version))
+            old_index = self.index
+            self.index = new_index
+            retired_at = snapshots.activation_time(SNAPSHOTS_DIR, version)
+            # A version swapped to without being activated has no history entry
+            self._retired_indexes.append((retired_at if retired_at is not None else time.time(), old_index))
+        return version
+
+    def _with_shards(self, index):
+        return ShardedIndex(index, self.shards) if self.shards else index
+
+    def collect_garbage(self):
+        """Close retired indexes and delete snapshots past the grace period."""
+        with self._swap_lock:
+            now = time.time()
+            expired = [index for retired_at, index in self._retired_indexes if now - retired_at >= SNAPSHOT_GRACE_SECONDS]
+            self._retired_indexes = [(retired_at, index) for retired_at, index in self._retired_indexes if now - retired_at < SNAPSHOT_GRACE_SECONDS]
+            keep = {self.index.version} | {index.version for _, index in self._retired_indexes}
+        for index in expired:
+            index.close()
+        return snapshots.collect_garbage(SNAPSHOTS_DIR, SNAPSHOT_GRACE_SECONDS, keep=keep)
+
+    def start_snapshot_watcher(self, interval=SNAPSHOT_WATCH_INTERVAL):
+        """Poll the active snapshot pointer and swap to it when it changes.
+
+        Safe to call repeatedly; after fork() the watcher is restarted in the
+        calling process.
+        """
+        with self._swap_lock:
+            if self._watcher_pid == os.getpid():
+                return
+            self._watcher_pid = os.getpid()
+
+        def watch():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.swap_index()
+                    self.collect_garbage()
+                except Exception as e:
+                    logger.error(f"Error swapping index snapshot: {e}")
+
+        threading.Thread(target=watch, name="snapshot-watcher", daemon=True).start()
+
+    def facet_search(self, filters):
+        """Researchers matching every (facet, text, prefix) filter, answered from the facet index."""
+        return [
+            {"profile_id": doc.metadata["profile_id"], "name": doc.metadata["name"]}
+            for doc in self.index.facet_search(filters)
+        ]
+
+    def facet_terms(self, facet, prefix="", limit=20):
+        """Terms of a facet starting with `prefix`, with their profile counts (for autocompletion)."""
+        return self.index.facets.terms(facet, prefix, limit)
+
+    def similar_researchers(self, researcher, k=SIMILAR_K):
+        """Researchers most similar to `researcher` (profile ID or name), without an LLM call."""
+        return self.index.similar(researcher, k)
+
+    def metrics(self):
+        shards = self.index.describe() if isinstance(self.index, ShardedIndex) else []
+        return {"index_version": self.index.version, "shards": shards, "embeddings": self.embeddings.stats(),
+                "sessions": self.sessions.stats(),
+                "grading": {"mode": GRADING_MODE if self.relevance_classifier is not None else "llm",
+                            **self.grading_stats.stats()},
+                "generation_cache": self.generation_cache.stats() if self.generation_cache is not None else None,
+                "llm": {"generation": self.llm.stats(), "grading": self.grader_llm.stats()},
+                "logging": structured_logging.stats()}
+
+    def query(self, question, profile=False, session_id=None):
+        """Answer a question; profile=True (or PROFILE_SAMPLE_RATE) also writes a profile of it.
+
+        Questions with the same session_id form a conversation, so follow-ups
+        can refer to the previous answer.
+        """
+        if profile or (PROFILE_SAMPLE_RATE and random.random() < PROFILE_SAMPLE_RATE):
+            return self.profile_query(question, session_id)[0]
+        return self._run(question, session_id=session_id)
+
+    def profile_query(self, question, session_id=None):
+        """Answer a question while sampling its call stack; returns (answer, profile summary)."""
+        with RequestProfile(question, PROFILES_DIR, PROFILE_INTERVAL_MS / 1000, PROFILE_KEEP) as profile:
+            generation = self._run(question, on_node_finished=profile.node_finished, session_id=session_id)
+        summary = profile.summary()
+        logger.info(f"Profiled query in {summary['total_ms']:.0f} ms: {profile.path('speedscope.json')}",
+                    extra={"event": "query_profiled", "profile_file": profile.path('speedscope.json')})
+        return generation, summary
 
-    def query(self, question):
+    def _run(self, question, on_node_finished=None, session_id=None):
         inputs = {"question": question}
-        final_output = None
-        for output in self.app.stream(inputs):
-            final_output = output
-        return final_output.get('generate', {}).get('generation', '')
+        if session_id is not None:
+            inputs["session"] = self.sessions.get(session_id)
+        # Keep the caller's request ID (app.py sets one per HTTP request)
+        with request_context(request_id_var.get()):
+            started = time.perf_counter()
+            logger.info("Processing question", extra={"event": "query_started", "question": question,
+                                                      "session_id": session_id})
+            final_output = None
+            for output in self.app.stream(inputs):
+                final_output = output
+                # Nodes run one after another, so each output marks the end of a node
+                if on_node_finished is not None:
+                    on_node_finished(next(iter(output)))
+            node = next(iter(final_output))
+            logger.info(f"Answered by {node} in {1000 * (time.perf_counter() - started):.0f} ms",
+                        extra={"event": "query_finished", "node": node,
+                               "total_ms": round(1000 * (time.perf_counter() - started), 1)})
+        # The answer is in the state of the last node: generate, or facet_lookup
+        return final_output[node].get('generation', '')
 
 # Initialize the query engine if running as main
 if __name__ == "__main__":
+    structured_logging.configure_logging(LOG_PATH, LOG_LEVEL, LOG_MAX_MB * 2**20, LOG_BACKUP_COUNT,
+                                         LOG_MAX_FIELD_CHARS, LOG_SAMPLE_RATES, console=False)
     engine = RAGQueryEngine()
+    session_id = new_session_id()
     while True:
         user_question = input("You: ")
         if user_question.lower() in ['quit', 'exit']:
             break
-        response = engine.query(user_question)
+        response = engine.query(user_question, session_id=session_id)
         print("\nAssistant:", response, "\n")
@@ -0,0 +1,424 @@
+"""Local relevance classifier distilled from the LLM grader's verdicts.
+
+Every verdict of the LLM grader is appended to a JSONL verdict log, rotated
+by size into gzipped backups that training reads as well. Older verdicts are
+parsed from the legacy rag_operations.log. A logistic
+regression is trained on features derived from the embeddings of the
+question and the profile: their element-wise product, their absolute
+difference and their cosine similarity.
+
+With GRADING_MODE = "classifier" (see rag_profiles.py), the classifier grades
+every profile. With "hybrid", the LLM is only asked when the classifier's
+probability is not confident either way.
+
+Usage:
+    python relevance_classifier.py train [--verdicts PATH] [--legacy-log PATH] [--model PATH]
+    python relevance_classifier.py evaluate [--verdicts PATH] [--legacy-log PATH] [--model PATH]
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from structured_logging import AsyncHandler, CompressedRotatingFileHandler
+
+verdict_logger = logging.getLogger("relevance_verdicts")
+verdict_logger.propagate = False
+
+LOG_RECORD = re.compile(r"^\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3} - \S+ - \w+ - ", re.MULTILINE)
+LEGACY_QUESTION = re.compile(r"(?:Processing new query|documents for question):[ \t]*(.*)")
+LEGACY_PROFILE_HEADER = re.compile(r"Grading Document (\d+)(?: RESEARCHER PROFILE)?:")
+LEGACY_RESULT = re.compile(r"^Grading result(?: for Document (\d+))?: (yes|no)\b", re.IGNORECASE)
+LEGACY_GRADED_AS = re.compile(r"^Document graded as (relevant|not relevant): (.*)", re.DOTALL)
+
+
+def configure_verdict_log(path, max_bytes=100 * 2**20, backup_count=10):
+    """Append every logged verdict to `path` as one JSON line, written by a background thread.
+
+    The file is rotated at `max_bytes` into `backup_count` gzipped backups.
+    """
+    if verdict_logger.handlers or not path:
+        return
+    handler = CompressedRotatingFileHandler(path, max_bytes, backup_count)
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    verdict_logger.addHandler(AsyncHandler([handler]))
+    verdict_logger.setLevel(logging.INFO)
+
+
+def log_verdict(question, document, relevant, latency_ms):
+    """Log one verdict of the LLM grader (a Document with a profile_id) as training data."""
+    verdict_logger.info(json.dumps({
+        "time": time.time(),
+        "question": question,
+        "profile_id": document.metadata.get("profile_id"),
+        "document": document.page_content,
+        "relevant": relevant,
+        "latency_ms": round(latency_ms, 1),
+    }, ensure_ascii=False))
+
+
+def verdict_log_files(path):
+    """The verdict log and its gzipped backups (<path>.1.gz is the newest), oldest first."""
+    if not path:
+        return []
+    backups = []
+    while os.path.exists(f"{path}.{len(backups) + 1}.gz"):
+        backups.append(f"{path}.{len(backups) + 1}.gz")
+    return backups[::-1] + ([path] if os.path.exists(path) else [])
+
+
+def read_verdict_log(path):
+    """(question, document text, relevant) of every verdict in a JSONL verdict log and its backups, oldest first."""
+    verdicts = []
+    for file_path in verdict_log_files(path):
+        opener = gzip.open if file_path.endswith(".gz") else open
+        with opener(file_path, "rt", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                    verdicts.append((record["question"], record["document"], bool(record["relevant"])))
+                except (ValueError, KeyError):
+                    continue
+    return verdicts
+
+
+def parse_legacy_log(path):
+    """(question, document text, relevant) of the verdicts in the legacy rag_operations.log.
+
+    The log went through several formats: "Document graded as relevant: <text>",
+    a "Full document content:" record followed by "Grading result: yes", and a
+    "Grading Document N RESEARCHER PROFILE" banner, the profile, and then
+    "Grading result for Document N: yes".
+    """
+    verdicts = []
+    if not path or not os.path.exists(path):
+        return verdicts
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    starts = [match.end() for match in LOG_RECORD.finditer(text)]
+    ends = [match.start() for match in LOG_RECORD.finditer(text)][1:] + [len(text)]
+    question = None
+    pending = None
+    graded = {}
+    expect_profile = None
+    for start, end in zip(starts, ends):
+        message = text[start:end].strip()
+        for match in LEGACY_QUESTION.finditer(message):
+            if match.group(1).strip():
+                question = match.group(1).strip()
+                graded = {}
+        if expect_profile is not None and message.startswith("Name:"):
+            graded[expect_profile] = pending = message
+            expect_profile = None
+            continue
+        header = LEGACY_PROFILE_HEADER.search(message)
+        if header:
+            expect_profile = int(header.group(1))
+            continue
+        if message.startswith("Full document content:"):
+            pending = message[len("Full document content:"):].strip()
+            expect_profile = None
+            continue
+        result = LEGACY_RESULT.match(message)
+        if result:
+            document = graded.get(int(result.group(1))) if result.group(1) else pending
+            if document and question:
+                verdicts.append((question, document, result.group(2).lower() == "yes"))
+            pending = expect_profile = None
+            continue
+        graded_as = LEGACY_GRADED_AS.match(message)
+        if graded_as and question:
+            verdicts.append((question, graded_as.group(2).strip().removesuffix("..."), graded_as.group(1) == "relevant"))
+    return verdicts
+
+
+def training_set(verdict_log_path, legacy_log_path):
+    """Verdicts of both logs, one per (question, document); the most recent verdict wins."""
+    examples = {}
+    for question, document, relevant in parse_legacy_log(legacy_log_path) + read_verdict_log(verdict_log_path):
+        key = (" ".join(question.lower().split()), text_hash(document))
+        examples.pop(key, None)
+        examples[key] = (question, document, relevant)
+    return list(examples.values())
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def features(question_vectors, document_vectors):
+    """Pair features of normalized question and document embeddings."""
+    q = question_vectors / np.maximum(np.linalg.norm(question_vectors, axis=1, keepdims=True), 1e-12)
+    d = document_vectors / np.maximum(np.linalg.norm(document_vectors, axis=1, keepdims=True), 1e-12)
+    return np.hstack([q * d, np.abs(q - d), np.sum(q * d, axis=1, keepdims=True)]).astype(np.float32)
+
+
+class LogisticRegression:
+    """L2-regularized logistic regression on standardized features, trained by full-batch gradient descent."""
+
+    def __init__(self, l2=1e-2, learning_rate=0.5, iterations=2000):
+        self.l2 = l2
+        self.learning_rate = learning_rate
+        self.iterations = iterations
+        self.mean = self.std = self.weights = None
+        self.bias = 0.0
+
+    def fit(self, x, y):
+        self.mean = x.mean(axis=0)
+        self.std = np.maximum(x.std(axis=0), 1e-6)
+        z = (x - self.mean) / self.std
+        y = y.astype(np.float32)
+        # Weight the classes equally; most retrieved profiles are graded "no"
+        positives = max(y.mean(), 1e-6)
+        sample_weights = np.where(y == 1, 0.5 / positives, 0.5 / max(1 - positives, 1e-6))
+        self.weights = np.zeros(z.shape[1], dtype=np.float32)
+        self.bias = 0.0
+        for _ in range(self.iterations):
+            error = (self._sigmoid(z @ self.weights + self.bias) - y) * sample_weights
+            self.weights -= self.learning_rate * (z.T @ error / len(y) + self.l2 * self.weights)
+            self.bias -= self.learning_rate * float(error.mean())
+        return self
+
+    @staticmethod
+    def _sigmoid(logits):
+        return 1 / (1 + np.exp(-np.clip(logits, -30, 30)))
+
+    def predict_proba(self, x):
+        return self._sigmoid(((x - self.mean) / self.std) @ self.weights + self.bias)
+
+    def save(self, path, **metadata):
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, mean=self.mean, std=self.std, weights=self.weights, bias=self.bias,
+                     metadata=json.dumps(metadata))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        model = cls()
+        with np.load(path, allow_pickle=False) as data:
+            model.mean, model.std, model.weights = data["mean"], data["std"], data["weights"]
+            model.bias = float(data["bias"])
+            model.metadata = json.loads(str(data["metadata"]))
+        return model
+
+
+class RelevanceClassifier:
+    """Relevance probability of a profile for a question, from a trained model and the query embeddings."""
+
+    def __init__(self, model, embeddings, cache_size=4096):
+        self.model = model
+        self.embeddings = embeddings
+        self.cache_size = cache_size
+        # Document embeddings by content hash (query embeddings are cached by the embedding service)
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _document_vector(self, text):
+        key = text_hash(text)
+        with self._lock:
+            vector = self._documents.get(key)
+            if vector is not None:
+                self._documents.move_to_end(key)
+                return vector
+        vector = np.asarray(self.embeddings.embed_documents([text])[0], dtype=np.float32)
+        with self._lock:
+            self._documents[key] = vector
+            while len(self._documents) > self.cache_size:
+                self._documents.popitem(last=False)
+        return vector
+
+    def probability(self, question, text):
+        question_vector = np.asarray(self.embeddings.embed_query(question), dtype=np.float32)
+        x = features(question_vector[None, :], self._document_vector(text)[None, :])
+        return float(self.model.predict_proba(x)[0])
+
+
+def load_classifier(path, embeddings):
+    """The trained classifier at `path`, or None if none was trained."""
+    if not path or not os.path.exists(path):
+        return None
+    return RelevanceClassifier(LogisticRegression.load(path), embeddings)
+
+
+class GradingStats:
+    """Counts and latencies of LLM and classifier grades, and their agreement where both graded.
+
+    Agreement is kept apart for the uncertain grades the classifier deferred to
+    the LLM and for the audited sample of grades it decided itself.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = {
+            "llm_grades": 0,
+            "llm_ms": 0.0,
+            "classifier_grades": 0,
+            "classifier_ms": 0.0,
+            "classifier_decisions": 0,
+            "compared_uncertain": 0,
+            "agreed_uncertain": 0,
+            "audited": 0,
+            "agreed_audited": 0,
+        }
+
+    def record(self, grader, ms, decided=False):
+        with self._lock:
+            self._stats[f"{grader}_grades"] += 1
+            self._stats[f"{grader}_ms"] += ms
+            if decided:
+                self._stats["classifier_decisions"] += 1
+
+    def compare(self, classifier_verdict, llm_verdict, audited=False):
+        with self._lock:
+            if audited:
+                self._stats["audited"] += 1
+                self._stats["agreed_audited"] += classifier_verdict == llm_verdict
+            else:
+                self._stats["compared_uncertain"] += 1
+                self._stats["agreed_uncertain"] += classifier_verdict == llm_verdict
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["avg_llm_ms"] = stats["llm_ms"] / stats["llm_grades"] if stats["llm_grades"] else 0.0
+        stats["avg_classifier_ms"] = stats["classifier_ms"] / stats["classifier_grades"] if stats["classifier_grades"] else 0.0
+        stats["agreement_uncertain"] = (stats["agreed_uncertain"] / stats["compared_uncertain"]
+                                        if stats["compared_uncertain"] else None)
+        stats["agreement_audited"] = stats["agreed_audited"] / stats["audited"] if stats["audited"] else None
+        return stats
+
+
+def embed_examples(examples, embeddings, batch_size=64):
+    """Feature matrix and labels of (question, document, relevant) examples."""
+    questions = sorted({question for question, _, _ in examples})
+    documents = sorted({document for _, document, _ in examples})
+    question_vectors = dict(zip(questions, np.asarray(embeddings.embed_documents(questions), dtype=np.float32)))
+    document_vectors = {}
+    for start in range(0, len(documents), batch_size):
+        batch = documents[start:start + batch_size]
+        document_vectors.update(zip(batch, np.asarray(embeddings.embed_documents(batch), dtype=np.float32)))
+    x = features(np.stack([question_vectors[q] for q, _, _ in examples]),
+                 np.stack([document_vectors[d] for _, d, _ in examples]))
+    return x, np.array([relevant for _, _, relevant in examples], dtype=np.int8)
+
+
+def question_folds(examples, folds, seed=0):
+    """Fold number of every example; all verdicts for one question are in the same fold."""
+    questions = sorted({" ".join(question.lower().split()) for question, _, _ in examples})
+    order = np.random.default_rng(seed).permutation(len(questions))
+    fold_of = {questions[i]: rank % folds for rank, i in enumerate(order)}
+    return np.array([fold_of[" ".join(question.lower().split())] for question, _, _ in examples])
+
+
+def cross_validate(x, y, folds, count):
+    """Out-of-fold probabilities, which examples got one, and how many folds were skipped.
+
+    A fold is skipped when its training split has only one class; its
+    examples are left out rather than counted as predicted irrelevant.
+    """
+    probabilities = np.zeros(len(y))
+    evaluated = np.zeros(len(y), dtype=bool)
+    skipped = 0
+    for fold in range(count):
+        test = folds == fold
+        if not test.any():
+            continue
+        if len(set(y[~test])) < 2:
+            skipped += 1
+            continue
+        probabilities[test] = LogisticRegression().fit(x[~test], y[~test]).predict_proba(x[test])
+        evaluated |= test
+    return probabilities, evaluated, skipped
+
+
+def report(y, probabilities, confidence):
+    """Agreement with the LLM, and how many grades the classifier decides alone at `confidence`."""
+    predictions = probabilities >= 0.5
+    confident = (probabilities >= confidence) | (probabilities <= 1 - confidence)
+    true_positives = int(np.sum(predictions & (y == 1)))
+    lines = [
+        f"  agreement with the LLM:      {np.mean(predictions == y):.3f} over {len(y)} verdicts "
+        f"({int(y.sum())} relevant)",
+        f"  precision / recall (yes):    {true_positives / max(predictions.sum(), 1):.3f} / "
+        f"{true_positives / max(y.sum(), 1):.3f}",
+        f"  confident at {confidence:.2f}:          {np.mean(confident):.3f} of grades skip the LLM, "
+        f"agreement on those {np.mean(predictions[confident] == y[confident]) if confident.any() else float('nan'):.3f}",
+    ]
+    return "\n".join(lines)
+
+
+def measure_latency(classifier, examples, repeat=3):
+    """Mean milliseconds per grade, with cold and warm document-embedding caches."""
+    cold = []
+    for question, document, _ in examples:
+        classifier._documents.clear()
+        started = time.perf_counter()
+        classifier.probability(question, document)
+        cold.append(1000 * (time.perf_counter() - started))
+    warm = []
+    for _ in range(repeat):
+        for question, document, _ in examples:
+            started = time.perf_counter()
+            classifier.probability(question, document)
+            warm.append(1000 * (time.perf_counter() - started))
+    return float(np.mean(cold)), float(np.mean(warm))
+
+
+def main():
+    import rag_profiles
+
+    parser = argparse.ArgumentParser(description="Train or evaluate the local relevance classifier")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name in ("train", "evaluate"):
+        command = subparsers.add_parser(name)
+        command.add_argument("--verdicts", default=rag_profiles.VERDICT_LOG_PATH, help="JSONL verdict log")
+        command.add_argument("--legacy-log", default=rag_profiles.LEGACY_LOG_PATH, help="legacy rag_operations.log")
+        command.add_argument("--model", default=rag_profiles.CLASSIFIER_PATH, help="trained model file")
+        command.add_argument("--confidence", type=float, default=rag_profiles.CLASSIFIER_CONFIDENCE)
+    subparsers.choices["train"].add_argument("--folds", type=int, default=5, help="cross-validation folds")
+    args = parser.parse_args()
+
+    examples = training_set(args.verdicts, args.legacy_log)
+    if len({relevant for _, _, relevant in examples}) < 2:
+        raise ValueError(f"Need both relevant and irrelevant verdicts to train; found {len(examples)} verdicts")
+    print(f"{len(examples)} verdicts from {args.verdicts} and {args.legacy_log}")
+    embeddings = rag_profiles.create_embedding_function()
+    x, y = embed_examples(examples, embeddings)
+
+    if args.command == "train":
+        # Cross-validate over questions, so that no question is both trained and tested on
+        probabilities, evaluated, skipped = cross_validate(x, y, question_folds(examples, args.folds), args.folds)
+        if not evaluated.any():
+            raise ValueError("No fold's training split has both relevant and irrelevant verdicts; "
+                             "log more verdicts or use fewer --folds")
+        skipped_note = f" ({skipped} skipped: their training split has one class)" if skipped else ""
+        print(f"Cross-validated over {args.folds} folds of questions{skipped_note}:")
+        print(report(y[evaluated], probabilities[evaluated], args.confidence))
+        model = LogisticRegression().fit(x, y)
+        model.save(args.model, examples=len(y), dimension=int(x.shape[1]), trained_at=time.time())
+        print(f"Saved the classifier trained on all {len(y)} verdicts to {args.model}")
+    else:
+        model = LogisticRegression.load(args.model)
+        print(f"Classifier {args.model} on the logged verdicts (including its training data):")
+        print(report(y, model.predict_proba(x), args.confidence))
+
+    cold, warm = measure_latency(RelevanceClassifier(model, embeddings), examples[:50])
+    print(f"  latency per grade:           {cold:.2f} ms (embedding the profile), {warm:.3f} ms (profile embedding cached)")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
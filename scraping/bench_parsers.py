@@ -0,0 +1,328 @@
+"""Benchmark targeted parsing against the baseline parsers over saved HTML pages.
+
+Every page is parsed twice. The baseline builds the full BeautifulSoup tree
+with html.parser and extracts publications with a copy of the original
+extract_publication_info (one find() per field). The targeted run uses the
+parsers as they are: lxml when it is installed (parsers.HTML_PARSER), only
+the elements they need (parsers.TARGETED_PARSING), and one walk over each
+publication. ai.ugent.be profile pages are parsed with
+crawl_ugent_ai.parse_profile. The script reports
+the time per page type and checks that both outputs are identical. It exits
+with status 1 if any page gives different output.
+
+Fixture pages live in a directory with one subdirectory per page type
+(researcher, crig_profile, projects, project, publications, ai_ugent_profile). Fill it from the
+HTTP cache of earlier scraping runs, or with generated pages when there is no
+cache:
+
+    python scraping/bench_parsers.py --export-cache     # pages from scraping/.http_cache.sqlite3
+    python scraping/bench_parsers.py --synthesize 200   # 200 generated pages per type
+    python scraping/bench_parsers.py [--fixtures DIR] [--repeat 3]
+"""
+import argparse
+import contextlib
+import json
+import os
+import random
+import re
+import sys
+import time
+import zlib
+
+import parsers
+from http_cache import DEFAULT_CACHE_PATH, HttpCache
+
+sys.path.insert(1, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import crawl_ugent_ai
+
+DEFAULT_FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Page type -> parsers run on it
+PAGE_PARSERS = {
+    'researcher': [parsers.parse_researcher_details, parsers.parse_orcid],
+    'crig_profile': [parsers.parse_crig_profile],
+    'projects': [parsers.parse_projects_page],
+    'project': [parsers.parse_project_page],
+    'publications': [parsers.parse_publications_page],
+    'ai_ugent_profile': [crawl_ugent_ai.parse_profile],
+}
+
+# (URL pattern, page type); the first matching pattern wins
+PAGE_TYPES = [
+    (r'research\.ugent\.be/web/person/.+/projects/en', 'projects'),
+    (r'research\.ugent\.be/web/person/.+/publications/en', 'publications'),
+    (r'research\.ugent\.be/web/person/', 'researcher'),
+    (r'research\.ugent\.be/web/result/project/', 'project'),
+    (r'crig\.ugent\.be/en/all-crig-group-leaders-and-members', None),
+    (r'crig\.ugent\.be/', 'crig_profile'),
+    (r'ai\.ugent\.be/people/.+\.html', 'ai_ugent_profile'),
+]
+
+
+def page_type(url):
+    for pattern, kind in PAGE_TYPES:
+        if re.search(pattern, url):
+            return kind
+    return None
+
+
+def save_fixture(fixtures_dir, kind, name, html):
+    os.makedirs(os.path.join(fixtures_dir, kind), exist_ok=True)
+    with open(os.path.join(fixtures_dir, kind, name + '.html'), 'w', encoding='utf-8') as f:
+        f.write(html)
+
+
+def export_cache(fixtures_dir, cache_path=DEFAULT_CACHE_PATH):
+    """Save the successful pages from the HTTP cache as fixtures."""
+    cache = HttpCache(cache_path)
+    count = 0
+    for url, body in cache.conn.execute("SELECT url, body FROM responses WHERE status = 200"):
+        kind = page_type(url)
+        if kind:
+            save_fixture(fixtures_dir, kind, f'cache-{count:05d}', zlib.decompress(body).decode('utf-8'))
+            count += 1
+    cache.close()
+    return count
+
+
+# Generated pages, shaped like the real ones and wrapped in site navigation
+
+WORDS = ('plant growth root stress genome protein signalling drought yield leaf cell wall '
+         'metabolism breeding pathogen immunity photosynthesis model data network').split()
+
+
+def words(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+
+def page_shell(rng, body):
+    nav = ''.join(f'<li class="menu-item"><a href="/en/{words(rng, 1)}-{i}">{words(rng, 2)}</a></li>' for i in range(80))
+    footer = ''.join(f'<div class="col"><span>{words(rng, 6)}</span><a href="/x{i}">{words(rng, 1)}</a></div>' for i in range(30))
+    script = '<script>var config = {"items": [%s]};</script>' % ','.join(str(i) for i in range(300))
+    return (f'<!DOCTYPE html><html><head><title>{words(rng, 3)}</title>{script}</head><body>'
+            f'<header><nav><ul>{nav}</ul></nav></header><main>{body}</main><footer>{footer}</footer></body></html>')
+
+
+def synth_researcher(rng):
+    positions = ''.join(
+        f'<div class="detailblokje"><span class="header-6 text-black">{words(rng, 2)}</span>'
+        f'<a href="/web/organisation/ge/en">Faculty of {words(rng, 2)}</a>'
+        f'<span class="header-7 text-black">Department of {words(rng, 2)}</span></div>'
+        for _ in range(rng.randint(0, 3))
+    )
+    categories = ''.join(
+        f'<div class="header-6">{words(rng, 2)}</div><ul>' + ''.join(
+            f'<li><span class="normal" data-code="{rng.randint(10000, 99999)}">{words(rng, 3)}</span>'
+            f'<span class="fas fa-info-circle" data-content="&lt;b&gt;Description&lt;/b&gt; {words(rng, 12)} '
+            f'&lt;b&gt;Classification&lt;/b&gt; {words(rng, 2)}"></span></li>'
+            for _ in range(rng.randint(1, 4))
+        ) + '</ul>'
+        for _ in range(rng.randint(0, 3))
+    )
+    expertise = ''.join(f'<span class="keyword-label">{words(rng, 2)}</span>' for _ in range(rng.randint(0, 8)))
+    orcid = ''
+    if rng.random() < 0.7:
+        orcid_id = '-'.join(f'{rng.randint(0, 9999):04d}' for _ in range(4))
+        orcid = f'<a href="https://orcid.org/{orcid_id}">https://orcid.org/{orcid_id}</a>'
+    return page_shell(rng, (
+        f'<div id="id1a">{positions}</div><div id="id23">{categories}</div>'
+        f'<div id="id24"><div class="keywords">{expertise}</div></div><div class="links">{orcid}</div>'
+    ))
+
+
+def synth_crig_profile(rng):
+    sections = (
+        f'<div class="group-left"><h2>Research focus</h2></div><div class="group-right"><p>{words(rng, 60)}</p></div>'
+        f'<div class="group-left"><h2>Contact &amp; links</h2></div><div class="group-right"><p>{words(rng, 5)}</p>'
+        + ''.join(f'<a href="https://example.org/{i}">{words(rng, 2)}</a>' for i in range(rng.randint(0, 4)))
+        + '</div>'
+    )
+    return page_shell(rng, sections).replace(
+        '</title>', f'</title><meta name="description" content="{words(rng, 30)}">'
+                    f'<meta name="keywords" content="{", ".join(words(rng, 2) for _ in range(5))}">', 1)
+
+
+def synth_projects(rng):
+    sections = ''.join(
+        f'<div class="margin-bottom-gl"><div class="header-5">{role}</div>' + ''.join(
+            f'<div class="fiche"><a href="/web/result/project/{rng.randint(1, 10 ** 6):x}/en">'
+            f'<div class="header-6">{words(rng, 6)}</div><span>{words(rng, 10)}</span></a></div>'
+            for _ in range(rng.randint(0, 12))
+        ) + '</div>'
+        for role in ('Promotor', 'Copromotor', 'Fellow', 'Member')
+    )
+    return page_shell(rng, sections)
+
+
+def synth_project(rng):
+    keywords = ''.join(f'<span>{words(rng, 2)}</span>' for _ in range(rng.randint(0, 6)))
+    return page_shell(rng, (
+        f'<div id="description_showmore"><p>{words(rng, 120)}</p></div>'
+        f'<div class="keywords">{keywords}</div>'
+    ))
+
+
+def synth_publications(rng):
+    year = time.localtime().tm_year
+    sections = ''.join(
+        f'<div class="margin-bottom-gl"><div class="header-5"><span>{year - offset}</span></div>'
+        f'<div style="margin-left: 4em;">' + ''.join(
+            f'<div class="bg-blue-hover"><span data-type="title">{words(rng, 8)}</span>'
+            f'<div class="italic-text">' + ', '.join(
+                f'<span data-type="person">{words(rng, 2)}</span>' for _ in range(rng.randint(1, 8))
+            ) + f'</div><span data-type="type">{words(rng, 2)}</span>'
+            f'<span data-type="ref-title">{words(rng, 4)}</span></div>'
+            for _ in range(rng.randint(0, 10))
+        ) + '</div></div>'
+        for offset in range(12)
+    )
+    return page_shell(rng, sections)
+
+
+def synth_ai_ugent_profile(rng):
+    name = words(rng, 2)
+    unit = f'<span>Research unit:</span> <a href="https://{words(rng, 1)}.ugent.be">{words(rng, 3)}</a><br>' \
+        if rng.random() < 0.9 else ''
+    website = f'<a href="https://www.{words(rng, 1)}.me">website</a>' if rng.random() < 0.2 else ''
+    publications = ''.join(f'<li>{words(rng, 15)} ({rng.randint(2000, 2024)}).</li>' for _ in range(rng.randint(0, 5)))
+    return page_shell(rng, (
+        f'<div class="person-header"><h1>{name}</h1><span>{words(rng, 2)}</span></div>'
+        f'<div class="person-contact"><a href="mailto:{name.replace(" ", ".")}@UGent.be">{name}@UGent.be</a><br>'
+        f'<a href="tel:+3292640000">+32 9 264 00 00</a><br>{unit}{website}</div>'
+        f'<div class="person-bio"><p>{words(rng, 80)}</p></div>'
+        f'<div class="person-keywords"><strong>Keywords:</strong> {", ".join(words(rng, 2) for _ in range(4))}</div>'
+        f'<div class="person-publications"><strong>Key publications</strong><ul>{publications}</ul></div>'
+    ))
+
+
+SYNTHESIZERS = {
+    'researcher': synth_researcher,
+    'crig_profile': synth_crig_profile,
+    'projects': synth_projects,
+    'project': synth_project,
+    'publications': synth_publications,
+    'ai_ugent_profile': synth_ai_ugent_profile,
+}
+
+
+def synthesize(fixtures_dir, pages_per_type, seed=0):
+    rng = random.Random(seed)
+    for kind, synth in SYNTHESIZERS.items():
+        for i in range(pages_per_type):
+            save_fixture(fixtures_dir, kind, f'synthetic-{i:05d}', synth(rng))
+    return pages_per_type * len(SYNTHESIZERS)
+
+
+def baseline_extract_publication_info(pub_div, year):
+    """extract_publication_info as it was before targeted parsing, to check the rewrite against."""
+    # Extract title
+    title_span = pub_div.find('span', {'data-type': 'title'})
+    if not title_span:
+        return None
+    publication = {'title': title_span.text.strip(), 'year': year}
+
+    # Extract authors
+    authors = []
+    authors_div = pub_div.find('div', class_='italic-text')
+    if authors_div:
+        for person_span in authors_div.find_all('span', {'data-type': 'person'}):
+            authors.append(person_span.text.strip())
+    if authors:
+        publication['authors'] = authors
+
+    # Get publication type
+    type_span = pub_div.find('span', {'data-type': 'type'})
+    if type_span:
+        publication['type'] = type_span.text.strip()
+
+    # Get journal/publication venue
+    ref_title_span = pub_div.find('span', {'data-type': 'ref-title'})
+    if ref_title_span:
+        publication['venue'] = ref_title_span.text.strip()
+
+    return publication
+
+
+@contextlib.contextmanager
+def baseline_parsers():
+    """Run the parsers as they were before targeted parsing: full html.parser trees and the original publication parser."""
+    saved = parsers.TARGETED_PARSING, parsers.HTML_PARSER, parsers.extract_publication_info
+    parsers.TARGETED_PARSING, parsers.HTML_PARSER, parsers.extract_publication_info = \
+        False, 'html.parser', baseline_extract_publication_info
+    try:
+        yield
+    finally:
+        parsers.TARGETED_PARSING, parsers.HTML_PARSER, parsers.extract_publication_info = saved
+
+
+def load_fixtures(fixtures_dir):
+    fixtures = {}
+    for kind in PAGE_PARSERS:
+        kind_dir = os.path.join(fixtures_dir, kind)
+        if os.path.isdir(kind_dir):
+            names = sorted(name for name in os.listdir(kind_dir) if name.endswith('.html'))
+            fixtures[kind] = []
+            for name in names:
+                with open(os.path.join(kind_dir, name), 'r', encoding='utf-8') as f:
+                    fixtures[kind].append((name, f.read()))
+    return fixtures
+
+
+def run_parsers(kind, pages, baseline, repeat):
+    """Best wall time over `repeat` runs, and the JSON output of every page."""
+    best = float('inf')
+    with baseline_parsers() if baseline else contextlib.nullcontext():
+        for _ in range(repeat):
+            start = time.perf_counter()
+            outputs = [[parse(html) for parse in PAGE_PARSERS[kind]] for _, html in pages]
+            best = min(best, time.perf_counter() - start)
+    return best, [json.dumps(output, ensure_ascii=False) for output in outputs]
+
+
+def benchmark(fixtures, repeat=3):
+    print(f"{'page type':<18}{'pages':>7}{'baseline ms/page':>18}{'targeted ms/page':>18}{'speedup':>9}  identical")
+    mismatches = []
+    total_baseline = total_targeted = 0.0
+    for kind, pages in fixtures.items():
+        if not pages:
+            continue
+        baseline_time, baseline_out = run_parsers(kind, pages, True, repeat)
+        targeted_time, targeted_out = run_parsers(kind, pages, False, repeat)
+        different = [name for (name, _), a, b in zip(pages, baseline_out, targeted_out) if a != b]
+        mismatches += [os.path.join(kind, name) for name in different]
+        total_baseline += baseline_time
+        total_targeted += targeted_time
+        print(f"{kind:<18}{len(pages):>7}{1000 * baseline_time / len(pages):>18.2f}"
+              f"{1000 * targeted_time / len(pages):>18.2f}{baseline_time / targeted_time:>8.1f}x  "
+              f"{'yes' if not different else f'NO ({len(different)} pages)'}")
+    if total_targeted:
+        print(f"Total: {total_baseline:.2f}s baseline, {total_targeted:.2f}s targeted, "
+              f"{total_baseline / total_targeted:.1f}x faster")
+    for path in mismatches:
+        print(f"Output differs: {path}")
+    return not mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark targeted HTML parsing against the baseline parsers")
+    parser.add_argument('--fixtures', default=DEFAULT_FIXTURES_DIR, help="directory with one subdirectory per page type")
+    parser.add_argument('--export-cache', action='store_true', help="save the pages in the HTTP cache as fixtures")
+    parser.add_argument('--synthesize', type=int, default=0, metavar='N', help="generate N fixture pages per page type")
+    parser.add_argument('--repeat', type=int, default=3, help="runs per page type; the best time is reported")
+    args = parser.parse_args()
+
+    if args.export_cache:
+        print(f"Exported {export_cache(args.fixtures)} pages from the HTTP cache")
+    if args.synthesize:
+        print(f"Generated {synthesize(args.fixtures, args.synthesize)} pages")
+
+    fixtures = load_fixtures(args.fixtures)
+    if not any(fixtures.values()):
+        print(f"No fixtures in {args.fixtures}; use --export-cache or --synthesize first")
+        sys.exit(1)
+    if not benchmark(fixtures, args.repeat):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Streaming JSONL output with a checkpoint of completed URLs.
+
+Scrapers append one JSON record per researcher as soon as it is scraped and
+record its URL in a checkpoint file, so an interrupted run resumes where it
+stopped instead of starting over. `compact` turns the JSONL file into the
+JSON list that rag_profiles.py reads.
+"""
+import json
+import os
+
+
+class JsonlCheckpoint:
+    """Append-only JSONL records plus the set of URLs that were completed."""
+
+    def __init__(self, jsonl_path, checkpoint_path=None):
+        self.jsonl_path = jsonl_path
+        self.checkpoint_path = checkpoint_path or jsonl_path + '.done'
+        self.done = set()
+        if os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path, 'r', encoding='utf-8') as f:
+                self.done = {line.strip() for line in f if line.strip()}
+        self.drop_truncated_record()
+
+    def drop_truncated_record(self):
+        """Cut off the partial last line an interrupted run may have left.
+
+        New records would otherwise be appended to it and lost with it.
+        """
+        if not os.path.exists(self.jsonl_path):
+            return
+        with open(self.jsonl_path, 'rb+') as f:
+            end = f.seek(0, os.SEEK_END)
+            position = end
+            while position > 0:
+                start = max(0, position - 65536)
+                f.seek(start)
+                block = f.read(position - start)
+                newline = block.rfind(b'\n')
+                if newline != -1:
+                    position = start + newline + 1
+                    break
+                position = start
+            if position < end:
+                f.truncate(position)
+
+    def is_done(self, url):
+        return url in self.done
+
+    def write(self, record, url, completed=True):
+        """Append a record; mark its URL as done only if it was scraped without errors.
+
+        Records that are not marked done are scraped again on the next run;
+        compaction keeps the last record per URL.
+        """
+        with open(self.jsonl_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        if completed:
+            # Written after the record, so a crash in between only causes a re-scrape
+            with open(self.checkpoint_path, 'a', encoding='utf-8') as f:
+                f.write(url + '\n')
+            self.done.add(url)
+
+    def offsets(self, key):
+        """Map each key value to the file offset of its last complete record."""
+        offsets = {}
+        if not os.path.exists(self.jsonl_path):
+            return offsets
+        with open(self.jsonl_path, 'rb') as f:
+            offset = f.tell()
+            for line in iter(f.readline, b''):
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Truncated last line of an interrupted run
+                    record = None
+                if record is not None:
+                    offsets.pop(record[key], None)
+                    offsets[record[key]] = offset
+                offset = f.tell()
+        return offsets
+
+    def compact(self, output_path, key, order=None, indent=2):
+        """Write the last record per `key` as one JSON list to `output_path`.
+
+        Records follow `order` (a list of key values) when given, with any
+        other records appended in the order they were written. Records are
+        streamed from the JSONL file one at a time, and the output is
+        formatted exactly like json.dump(records, indent=indent).
+        """
+        offsets = self.offsets(key)
+        keys = [k for k in dict.fromkeys(order or []) if k in offsets]
+        ordered = set(keys)
+        keys += [k for k in offsets if k not in ordered]
+
+        tmp_path = output_path + '.tmp'
+        prefix = ' ' * indent
+        with open(self.jsonl_path if keys else os.devnull, 'rb') as source, \
+                open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('[' if keys else '[]')
+            for i, k in enumerate(keys):
+                source.seek(offsets[k])
+                record = json.loads(source.readline())
+                text = json.dumps(record, indent=indent, ensure_ascii=False)
+                f.write((',\n' if i else '\n') + '\n'.join(prefix + line for line in text.split('\n')))
+            if keys:
+                f.write('\n]')
+        os.replace(tmp_path, output_path)
+        return len(keys)
+
+    def clear(self):
+        """Remove the JSONL and checkpoint files after a completed run."""
+        for path in (self.jsonl_path, self.checkpoint_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self.done = set()
@@ -0,0 +1,173 @@
+"""Shared asynchronous crawler engine for the scraping scripts.
+
+One aiohttp session with keep-alive connection pools serves all requests.
+Each host gets its own concurrency limit and request rate, and transient
+failures (connection errors, timeouts, 429 and 5xx responses) are retried
+with exponential backoff. Concurrent fetches of the same URL share one
+request. With an HttpCache (see http_cache.py), fresh
+pages are served from disk and stale ones are revalidated conditionally.
+
+Usage:
+    async with Crawler(cache=HttpCache()) as crawler:
+        response = await crawler.fetch(url)
+        soup = BeautifulSoup(response.text, 'html.parser')
+"""
+import asyncio
+import random
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+from multidict import CIMultiDict
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class Response:
+    """The parts of an HTTP response the parsers need."""
+
+    def __init__(self, url, status, text, headers=None):
+        self.url = url
+        self.status = status
+        self.text = text
+        self.headers = headers or {}
+
+    @property
+    def ok(self):
+        return self.status < 400
+
+
+class HostLimiter:
+    """Limits concurrent requests and request rate for one host."""
+
+    def __init__(self, concurrency, rate):
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.interval = 1.0 / rate if rate else 0.0
+        self.lock = asyncio.Lock()
+        self.next_start = 0.0
+
+    async def __aenter__(self):
+        await self.semaphore.acquire()
+        if self.interval:
+            # Space request starts at least `interval` seconds apart
+            async with self.lock:
+                now = time.monotonic()
+                delay = self.next_start - now
+                self.next_start = max(now, self.next_start) + self.interval
+            if delay > 0:
+                await asyncio.sleep(delay)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.semaphore.release()
+
+
+class Crawler:
+    """Asynchronous HTTP client with connection pooling, rate limits and retries."""
+
+    def __init__(self, concurrency=32, per_host=4, rate_per_host=5.0, retries=3,
+                 backoff=0.5, timeout=30, user_agent="langgraph-advanced-rag-crawler", cache=None):
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.rate_per_host = rate_per_host
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.headers = {"User-Agent": user_agent}
+        self.cache = cache
+        self.session = None
+        self.limiters = {}
+        self.inflight = {}
+        self.stats = {"requests": 0, "retries": 0, "errors": 0, "deduplicated": 0}
+
+    async def __aenter__(self):
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            limit_per_host=self.per_host,
+            keepalive_timeout=30,
+            ttl_dns_cache=300,
+        )
+        self.session = aiohttp.ClientSession(connector=connector, timeout=self.timeout, headers=self.headers)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.session.close()
+
+    def limiter(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.limiters:
+            self.limiters[host] = HostLimiter(self.per_host, self.rate_per_host)
+        return self.limiters[host]
+
+    def retry_delay(self, attempt, response=None):
+        if response is not None and response.headers.get("Retry-After", "").isdigit():
+            return float(response.headers["Retry-After"])
+        return self.backoff * (2 ** attempt) * (1 + random.random() / 2)
+
+    async def request(self, url, headers=None):
+        """Perform a single GET request and return a Response."""
+        async with self.limiter(url):
+            async with self.session.get(url, headers=headers) as resp:
+                text = await resp.text(errors="replace")
+                return Response(str(resp.url), resp.status, text, CIMultiDict(resp.headers))
+
+    async def fetch(self, url, headers=None):
+        """GET a URL through the cache (if any), retrying transient failures.
+
+        Non-transient error responses (e.g. 404) are returned, not raised, so
+        the parsers see the same pages they did with plain requests.get.
+        Callers fetching a URL that is already being fetched share that request.
+        """
+        if headers is not None:
+            return await self.fetch_uncoalesced(url, headers)
+        task = self.inflight.get(url)
+        if task is None:
+            task = asyncio.ensure_future(self.fetch_uncoalesced(url))
+            self.inflight[url] = task
+            task.add_done_callback(lambda _: self.inflight.pop(url, None))
+        else:
+            self.stats["deduplicated"] += 1
+        # Shielded so that one cancelled caller does not cancel the others
+        return await asyncio.shield(task)
+
+    async def fetch_uncoalesced(self, url, headers=None):
+        if self.cache is None:
+            return await self.fetch_with_retries(url, headers)
+
+        entry = self.cache.get(url)
+        if entry is not None:
+            if self.cache.is_fresh(entry):
+                self.cache.record_fresh_hit(entry)
+                return Response(url, entry.status, entry.body)
+            headers = {**(headers or {}), **self.cache.conditional_headers(entry)}
+
+        response = await self.fetch_with_retries(url, headers)
+        if response.status == 304 and entry is not None:
+            self.cache.record_revalidated(entry, response.headers)
+            return Response(url, entry.status, entry.body, response.headers)
+        if response.status == 200:
+            self.cache.store(url, response.status, response.text, response.headers)
+        return response
+
+    async def fetch_with_retries(self, url, headers=None):
+        """GET a URL, retrying transient failures with exponential backoff."""
+        for attempt in range(self.retries + 1):
+            self.stats["requests"] += 1
+            try:
+                response = await self.request(url, headers)
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                if attempt == self.retries:
+                    self.stats["errors"] += 1
+                    raise
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.retry_delay(attempt))
+                continue
+            if response.status in RETRY_STATUSES and attempt < self.retries:
+                self.stats["retries"] += 1
+                await asyncio.sleep(self.retry_delay(attempt, response))
+                continue
+            return response
+
+    async def fetch_all(self, urls):
+        """Fetch several URLs concurrently; failed fetches are returned as exceptions."""
+        return await asyncio.gather(*(self.fetch(url) for url in urls), return_exceptions=True)
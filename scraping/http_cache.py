@@ -0,0 +1,128 @@
+"""Persistent HTTP cache with conditional revalidation for the crawler.
+
+Response bodies are stored zlib-compressed in a SQLite file, keyed by URL.
+A cached response younger than the max-age of its URL pattern is served
+without a request; older ones are revalidated with If-None-Match /
+If-Modified-Since, so unchanged pages come back as 304 Not Modified.
+"""
+import os
+import re
+import sqlite3
+import time
+import zlib
+
+DEFAULT_CACHE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.http_cache.sqlite3')
+
+# (URL pattern, max-age in seconds); the first matching pattern wins
+MAX_AGE_POLICIES = [
+    # The member list is what tells us about new researchers: always revalidate
+    (r'crig\.ugent\.be/en/all-crig-group-leaders-and-members', 0),
+    (r'research\.ugent\.be/web/result/project/', 7 * 86400),
+    (r'research\.ugent\.be/web/person/', 86400),
+    (r'crig\.ugent\.be/', 86400),
+    (r'ai\.ugent\.be/', 86400),
+]
+DEFAULT_MAX_AGE = 3600
+
+
+class CachedResponse:
+    """A response stored in the cache."""
+
+    def __init__(self, url, status, body, etag, last_modified, fetched_at):
+        self.url = url
+        self.status = status
+        self.body = body
+        self.etag = etag
+        self.last_modified = last_modified
+        self.fetched_at = fetched_at
+
+
+class HttpCache:
+    """SQLite-backed HTTP response cache shared by all scraping scripts."""
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, policies=MAX_AGE_POLICIES, default_max_age=DEFAULT_MAX_AGE):
+        self.path = path
+        self.policies = [(re.compile(pattern), max_age) for pattern, max_age in policies]
+        self.default_max_age = default_max_age
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " url TEXT PRIMARY KEY, status INTEGER, etag TEXT, last_modified TEXT,"
+            " fetched_at REAL, body BLOB, body_bytes INTEGER)"
+        )
+        self.conn.commit()
+        self.stats = {
+            "fresh_hits": 0,
+            "revalidated": 0,
+            "misses": 0,
+            "bytes_saved": 0,
+            "bytes_downloaded": 0,
+        }
+
+    def max_age(self, url):
+        for pattern, max_age in self.policies:
+            if pattern.search(url):
+                return max_age
+        return self.default_max_age
+
+    def get(self, url):
+        row = self.conn.execute(
+            "SELECT status, body, etag, last_modified, fetched_at FROM responses WHERE url = ?", (url,)
+        ).fetchone()
+        if row is None:
+            return None
+        status, body, etag, last_modified, fetched_at = row
+        return CachedResponse(url, status, zlib.decompress(body).decode('utf-8'), etag, last_modified, fetched_at)
+
+    def is_fresh(self, entry):
+        return time.time() - entry.fetched_at < self.max_age(entry.url)
+
+    def conditional_headers(self, entry):
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def store(self, url, status, body, headers):
+        data = body.encode('utf-8')
+        self.conn.execute(
+            "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (url, status, headers.get('ETag'), headers.get('Last-Modified'), time.time(),
+             zlib.compress(data), len(data))
+        )
+        self.conn.commit()
+        self.stats["misses"] += 1
+        self.stats["bytes_downloaded"] += len(data)
+
+    def record_fresh_hit(self, entry):
+        self.stats["fresh_hits"] += 1
+        self.stats["bytes_saved"] += len(entry.body.encode('utf-8'))
+
+    def record_revalidated(self, entry, headers):
+        """A 304 confirmed the entry; restart its max-age and keep any new validators."""
+        self.conn.execute(
+            "UPDATE responses SET fetched_at = ?, etag = COALESCE(?, etag),"
+            " last_modified = COALESCE(?, last_modified) WHERE url = ?",
+            (time.time(), headers.get('ETag'), headers.get('Last-Modified'), entry.url)
+        )
+        self.conn.commit()
+        self.stats["revalidated"] += 1
+        self.stats["bytes_saved"] += len(entry.body.encode('utf-8'))
+
+    def report(self):
+        """Return a one-line summary of hit rates and bytes saved."""
+        hits = self.stats["fresh_hits"] + self.stats["revalidated"]
+        total = hits + self.stats["misses"]
+        hit_rate = hits / total if total else 0.0
+        return (
+            f"HTTP cache: {total} lookups, {hit_rate:.1%} hits "
+            f"({self.stats['fresh_hits']} fresh, {self.stats['revalidated']} revalidated with 304, "
+            f"{self.stats['misses']} downloaded); "
+            f"{self.stats['bytes_saved'] / 1e6:.1f} MB saved, "
+            f"{self.stats['bytes_downloaded'] / 1e6:.1f} MB downloaded"
+        )
+
+    def close(self):
+        self.conn.close()
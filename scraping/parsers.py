@@ -0,0 +1,411 @@
+"""Page parsers for the CRIG and research.ugent.be scrapers.
+
+Every function takes the HTML of a page and returns plain data, so the same
+parsers work with any fetcher (see crawler.py).
+
+Pages are parsed with lxml when it is installed, and with Python's
+html.parser otherwise. The per-researcher parsers only build the parts of the
+page they read, such as the profile blocks or the project sections, instead
+of the whole tree with navigation, scripts and footers. Their output is
+identical to a full html.parser parse (see bench_parsers.py).
+"""
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from datetime import datetime
+import importlib.util
+import re
+
+CRIG_BASE_URL = 'https://www.crig.ugent.be'
+CRIG_MEMBERS_URL = 'https://www.crig.ugent.be/en/all-crig-group-leaders-and-members'
+RESEARCH_BASE_URL = 'https://research.ugent.be'
+ORCID_URL_PATTERN = re.compile(r"https://orcid.org/\d{4}-\d{4}-\d{4}-\d{3}[\dX]")
+
+# Build only the elements a parser reads; False builds the full tree
+TARGETED_PARSING = True
+# lxml builds trees several times faster than html.parser, which is the fallback without it
+HTML_PARSER = 'lxml' if importlib.util.find_spec('lxml') else 'html.parser'
+
+
+def has_class(attrs, class_name):
+    """Whether the raw attributes of a tag being parsed include a CSS class."""
+    return class_name in (attrs.get('class') or '').split()
+
+
+# Top-level elements each parser needs; everything inside them is kept
+CRIG_PROFILE_ELEMENTS = SoupStrainer(
+    lambda name, attrs: (name == 'meta' and attrs.get('name') in ('description', 'keywords'))
+    or name == 'h2'
+    or (name == 'div' and has_class(attrs, 'group-right'))
+)
+RESEARCHER_DETAILS_ELEMENTS = SoupStrainer(
+    lambda name, attrs: name == 'div' and attrs.get('id') in ('id1a', 'id23', 'id24')
+)
+SECTION_ELEMENTS = SoupStrainer(lambda name, attrs: name == 'div' and has_class(attrs, 'margin-bottom-gl'))
+PROJECT_PAGE_ELEMENTS = SoupStrainer(
+    lambda name, attrs: name == 'div' and (attrs.get('id') == 'description_showmore' or has_class(attrs, 'keywords'))
+)
+ORCID_LINK_ELEMENTS = SoupStrainer(
+    lambda name, attrs: name == 'a' and ORCID_URL_PATTERN.search(attrs.get('href') or '') is not None
+)
+
+
+def make_soup(html, elements):
+    """Parse only the given elements of a page (a SoupStrainer), or the whole page if targeted parsing is off."""
+    return BeautifulSoup(html, HTML_PARSER, parse_only=elements if TARGETED_PARSING else None)
+
+
+def clean_html(text):
+    """Remove HTML tags and clean up whitespace."""
+    text = re.sub(r'<[^>]+>', '', text)
+    text = re.sub(r'\s+', ' ', text)
+    return text.strip()
+
+
+def get_research_profile_url(name):
+    """Convert researcher name to research.ugent.be profile URL."""
+    formatted_name = name.lower().replace(' ', '-')
+    return f"https://research.ugent.be/web/person/{formatted_name}-0/en"
+
+
+def get_projects_url(name):
+    """Convert researcher name to research.ugent.be projects URL."""
+    formatted_name = name.lower().replace(' ', '-')
+    return f"https://research.ugent.be/web/person/{formatted_name}-0/projects/en"
+
+
+def get_publications_url(name):
+    """Convert researcher name to research.ugent.be publications URL."""
+    formatted_name = name.lower().replace(' ', '-')
+    return f"https://research.ugent.be/web/person/{formatted_name}-0/publications/en"
+
+
+def parse_member_list(html):
+    """Extract researcher names and CRIG profile URLs from the CRIG member list."""
+    soup = BeautifulSoup(html, HTML_PARSER)
+
+    # Find all researcher profile links
+    researchers = []
+    for node in soup.find_all('div', class_='node-partner'):
+        link = node.find('a', class_='field-group-link')
+        if link:
+            profile_url = link['href']
+            if not profile_url.startswith('http'):
+                profile_url = CRIG_BASE_URL + profile_url
+            img_tag = node.find('img')
+            if img_tag and 'alt' in img_tag.attrs:
+                name = img_tag['alt']
+                researchers.append({'name': name, 'profile_url': profile_url})
+
+    # Parse the additional researcher list from the specific div
+    additional_section = soup.find('div', class_='field--name-field-rich-text')
+    if additional_section:
+        for li in additional_section.find_all('li'):
+            link = li.find('a')
+            if link:
+                name = link.text.strip()
+                profile_url = link['href']
+                if not profile_url.startswith('http'):
+                    profile_url = CRIG_BASE_URL + profile_url
+                researchers.append({'name': name, 'profile_url': profile_url})
+    return researchers
+
+
+def parse_crig_profile(html):
+    """Extract description, keywords, research focus and contact info from a CRIG profile page."""
+    profile_soup = make_soup(html, CRIG_PROFILE_ELEMENTS)
+    profile = {}
+
+    # Extract description from meta tag
+    description_tag = profile_soup.find('meta', {'name': 'description'})
+    if description_tag:
+        profile['description'] = description_tag['content']
+
+    # Extract keywords from meta tag
+    keywords_tag = profile_soup.find('meta', {'name': 'keywords'})
+    if keywords_tag:
+        profile['keywords'] = keywords_tag['content'].split(', ')
+
+    # Extract research focus if available
+    research_focus_header = profile_soup.find('h2', string='Research focus')
+    if research_focus_header:
+        focus_text = research_focus_header.find_next('div', class_='group-right').get_text(strip=True)
+        profile['research_focus'] = focus_text
+
+    # Extract contact information if available
+    contact_header = profile_soup.find('h2', string='Contact & links')
+    if contact_header:
+        contact_info = contact_header.find_next('div', class_='group-right').get_text(separator=' ', strip=True)
+        profile['contact_info'] = contact_info
+
+        # Extract links if available
+        links = []
+        for link in contact_header.find_next('div', class_='group-right').find_all('a'):
+            link_url = link.get('href')
+            link_text = link.get_text(strip=True)
+            links.append({'text': link_text, 'url': link_url})
+        profile['links'] = links
+    return profile
+
+
+def parse_researcher_details(html):
+    """Extract positions, research disciplines and expertise from a research.ugent.be profile page."""
+    soup = make_soup(html, RESEARCHER_DETAILS_ELEMENTS)
+    details = {}
+
+    # Extract current positions
+    positions_div = soup.find('div', {'id': 'id1a'})
+    if positions_div:
+        positions = []
+        for position_div in positions_div.find_all('div', class_='detailblokje'):
+            position = {}
+
+            # Title
+            title_span = position_div.find('span', class_='header-6 text-black')
+            if title_span:
+                position['title'] = title_span.text.strip()
+
+            # Faculty
+            faculty_link = position_div.find('a', href=lambda x: x and '/ge/en' in x)
+            if faculty_link:
+                position['faculty'] = faculty_link.text.strip()
+
+            # Department
+            dept_span = position_div.find('span', class_='header-7 text-black')
+            if dept_span:
+                position['department'] = dept_span.text.strip()
+
+            if position:
+                positions.append(position)
+
+        if positions:
+            details['current_positions'] = positions
+
+    # Extract research disciplines
+    disciplines_div = soup.find('div', {'id': 'id23'})
+    if disciplines_div:
+        disciplines = []
+
+        # Find all discipline categories
+        for category_div in disciplines_div.find_all('div', class_='header-6'):
+            category = {
+                'category': category_div.text.strip(),
+                'disciplines': []
+            }
+
+            # Find the ul that follows this category
+            next_ul = category_div.find_next_sibling('ul')
+            if next_ul:
+                for li in next_ul.find_all('li'):
+                    normal_span = li.find('span', class_='normal')
+                    if normal_span:
+                        discipline = {
+                            'name': normal_span.text.strip(),
+                            'code': normal_span.get('data-code', '')
+                        }
+
+                        # Get description from popover
+                        info_icon = li.find('span', class_='fas fa-info-circle')
+                        if info_icon and 'data-content' in info_icon.attrs:
+                            content = info_icon['data-content']
+                            try:
+                                if 'Description' in content:
+                                    desc_parts = content.split('Description')
+                                    if len(desc_parts) > 1:
+                                        description = desc_parts[1]
+                                        if 'Classification' in description:
+                                            description = description.split('Classification')[0]
+                                        description = clean_html(description)
+                                        discipline['description'] = description
+                            except Exception:
+                                pass  # Skip description if there's an error
+
+                        category['disciplines'].append(discipline)
+
+            if category['disciplines']:
+                disciplines.append(category)
+
+        if disciplines:
+            details['research_disciplines'] = disciplines
+
+    # Extract expertise
+    expertise_div = soup.find('div', {'id': 'id24'})
+    if expertise_div:
+        keywords_div = expertise_div.find('div', class_='keywords')
+        if keywords_div:
+            expertise = []
+            for keyword in keywords_div.find_all('span', class_='keyword-label'):
+                if keyword.text.strip():
+                    expertise.append(keyword.text.strip())
+
+            if expertise:
+                details['expertise'] = expertise
+
+    return details
+
+
+def parse_projects_page(html):
+    """Extract project titles and URLs, grouped by role, from a research.ugent.be projects page."""
+    projects_soup = make_soup(html, SECTION_ELEMENTS)
+    projects = {'promotor': [], 'copromotor': [], 'fellow': []}
+
+    # Find project sections by role
+    for section in projects_soup.find_all('div', class_='margin-bottom-gl'):
+        header = section.find('div', class_='header-5')
+        if header:
+            role_text = header.text.strip().lower()
+            role = None
+            if 'promotor' in role_text and 'co' not in role_text:
+                role = 'promotor'
+            elif 'copromotor' in role_text:
+                role = 'copromotor'
+            elif 'fellow' in role_text:
+                role = 'fellow'
+
+            if role:
+                # Find all project titles and links in this section
+                for project in section.find_all('div', class_='fiche'):
+                    project_link = project.find('a')
+                    if project_link:
+                        title_div = project_link.find('div', class_='header-6')
+                        if title_div:
+                            project_url = project_link['href']
+                            if project_url.startswith('/'):
+                                project_url = RESEARCH_BASE_URL + project_url
+                            projects[role].append({'title': title_div.text.strip(), 'url': project_url})
+    return projects
+
+
+def normalize_project_url(project_url):
+    """Convert relative project URLs to absolute research.ugent.be URLs."""
+    if project_url.startswith('../'):
+        # Extract the relevant part of the path after 'result/project/'
+        match = re.search(r'result/project/(.+?)$', project_url)
+        if match:
+            project_path = match.group(1)
+            project_url = f'https://research.ugent.be/web/result/project/{project_path}'
+    elif project_url.startswith('/'):
+        project_url = RESEARCH_BASE_URL + project_url
+    return project_url
+
+
+def parse_project_description(html):
+    """Extract the description from a project's detail page."""
+    return project_description(make_soup(html, PROJECT_PAGE_ELEMENTS))
+
+
+def project_description(soup):
+    description_div = soup.find('div', {'id': 'description_showmore'})
+    if description_div:
+        # Find the paragraph within the description div
+        description_p = description_div.find('p')
+        if description_p:
+            return clean_html(description_p.get_text())
+        # If no paragraph found, try getting all text content
+        return clean_html(description_div.get_text())
+    return None
+
+
+def parse_project_page(html):
+    """Extract the description and keywords from a project's detail page."""
+    soup = make_soup(html, PROJECT_PAGE_ELEMENTS)
+    project = {'description': project_description(soup)}
+
+    keywords_div = soup.find('div', class_='keywords')
+    if keywords_div:
+        keywords = [kw.text.strip() for kw in keywords_div.find_all('span') if kw.text.strip()]
+        if keywords:
+            project['keywords'] = keywords
+    return project
+
+
+def parse_orcid(html):
+    """Extract the ORCID iD linked from a research.ugent.be profile page."""
+    soup = make_soup(html, ORCID_LINK_ELEMENTS)
+    orcid_link = soup.find('a', href=ORCID_URL_PATTERN)
+    if orcid_link:
+        return orcid_link.text.strip()
+    return None
+
+
+def extract_publication_info(pub_div, year):
+    """Extract publication information from a publication div."""
+    # Find the first title, authors, type and venue elements in one walk over the div
+    spans = {}
+    authors_div = None
+    for tag in pub_div.descendants:
+        if not isinstance(tag, Tag):
+            continue
+        if tag.name == 'span':
+            spans.setdefault(tag.get('data-type'), tag)
+        elif tag.name == 'div' and authors_div is None and 'italic-text' in tag.get('class', ()):
+            authors_div = tag
+
+    # Extract title
+    title_span = spans.get('title')
+    if not title_span:
+        return None
+    publication = {'title': title_span.text.strip(), 'year': year}
+
+    # Extract authors
+    authors = []
+    if authors_div:
+        for person_span in authors_div.find_all('span', {'data-type': 'person'}):
+            authors.append(person_span.text.strip())
+    if authors:
+        publication['authors'] = authors
+
+    # Get publication type
+    type_span = spans.get('type')
+    if type_span:
+        publication['type'] = type_span.text.strip()
+
+    # Get journal/publication venue
+    ref_title_span = spans.get('ref-title')
+    if ref_title_span:
+        publication['venue'] = ref_title_span.text.strip()
+
+    return publication
+
+
+def parse_publications_page(html, years=7):
+    """Extract the publications of the last `years` years from a research.ugent.be publications page."""
+    publications_soup = make_soup(html, SECTION_ELEMENTS)
+
+    publications = []
+    current_year = datetime.now().year
+    cutoff_year = current_year - years
+
+    # Track processed publications to avoid duplicates
+    processed_titles = set()
+
+    # Find all year sections
+    year_sections = publications_soup.find_all('div', class_='margin-bottom-gl')
+
+    for section in year_sections:
+        # Get year from header
+        year_header = section.find('div', class_='header-5')
+        if not year_header:
+            continue
+
+        try:
+            year = int(year_header.find('span').text.strip())
+            if year < cutoff_year:
+                continue
+
+            # Find publications container
+            pubs_container = section.find('div', style='margin-left: 4em;')
+            if not pubs_container:
+                continue
+
+            # Find all publication divs
+            for pub_div in pubs_container.find_all('div', class_='bg-blue-hover'):
+                publication = extract_publication_info(pub_div, year)
+                # Skip if we've already processed this publication
+                if publication is None or publication['title'] in processed_titles:
+                    continue
+                processed_titles.add(publication['title'])
+                publications.append(publication)
+
+        except (ValueError, AttributeError):
+            continue
+
+    return publications
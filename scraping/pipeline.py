@@ -0,0 +1,209 @@
+"""Staged scraping pipeline producing one consolidated record per CRIG researcher.
+
+    discover -> fetch profile -> fan out to projects, publications and ORCID
+
+The CRIG member list is fetched once. For every researcher, the CRIG profile
+and the research.ugent.be profile are fetched once. Projects, publications
+and the ORCID iD are then gathered concurrently; the ORCID iD is read from
+the profile page that was already fetched. Project pages shared by several
+researchers are fetched and parsed once per run. A pool of workers processes
+researchers concurrently, and every record is appended to a JSONL file as
+soon as it is complete (see checkpoint.py).
+
+Usage:
+    python scraping/pipeline.py [--no-projects] [--no-publications] [--no-orcid] [--workers 16]
+"""
+import argparse
+import asyncio
+import os
+
+from checkpoint import JsonlCheckpoint
+from crawler import RETRY_STATUSES, Crawler
+from http_cache import HttpCache
+from parsers import (
+    CRIG_MEMBERS_URL,
+    get_research_profile_url,
+    normalize_project_url,
+    parse_crig_profile,
+    parse_member_list,
+    parse_orcid,
+    parse_project_page,
+    parse_projects_page,
+    parse_publications_page,
+    parse_researcher_details,
+)
+
+SCRAPING_DIR = os.path.dirname(os.path.abspath(__file__))
+OUTPUT_PATH = os.path.join(SCRAPING_DIR, 'researchers_crig.json')
+JSONL_PATH = os.path.join(SCRAPING_DIR, 'researchers_crig.jsonl')
+STAGES = ('projects', 'publications', 'orcid')
+
+
+class ScrapePipeline:
+    """Runs the scraping stages for all CRIG researchers."""
+
+    def __init__(self, crawler, checkpoint, stages=STAGES, workers=16):
+        self.crawler = crawler
+        self.checkpoint = checkpoint
+        self.stages = set(stages)
+        self.workers = workers
+        # Parsed project pages, shared by every researcher on the project
+        self.project_pages = {}
+        self.stats = {'researchers': 0, 'failed': 0, 'project_pages': 0, 'shared_project_pages': 0}
+
+    async def discover(self):
+        """Stage 1: fetch the CRIG member list."""
+        print(f"Fetching CRIG members from {CRIG_MEMBERS_URL}")
+        response = await self.crawler.fetch(CRIG_MEMBERS_URL)
+        return parse_member_list(response.text)
+
+    async def project_details(self, project_url):
+        """Description and keywords of a project page, fetched once per run."""
+        task = self.project_pages.get(project_url)
+        if task is None:
+            task = asyncio.ensure_future(self.fetch_project_page(project_url))
+            self.project_pages[project_url] = task
+            self.stats['project_pages'] += 1
+        else:
+            self.stats['shared_project_pages'] += 1
+        return await asyncio.shield(task)
+
+    async def fetch_project_page(self, project_url):
+        # Errors fail the projects stage of every researcher on the project, so they are retried on resume
+        response = await self.crawler.fetch(normalize_project_url(project_url))
+        if response.status in RETRY_STATUSES:
+            raise RuntimeError(f"HTTP {response.status} for project page {response.url}")
+        return parse_project_page(response.text)
+
+    async def projects(self, research_url):
+        """Fan-out stage: projects by role, with their descriptions."""
+        response = await self.crawler.fetch(research_url.replace('/en', '/projects/en'))
+        projects = parse_projects_page(response.text)
+        for role, role_projects in projects.items():
+            details = await asyncio.gather(*(self.project_details(project['url']) for project in role_projects))
+            projects[role] = [
+                {'title': project['title'], 'url': project['url'], **project_details}
+                for project, project_details in zip(role_projects, details)
+            ]
+        return projects if any(projects.values()) else None
+
+    async def publications(self, research_url):
+        """Fan-out stage: publications of the last seven years."""
+        response = await self.crawler.fetch(research_url.replace('/en', '/publications/en'))
+        return parse_publications_page(response.text) or None
+
+    async def process(self, researcher):
+        """Stages 2 and 3 for one researcher. Returns False if any fetch failed."""
+        completed = True
+        print(f"\nProcessing {researcher['name']}...")
+
+        # Stage 2: CRIG profile and research.ugent.be profile, concurrently
+        research_url = get_research_profile_url(researcher['name'])
+        crig_response, research_response = await asyncio.gather(
+            self.crawler.fetch(researcher['profile_url']),
+            self.crawler.fetch(research_url),
+            return_exceptions=True,
+        )
+        if isinstance(crig_response, Exception):
+            print(f"Error fetching CRIG profile: {str(crig_response)}")
+            completed = False
+        else:
+            researcher.update(parse_crig_profile(crig_response.text))
+        if isinstance(research_response, Exception):
+            print(f"Error fetching research profile: {str(research_response)}")
+            return False
+        researcher.update(parse_researcher_details(research_response.text))
+
+        # Stage 3: fan out
+        if 'orcid' in self.stages:
+            orcid = parse_orcid(research_response.text)
+            if orcid:
+                researcher['orcid'] = orcid
+        fan_out = [stage for stage in ('projects', 'publications') if stage in self.stages]
+        results = await asyncio.gather(
+            *(getattr(self, stage)(research_url) for stage in fan_out),
+            return_exceptions=True,
+        )
+        for stage, result in zip(fan_out, results):
+            if isinstance(result, Exception):
+                print(f"Error fetching {stage}: {str(result)}")
+                completed = False
+            elif result:
+                researcher[stage] = result
+        return completed
+
+    async def worker(self, queue):
+        while True:
+            researcher = await queue.get()
+            try:
+                try:
+                    completed = await self.process(researcher)
+                except Exception as e:
+                    # An unexpected error (e.g. in a parser) fails this researcher, not the worker
+                    print(f"Error processing {researcher['name']}: {str(e)}")
+                    completed = False
+                self.checkpoint.write(researcher, researcher['profile_url'], completed)
+                self.stats['researchers'] += 1
+                if not completed:
+                    self.stats['failed'] += 1
+            finally:
+                queue.task_done()
+
+    async def run(self):
+        """Run all stages; returns the discovered researchers in member-list order."""
+        researchers = await self.discover()
+
+        # Researchers completed by an interrupted earlier run are skipped
+        pending = [researcher for researcher in researchers if not self.checkpoint.is_done(researcher['profile_url'])]
+        if len(pending) < len(researchers):
+            print(f"Resuming: {len(researchers) - len(pending)} of {len(researchers)} researchers already scraped")
+
+        # A bounded queue keeps memory flat however long the member list is
+        queue = asyncio.Queue(maxsize=self.workers * 2)
+        workers = [asyncio.create_task(self.worker(queue)) for _ in range(self.workers)]
+        for researcher in pending:
+            await queue.put(researcher)
+        await queue.join()
+        for worker in workers:
+            worker.cancel()
+        return researchers
+
+
+async def main(stages=STAGES, workers=16):
+    checkpoint = JsonlCheckpoint(JSONL_PATH)
+    cache = HttpCache()
+    async with Crawler(cache=cache) as crawler:
+        pipeline = ScrapePipeline(crawler, checkpoint, stages, workers)
+        researchers = await pipeline.run()
+
+    print(cache.report())
+    cache.close()
+    print(
+        f"Pipeline: {pipeline.stats['researchers']} researchers processed ({pipeline.stats['failed']} with errors), "
+        f"{pipeline.stats['project_pages']} project pages fetched, "
+        f"{pipeline.stats['shared_project_pages']} project page fetches saved by sharing, "
+        f"{crawler.stats['deduplicated']} concurrent duplicate fetches merged"
+    )
+
+    # Compact the JSONL records into the JSON file, in member list order
+    order = [researcher['profile_url'] for researcher in researchers]
+    count = checkpoint.compact(OUTPUT_PATH, key='profile_url', order=order)
+
+    # Keep the checkpoint if some researchers failed, so the next run retries them
+    if all(checkpoint.is_done(url) for url in order):
+        checkpoint.clear()
+    else:
+        print("Some researchers could not be scraped; run again to retry them")
+
+    print(f"\nScraping completed. {count} researchers saved to {OUTPUT_PATH}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Scrape consolidated CRIG researcher profiles")
+    parser.add_argument('--no-projects', action='store_true', help="skip the projects stage")
+    parser.add_argument('--no-publications', action='store_true', help="skip the publications stage")
+    parser.add_argument('--no-orcid', action='store_true', help="skip the ORCID stage")
+    parser.add_argument('--workers', type=int, default=16, help="researchers processed concurrently")
+    args = parser.parse_args()
+    stages = [stage for stage in STAGES if not getattr(args, f'no_{stage}')]
+    asyncio.run(main(stages, args.workers))
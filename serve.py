@@ -0,0 +1,170 @@
+"""Preforking production server for the RAG web interface.
+
+The RAG engine (profile documents, Chroma index and embedding model) is built
+once in the master process. Workers are forked afterwards, so they share those
+pages copy-on-write instead of each loading their own copy.
+
+Usage:
+    python serve.py --workers 4 --host 0.0.0.0 --port 8000
+
+Send SIGUSR1 to the master process to log a per-worker memory report.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import threading
+
+from werkzeug.serving import make_server
+
+logger = logging.getLogger(__name__)
+
+# Counters read from /proc/<pid>/smaps_rollup, in kB, and the unique set size derived from them
+MEMORY_FIELDS = ["Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty"]
+REPORT_FIELDS = MEMORY_FIELDS + ["Uss"]
+
+
+def read_memory(pid):
+    """Return the memory counters (in kB) of a process, or None if unavailable."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    memory = {}
+    for line in lines:
+        parts = line.split()
+        if len(parts) >= 2 and parts[0].rstrip(':') in MEMORY_FIELDS:
+            memory[parts[0].rstrip(':')] = int(parts[1])
+    # Pages no other process maps: freed when the process exits
+    memory["Uss"] = memory.get("Private_Clean", 0) + memory.get("Private_Dirty", 0)
+    return memory
+
+
+def log_memory_report(worker_pids):
+    """Log the memory of the master and every worker.
+
+    Pss is the fair share of a process (shared pages are divided among the
+    processes mapping them); Uss (Private_Clean + Private_Dirty) is what one
+    extra worker costs.
+    """
+    rows = [("master", os.getpid())] + [(f"worker {i}", pid) for pid, i in sorted(worker_pids.items(), key=lambda item: item[1])]
+    logger.info("Memory report (MiB): " + " | ".join(f"{field:>13}" for field in REPORT_FIELDS))
+    for label, pid in rows:
+        memory = read_memory(pid)
+        if memory is None:
+            logger.info(f"{label} (pid {pid}): memory counters unavailable")
+            continue
+        values = " | ".join(f"{memory.get(field, 0) / 1024:13.1f}" for field in REPORT_FIELDS)
+        logger.info(f"{label:>9} (pid {pid}): {values}")
+
+
+def create_listen_socket(host, port, backlog):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(app, sock, host, port):
+    """Serve requests on the inherited listening socket until SIGTERM."""
+    # Requests are handled on fresh threads, so Chroma's per-thread SQLite
+    # connections are opened in the worker and never shared with the master.
+    server = make_server(host, port, app, threaded=True, fd=sock.fileno())
+
+    def shutdown(signum, frame):
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGUSR1, signal.SIG_DFL)
+    logger.info(f"Worker {os.getpid()} serving on http://{host}:{port}")
+    server.serve_forever()
+    # os._exit skips atexit, so write out the queued log records first
+    logging.shutdown()
+    os._exit(0)
+
+
+def spawn_worker(app, sock, host, port):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(app, sock, host, port)
+        except Exception as e:
+            logger.error(f"Worker {os.getpid()} crashed: {str(e)}")
+        finally:
+            os._exit(1)
+    return pid
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Preforking server for the RAG web interface")
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("RAG_WORKERS", os.cpu_count() or 1)),
+                        help="number of worker processes (default: $RAG_WORKERS or the number of CPU cores)")
+    parser.add_argument("--host", default=os.environ.get("RAG_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("RAG_PORT", 8000)))
+    parser.add_argument("--backlog", type=int, default=128)
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Importing app builds the RAG engine once, in the master process
+    from app import app
+
+    # Move everything allocated so far out of the garbage collector's reach so
+    # collections in the workers don't write to (and un-share) those pages.
+    gc.collect()
+    gc.freeze()
+
+    sock = create_listen_socket(args.host, args.port, args.backlog)
+    workers = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGUSR1, lambda signum, frame: log_memory_report(workers))
+
+    for i in range(args.workers):
+        workers[spawn_worker(app, sock, args.host, args.port)] = i
+    logger.info(f"Master {os.getpid()} started {args.workers} workers on http://{args.host}:{args.port}")
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        index = workers.pop(pid, None)
+        if index is None:
+            continue
+        if not stopping:
+            logger.warning(f"Worker {pid} exited with status {status}, restarting it")
+            workers[spawn_worker(app, sock, args.host, args.port)] = index
+
+    sock.close()
+    logger.info("All workers stopped")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        logger.error(f"Failed to start server: {str(e)}")
+        sys.exit(1)
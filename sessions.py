@@ -0,0 +1,190 @@
+"""Conversation sessions for follow-up questions.
+
+A session remembers the last few turns of a conversation: each question, the
+profiles retrieved for it and the grader's verdict on every one of them. A
+follow-up such as "which of those has worked on zebrafish?" is answered from
+the profiles the previous turn found relevant. They are re-ranked against the
+new question and graded again, and retrieval only runs when none of them
+fit. Verdicts for a question that was already asked in the session are reused.
+
+Sessions are kept in a SQLite file shared by all serving processes, so a
+follow-up can be handled by any worker. Their number is bounded (least
+recently used sessions are dropped first) and sessions that have been idle
+for longer than the TTL are evicted.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import uuid
+from collections import deque
+
+# Questions that refer back to the previous answer
+FOLLOW_UP_PATTERN = re.compile(
+    r"\b(?:those|these|them|they|their|above|previous(?:ly)?|earlier|same|"
+    r"which one|of whom|among)\b",
+    re.IGNORECASE
+)
+SESSION_ID_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def new_session_id():
+    return uuid.uuid4().hex
+
+
+def normalize_question(question):
+    return " ".join(question.lower().split())
+
+
+class Turn:
+    """One question of a session, with the profiles graded for it (in retrieval order)."""
+
+    def __init__(self, question, profile_ids, verdicts):
+        self.question = question
+        self.profile_ids = list(profile_ids)
+        self.verdicts = dict(verdicts)
+
+    def relevant(self):
+        return [pid for pid in self.profile_ids if self.verdicts.get(pid)]
+
+    def to_json(self):
+        return {"question": self.question, "profile_ids": self.profile_ids, "verdicts": self.verdicts}
+
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["question"], data["profile_ids"], data["verdicts"])
+
+
+class Session:
+    """The last `max_turns` turns of one conversation."""
+
+    def __init__(self, session_id, max_turns=5, turns=()):
+        self.id = session_id
+        self.turns = deque(turns, maxlen=max_turns)
+
+    def last_turn(self):
+        return self.turns[-1] if self.turns else None
+
+    def is_follow_up(self, question):
+        """Whether a question refers back to a previous answer that found relevant profiles."""
+        last = self.last_turn()
+        return last is not None and bool(last.relevant()) and FOLLOW_UP_PATTERN.search(question) is not None
+
+    def cached_verdict(self, question, profile_id):
+        """The verdict on a profile for the same question earlier in the session, or None."""
+        question = normalize_question(question)
+        for turn in reversed(self.turns):
+            if normalize_question(turn.question) == question and profile_id in turn.verdicts:
+                return turn.verdicts[profile_id]
+        return None
+
+
+class SessionStore:
+    """Sessions by ID in a SQLite file, bounded by `max_sessions` and evicted after `ttl_seconds` of inactivity.
+
+    Counters are kept per process; the number of active sessions is shared.
+    """
+
+    def __init__(self, path, max_sessions=1000, ttl_seconds=1800, max_turns=5):
+        self.path = path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self._lock = threading.Lock()
+        self._conn = None
+        self._pid = None
+        self._counters = {
+            "created": 0,
+            "evicted_expired": 0,
+            "evicted_lru": 0,
+            "follow_ups": 0,
+            "follow_ups_from_cache": 0,
+            "follow_up_fallbacks": 0,
+            "cached_verdicts": 0,
+        }
+
+    def _connection(self):
+        # SQLite connections must not be shared across fork(), so each serving process opens its own
+        if self._pid != os.getpid():
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            # Autocommit mode; transactions are started explicitly
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS sessions (id TEXT PRIMARY KEY, turns TEXT, last_used REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS sessions_last_used ON sessions (last_used)")
+            self._pid = os.getpid()
+        return self._conn
+
+    def get(self, session_id):
+        """The session with this ID, created if it does not exist (or expired)."""
+        if not isinstance(session_id, str) or not SESSION_ID_PATTERN.match(session_id):
+            raise ValueError(f"Invalid session ID: {session_id!r}")
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._evict(conn, now)
+                row = conn.execute("SELECT turns FROM sessions WHERE id = ?", (session_id,)).fetchone()
+                if row is None:
+                    conn.execute("INSERT INTO sessions (id, turns, last_used) VALUES (?, '[]', ?)", (session_id, now))
+                    self._counters["created"] += 1
+                    count = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+                    if count > self.max_sessions:
+                        conn.execute(
+                            "DELETE FROM sessions WHERE id IN "
+                            "(SELECT id FROM sessions WHERE id != ? ORDER BY last_used LIMIT ?)",
+                            (session_id, count - self.max_sessions)
+                        )
+                        self._counters["evicted_lru"] += count - self.max_sessions
+                    turns = []
+                else:
+                    conn.execute("UPDATE sessions SET last_used = ? WHERE id = ?", (now, session_id))
+                    turns = [Turn.from_json(turn) for turn in json.loads(row[0])]
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return Session(session_id, self.max_turns, turns)
+
+    def add_turn(self, session, question, profile_ids, verdicts):
+        """Add a turn to a session and store it.
+
+        The turn is appended to the stored turns, so turns added by other
+        processes since the session was loaded are kept.
+        """
+        turn = Turn(question, profile_ids, verdicts)
+        session.turns.append(turn)
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT turns FROM sessions WHERE id = ?", (session.id,)).fetchone()
+                turns = (json.loads(row[0]) if row is not None else []) + [turn.to_json()]
+                conn.execute(
+                    "INSERT OR REPLACE INTO sessions (id, turns, last_used) VALUES (?, ?, ?)",
+                    (session.id, json.dumps(turns[-self.max_turns:], ensure_ascii=False), time.time())
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _evict(self, conn, now):
+        evicted = conn.execute("DELETE FROM sessions WHERE last_used <= ?", (now - self.ttl_seconds,)).rowcount
+        self._counters["evicted_expired"] += evicted
+
+    def record(self, event, count=1):
+        with self._lock:
+            self._counters[event] += count
+
+    def stats(self):
+        with self._lock:
+            active = self._connection().execute(
+                "SELECT COUNT(*) FROM sessions WHERE last_used > ?", (time.time() - self.ttl_seconds,)
+            ).fetchone()[0]
+            return {"active": active, **self._counters}
@@ -0,0 +1,213 @@
+"""Precomputed researcher-similarity graph.
+
+Every profile is represented by the normalized mean of its (chunk)
+embeddings. The graph stores each profile's top-N most similar profiles by
+cosine similarity. It is computed with blocked matrix products over all
+pairs, stored next to the index as `similarity.npz`, and updated
+incrementally when profiles change: only rows of changed profiles, and rows
+that pointed at them, are recomputed. Lookups are a dict access and a slice,
+with no LLM or vector store involved.
+
+Usage:
+    python similarity.py [--version VERSION] [--top-n 20]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SIMILARITY_FILE = "similarity.npz"
+BLOCK_SIZE = 1024
+VECTOR_TOLERANCE = 1e-6
+
+
+def profile_vectors(collection, page_size=5000):
+    """Profile IDs and the normalized mean embedding of each profile's documents in a Chroma collection."""
+    sums = {}
+    counts = {}
+    offset = 0
+    while True:
+        page = collection.get(include=["embeddings", "metadatas"], limit=page_size, offset=offset)
+        if not page["ids"]:
+            break
+        for embedding, metadata in zip(page["embeddings"], page["metadatas"]):
+            pid = (metadata or {}).get("profile_id")
+            if pid is None:
+                continue
+            if pid in sums:
+                sums[pid] += np.asarray(embedding, dtype=np.float32)
+                counts[pid] += 1
+            else:
+                sums[pid] = np.array(embedding, dtype=np.float32)
+                counts[pid] = 1
+        offset += len(page["ids"])
+
+    ids = sorted(sums)
+    if not ids:
+        return ids, np.zeros((0, 0), dtype=np.float32)
+    vectors = np.stack([sums[pid] / counts[pid] for pid in ids])
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return ids, vectors / np.maximum(norms, 1e-12)
+
+
+def top_neighbors(rows, vectors, width, block_size=BLOCK_SIZE):
+    """Top-`width` neighbours (excluding itself) of each row index, by cosine similarity."""
+    neighbors = np.zeros((len(rows), width), dtype=np.int32)
+    scores = np.zeros((len(rows), width), dtype=np.float32)
+    if width == 0:
+        return neighbors, scores
+    for start in range(0, len(rows), block_size):
+        block = rows[start:start + block_size]
+        sims = vectors[block] @ vectors.T
+        sims[np.arange(len(block)), block] = -np.inf
+        top = np.argpartition(-sims, width - 1, axis=1)[:, :width]
+        top_sims = np.take_along_axis(sims, top, axis=1)
+        order = np.argsort(-top_sims, axis=1, kind="stable")
+        neighbors[start:start + len(block)] = np.take_along_axis(top, order, axis=1)
+        scores[start:start + len(block)] = np.take_along_axis(top_sims, order, axis=1)
+    return neighbors, scores
+
+
+class SimilarityGraph:
+    """Top-N most similar profiles of every profile."""
+
+    def __init__(self, ids, vectors, neighbors, scores, top_n):
+        self.ids = list(ids)
+        self.vectors = vectors
+        self.neighbors = neighbors
+        self.scores = scores
+        self.top_n = top_n
+        self.rows = {pid: row for row, pid in enumerate(self.ids)}
+
+    def __contains__(self, profile_id):
+        return profile_id in self.rows
+
+    def similar(self, profile_id, k=10):
+        """The up to k most similar profiles as (profile_id, score), most similar first."""
+        row = self.rows[profile_id]
+        return [
+            (self.ids[neighbor], float(score))
+            for neighbor, score in zip(self.neighbors[row, :k], self.scores[row, :k])
+        ]
+
+    def save(self, path):
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, ids=np.array(self.ids, dtype=str), vectors=self.vectors,
+                     neighbors=self.neighbors, scores=self.scores, top_n=self.top_n)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            return cls(data["ids"].tolist(), data["vectors"], data["neighbors"], data["scores"], int(data["top_n"]))
+
+
+def build_graph(ids, vectors, top_n):
+    """Compute the graph over all pairs of profiles."""
+    width = min(top_n, max(len(ids) - 1, 0))
+    neighbors, scores = top_neighbors(np.arange(len(ids)), vectors, width)
+    return SimilarityGraph(ids, vectors, neighbors, scores, top_n)
+
+
+def update_graph(graph, ids, vectors, top_n):
+    """Update a graph to new profile vectors, recomputing only what changed.
+
+    Returns the graph and the number of rows recomputed against all profiles:
+    those of new or changed profiles, and those whose neighbours changed or
+    were removed. The remaining rows merge their stored neighbours with the
+    changed profiles, which gives the same result as a full rebuild.
+    """
+    width = min(top_n, max(len(ids) - 1, 0))
+    if graph is None or graph.top_n != top_n or graph.neighbors.shape[1] != width \
+            or graph.vectors.shape[1:] != vectors.shape[1:]:
+        return build_graph(ids, vectors, top_n), len(ids)
+
+    # A profile is unchanged if its vector is (up to float summation order) the same
+    old_rows = np.array([graph.rows.get(pid, -1) for pid in ids], dtype=np.int64)
+    unchanged = old_rows >= 0
+    unchanged[unchanged] = np.abs(graph.vectors[old_rows[unchanged]] - vectors[unchanged]).max(axis=1) <= VECTOR_TOLERANCE
+    changed = ~unchanged
+    old_to_new = np.full(len(graph.ids), -1, dtype=np.int64)
+    old_to_new[old_rows[unchanged]] = np.flatnonzero(unchanged)
+    if not changed.any() and len(ids) == len(graph.ids):
+        return graph, 0
+
+    # Old rows whose stored neighbours are no longer valid (changed or removed)
+    kept_old_rows = np.flatnonzero(old_to_new >= 0)
+    mapped = old_to_new[graph.neighbors[kept_old_rows]]
+    stale = (mapped < 0) | changed[np.maximum(mapped, 0)]
+    affected = old_to_new[kept_old_rows[stale.any(axis=1)]]
+    recompute = np.union1d(np.flatnonzero(changed), affected).astype(np.int64)
+    merge = np.setdiff1d(old_to_new[kept_old_rows], affected).astype(np.int64)
+
+    neighbors = np.zeros((len(ids), width), dtype=np.int32)
+    scores = np.zeros((len(ids), width), dtype=np.float32)
+    neighbors[recompute], scores[recompute] = top_neighbors(recompute, vectors, width)
+
+    changed_rows = np.flatnonzero(changed)
+    new_to_old = {row: old_row for old_row, row in enumerate(old_to_new) if row >= 0}
+    for start in range(0, len(merge), BLOCK_SIZE):
+        block = merge[start:start + BLOCK_SIZE]
+        old_rows = np.array([new_to_old[row] for row in block])
+        candidates = np.concatenate([old_to_new[graph.neighbors[old_rows]],
+                                     np.broadcast_to(changed_rows, (len(block), len(changed_rows)))], axis=1)
+        candidate_scores = np.concatenate([graph.scores[old_rows], vectors[block] @ vectors[changed_rows].T], axis=1)
+        top = np.argsort(-candidate_scores, axis=1, kind="stable")[:, :width]
+        neighbors[block] = np.take_along_axis(candidates, top, axis=1)
+        scores[block] = np.take_along_axis(candidate_scores, top, axis=1)
+
+    return SimilarityGraph(ids, vectors, neighbors, scores, top_n), len(recompute)
+
+
+def update_graph_file(collection, path, top_n, previous_path=None):
+    """Bring the graph at `path` up to date with a Chroma collection and save it.
+
+    The graph at `previous_path` (default: `path`) is updated incrementally
+    if it exists. Returns the graph.
+    """
+    start = time.perf_counter()
+    previous_path = previous_path or path
+    previous = SimilarityGraph.load(previous_path) if os.path.exists(previous_path) else None
+    ids, vectors = profile_vectors(collection)
+    graph, updated_rows = update_graph(previous, ids, vectors, top_n)
+    if graph is not previous or previous_path != path:
+        graph.save(path)
+        logger.info(f"Similarity graph: {updated_rows} of {len(ids)} profiles recomputed "
+                    f"in {time.perf_counter() - start:.2f}s")
+    return graph
+
+
+def load_graph(path):
+    """Load the graph stored with an index, or None if it was not built."""
+    return SimilarityGraph.load(path) if os.path.exists(path) else None
+
+
+def main():
+    import chromadb
+    import rag_profiles
+
+    parser = argparse.ArgumentParser(description="Build or update the researcher-similarity graph of an index")
+    parser.add_argument("--version", help="snapshot version (default: the active snapshot, or EMBEDDINGS_DIR)")
+    parser.add_argument("--top-n", type=int, default=rag_profiles.SIMILAR_TOP_N, help="neighbours stored per profile")
+    args = parser.parse_args()
+
+    directory, chroma_dir, collection_name = rag_profiles.index_location(args.version)
+    collection = chromadb.PersistentClient(path=chroma_dir).get_collection(collection_name)
+    graph = update_graph_file(collection, os.path.join(directory, SIMILARITY_FILE), args.top_n)
+    print(f"Similarity graph of {len(graph.ids)} profiles in {os.path.join(directory, SIMILARITY_FILE)}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+                        stream=sys.stdout)
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
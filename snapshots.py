@@ -0,0 +1,250 @@
+"""Versioned, immutable index snapshots.
+
+Each snapshot is a directory under the snapshots root:
+
+    <root>/<version>/chroma/          Chroma persist directory (embeddings)
+    <root>/<version>/profiles.json    profile store the index was built from
+    <root>/<version>/similarity.npz   researcher-similarity graph (see similarity.py)
+    <root>/<version>/quantized/       quantized vectors, if enabled (see quantized_store.py)
+    <root>/<version>/metadata.json    build metadata (source, counts, model)
+    <root>/<version>/manifest.json    version, creation time and file checksums
+
+`<root>/CURRENT` names the active version and `<root>/history.json` records
+every activation, which is used to garbage-collect snapshots that have been
+retired for longer than a grace period.
+
+Usage:
+    python snapshots.py build [--json PATH] [--activate]
+    python snapshots.py activate VERSION
+    python snapshots.py list
+    python snapshots.py gc [--grace SECONDS]
+"""
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import sys
+import time
+from datetime import datetime, timezone
+
+CHROMA_DIR = "chroma"
+PROFILES_FILE = "profiles.json"
+METADATA_FILE = "metadata.json"
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+HISTORY_FILE = "history.json"
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temporary file and rename it over `path`."""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def read_json(path, default=None):
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def snapshot_path(root, version):
+    return os.path.join(root, version)
+
+
+def read_manifest(path):
+    return read_json(os.path.join(path, MANIFEST_FILE))
+
+
+def list_snapshots(root):
+    """Return the versions of all complete snapshots, oldest first."""
+    if not os.path.isdir(root):
+        return []
+    versions = [
+        name for name in os.listdir(root)
+        if not name.startswith(".") and os.path.isfile(os.path.join(root, name, MANIFEST_FILE))
+    ]
+    return sorted(versions)
+
+
+def current_version(root):
+    """Return the active snapshot version, or None if no snapshot was activated."""
+    try:
+        with open(os.path.join(root, CURRENT_FILE), "r", encoding="utf-8") as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def activate(root, version):
+    """Atomically make `version` the active snapshot."""
+    if read_manifest(snapshot_path(root, version)) is None:
+        raise ValueError(f"Snapshot {version} does not exist in {root}")
+    history = read_json(os.path.join(root, HISTORY_FILE), [])
+    history.append({"version": version, "activated_at": time.time()})
+    write_json_atomic(os.path.join(root, HISTORY_FILE), history)
+
+    tmp_path = os.path.join(root, f".{CURRENT_FILE}.tmp.{os.getpid()}")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(version + "\n")
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, os.path.join(root, CURRENT_FILE))
+
+
+def build_snapshot(root, json_path, build_store):
+    """Build a new snapshot from a profile JSON file and return its version.
+
+    `build_store(profiles_path, chroma_dir)` must create the vector store in
+    `chroma_dir` and return a dict of metadata (e.g. document counts). The
+    snapshot is assembled in a hidden directory and renamed into place, so a
+    partially built snapshot is never visible.
+    """
+    os.makedirs(root, exist_ok=True)
+    source_sha256 = file_sha256(json_path)
+    created = datetime.now(timezone.utc)
+    # Microseconds, so builds of the same file within one second get their own version
+    version = f"{created.strftime('%Y%m%dT%H%M%S.%fZ')}-{source_sha256[:8]}"
+    # Per process, so two concurrent builds never share (or delete) each other's directory
+    tmp_dir = os.path.join(root, f".{version}.tmp.{os.getpid()}")
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+
+    try:
+        profiles_path = os.path.join(tmp_dir, PROFILES_FILE)
+        shutil.copyfile(json_path, profiles_path)
+        store_metadata = build_store(profiles_path, os.path.join(tmp_dir, CHROMA_DIR))
+
+        metadata = {
+            "source_path": os.path.abspath(json_path),
+            "source_sha256": source_sha256,
+            **store_metadata,
+        }
+        write_json_atomic(os.path.join(tmp_dir, METADATA_FILE), metadata)
+
+        files = {}
+        for dirpath, _, filenames in os.walk(tmp_dir):
+            for filename in filenames:
+                full_path = os.path.join(dirpath, filename)
+                files[os.path.relpath(full_path, tmp_dir)] = {
+                    "bytes": os.path.getsize(full_path),
+                    "sha256": file_sha256(full_path),
+                }
+        manifest = {
+            "version": version,
+            "created_at": created.isoformat(),
+            "created_ts": created.timestamp(),
+            "files": files,
+        }
+        write_json_atomic(os.path.join(tmp_dir, MANIFEST_FILE), manifest)
+        # rename() would silently replace an empty directory, so never reuse a version
+        if os.path.exists(snapshot_path(root, version)):
+            raise FileExistsError(f"Snapshot {version} already exists in {root}")
+        os.rename(tmp_dir, snapshot_path(root, version))
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    return version
+
+
+def activation_time(root, version):
+    """Return when `version` was last activated according to the history file, or None."""
+    history = read_json(os.path.join(root, HISTORY_FILE), [])
+    times = [entry["activated_at"] for entry in history if entry["version"] == version]
+    return times[-1] if times else None
+
+
+def retirement_times(root):
+    """Map each version that is no longer active to the time it was replaced."""
+    history = read_json(os.path.join(root, HISTORY_FILE), [])
+    retired = {}
+    for previous, following in zip(history, history[1:]):
+        if previous["version"] != following["version"]:
+            retired[previous["version"]] = following["activated_at"]
+    return retired
+
+
+def collect_garbage(root, grace_seconds, keep=()):
+    """Delete snapshots that were retired at least `grace_seconds` ago.
+
+    Age counts from the retirement time in the history file. The current
+    snapshot, snapshots newer than it, snapshots that were never active and
+    any version in `keep` are never deleted.
+    """
+    current = current_version(root)
+    retired = retirement_times(root)
+    now = time.time()
+    removed = []
+    for version in list_snapshots(root):
+        if version == current or version in keep or (current is not None and version > current):
+            continue
+        since = retired.get(version)
+        if since is not None and now - since >= grace_seconds:
+            shutil.rmtree(snapshot_path(root, version), ignore_errors=True)
+            removed.append(version)
+
+    if removed:
+        history = read_json(os.path.join(root, HISTORY_FILE), [])
+        history = [entry for entry in history if entry["version"] not in removed]
+        write_json_atomic(os.path.join(root, HISTORY_FILE), history)
+    return removed
+
+
+def main():
+    import rag_profiles
+
+    parser = argparse.ArgumentParser(description="Manage versioned index snapshots")
+    parser.add_argument("--root", default=rag_profiles.SNAPSHOTS_DIR, help="snapshots root directory")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    build_parser = subparsers.add_parser("build", help="build a new snapshot")
+    build_parser.add_argument("--json", default=rag_profiles.JSON_FILE_PATH, help="profile JSON file")
+    build_parser.add_argument("--activate", action="store_true", help="activate the snapshot once built")
+    activate_parser = subparsers.add_parser("activate", help="make a snapshot the active one")
+    activate_parser.add_argument("version")
+    subparsers.add_parser("list", help="list snapshots")
+    gc_parser = subparsers.add_parser("gc", help="delete retired snapshots")
+    gc_parser.add_argument("--grace", type=float, default=rag_profiles.SNAPSHOT_GRACE_SECONDS,
+                           help="seconds a snapshot must have been retired before it is deleted")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        version = build_snapshot(args.root, args.json, rag_profiles.build_snapshot_store)
+        print(f"Built snapshot {version}")
+        if args.activate:
+            activate(args.root, version)
+            print(f"Activated snapshot {version}")
+    elif args.command == "activate":
+        activate(args.root, args.version)
+        print(f"Activated snapshot {args.version}")
+    elif args.command == "list":
+        current = current_version(args.root)
+        for version in list_snapshots(args.root):
+            marker = "*" if version == current else " "
+            print(f"{marker} {version}")
+    elif args.command == "gc":
+        for version in collect_garbage(args.root, args.grace):
+            print(f"Removed snapshot {version}")
+
+
+if __name__ == "__main__":
+    try:
+        main()
+    except Exception as e:
+        print(f"Error: {e}")
+        sys.exit(1)
@@ -2,6 +2,8 @@ document.addEventListener('DOMContentLoaded', function() {
     const messagesContainer = document.getElementById('chat-messages');
     const userInput = document.getElementById('user-input');
     const sendButton = document.getElementById('send-button');
+    // Follow-up questions refer to earlier answers through the server-side session
+    let sessionId = sessionStorage.getItem('sessionId');
 
     // Auto-resize textarea as user types
     userInput.addEventListener('input', function() {
@@ -29,10 +31,14 @@ document.addEventListener('DOMContentLoaded', function() {
                 headers: {
                     'Content-Type': 'application/json',
                 },
-                body: JSON.stringify({ question: message })
+                body: JSON.stringify({ question: message, session_id: sessionId })
             })
             .then(response => response.json())
             .then(data => {
+                if (data.session_id) {
+                    sessionId = data.session_id;
+                    sessionStorage.setItem('sessionId', sessionId);
+                }
                 // Replace loading message with response
                 replaceMessage(loadingId, data.response, 'assistant');
             })
@@ -0,0 +1,300 @@
+"""Asynchronous, structured logging off the request path.
+
+A handler on the root logger puts records on a bounded in-memory queue; a
+background thread (QueueListener) formats them and writes them out. A request
+only pays for creating its records.
+
+  - The log file gets one JSON object per line, with the ID of the request
+    the record was logged in and any fields passed with `extra=`.
+  - String fields longer than `max_field_chars` are truncated.
+  - High-volume events can be sampled per request: a sampled request keeps all
+    of its records, so its grading can still be followed from start to end.
+  - The file is rotated by size and the rotated files are gzipped.
+  - When the queue is full, records are dropped and counted instead of blocking.
+
+Records are handed to the writer thread as they are, without copying. Values
+passed with `extra=` must therefore not be changed after logging them.
+"""
+import contextlib
+import contextvars
+import fcntl
+import gzip
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import shutil
+import sys
+import threading
+import time
+import uuid
+import zlib
+
+CONSOLE_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - [%(request_id)s] %(message)s'
+REQUEST_ID_PATTERN = re.compile(r"^[A-Za-z0-9_.-]{1,64}$")
+# Attributes of every LogRecord; any other attribute was passed with extra=
+RECORD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime", "request_id"}
+
+request_id_var = contextvars.ContextVar("request_id", default=None)
+
+
+def new_request_id():
+    return uuid.uuid4().hex[:16]
+
+
+@contextlib.contextmanager
+def request_context(request_id=None):
+    """Tag the records logged inside the block (also in threads started from it) with a request ID."""
+    token = request_id_var.set(request_id or new_request_id())
+    try:
+        yield request_id_var.get()
+    finally:
+        request_id_var.reset(token)
+
+
+def truncate(value, limit):
+    if isinstance(value, str) and len(value) > limit:
+        return f"{value[:limit]}... [{len(value) - limit} more chars]"
+    return value
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record, with its extra fields and string values truncated."""
+
+    def __init__(self, max_field_chars=1000):
+        super().__init__()
+        self.max_field_chars = max_field_chars
+
+    def format(self, record):
+        entry = {
+            "time": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "pid": record.process,
+            "request_id": getattr(record, "request_id", None),
+            "message": truncate(record.getMessage(), self.max_field_chars),
+        }
+        for key, value in vars(record).items():
+            if key not in RECORD_ATTRIBUTES:
+                entry[key] = truncate(value, self.max_field_chars)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class RequestContextFilter(logging.Filter):
+    """Add the current request ID; must run in the logging thread, before the record is queued."""
+
+    def filter(self, record):
+        record.request_id = request_id_var.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """Keep a fraction of the records of some events ({event: rate}), decided per request."""
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def keeps(self, event, request_id):
+        rate = self.rates.get(event)
+        if rate is None:
+            return True
+        fraction = zlib.crc32(request_id.encode("utf-8")) / 2**32 if request_id else random.random()
+        return fraction < rate
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self.keeps(getattr(record, "event", None),
+                                                               getattr(record, "request_id", None))
+
+
+class BatchingQueueListener(logging.handlers.QueueListener):
+    """QueueListener that flushes its handlers once the queue is empty instead of after every record."""
+
+    def handle(self, record):
+        super().handle(record)
+        if self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+
+
+class AsyncHandler(logging.handlers.QueueHandler):
+    """Queue records for a listener thread that passes them to `handlers`."""
+
+    def __init__(self, handlers, max_queue=10000):
+        super().__init__(None)
+        self.handlers = handlers
+        self.max_queue = max_queue
+        self.listener = None
+        self._pid = None
+        self._start_lock = threading.Lock()
+        self._stats = {"enqueued": 0, "dropped": 0}
+        self.sampling = None
+        self.addFilter(RequestContextFilter())
+
+    def _start(self):
+        # The listener thread does not survive fork(), so every process starts its own
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self.queue = queue.Queue(self.max_queue)
+                self.listener = BatchingQueueListener(self.queue, *self.handlers, respect_handler_level=True)
+                self.listener.start()
+                self._stats = {"enqueued": 0, "dropped": 0}
+                self._pid = os.getpid()
+
+    def prepare(self, record):
+        # Formatting is left to the listener thread; the record stays in this process
+        return record
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+            self._stats["enqueued"] += 1
+        except queue.Full:
+            self._stats["dropped"] += 1
+
+    def flush(self):
+        """Wait until the queued records are written."""
+        if self._pid == os.getpid() and self.listener._thread is not None:
+            self.queue.join()
+            for handler in self.handlers:
+                handler.flush()
+
+    def close(self):
+        # Stopping the listener writes out the records that are still queued
+        with self._start_lock:
+            if self._pid == os.getpid():
+                self.listener.stop()
+                self._pid = None
+        for handler in self.handlers:
+            handler.close()
+        super().close()
+
+    def sample(self, rates):
+        """Keep only a fraction of the records of some events ({event: rate}), decided per request."""
+        self.sampling = SamplingFilter(rates)
+        self.addFilter(self.sampling)
+
+    def stats(self):
+        queued = self.queue.qsize() if self._pid == os.getpid() else 0
+        return {**self._stats, "queued": queued, "max_queue": self.max_queue}
+
+
+class CompressedRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """Log file rotated by size into gzipped backups (<path>.1.gz is the newest), for an AsyncHandler.
+
+    Several processes can write to the same file. One of them rotates it under
+    a file lock; the others notice the new file and reopen it.
+    """
+
+    def __init__(self, path, max_bytes, backup_count, reopen_interval=1.0):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        super().__init__(path, maxBytes=max_bytes, backupCount=backup_count, encoding="utf-8")
+        self.namer = lambda name: f"{name}.gz"
+        self.rotator = self._compress
+        self.reopen_interval = reopen_interval
+        self._checked_at = time.monotonic()
+        self._emitting = False
+
+    @staticmethod
+    def _compress(source, dest):
+        # Move the file away first, so that the other processes start a new one
+        rotating = f"{source}.rotating.{os.getpid()}"
+        os.rename(source, rotating)
+        with open(rotating, "rb") as src, gzip.open(dest, "wb") as out:
+            shutil.copyfileobj(src, out)
+        os.remove(rotating)
+
+    def _reopen(self):
+        if self.stream is not None:
+            self.stream.close()
+        self.stream = self._open()
+
+    def _reopen_if_rotated(self):
+        now = time.monotonic()
+        if self.stream is None or now - self._checked_at < self.reopen_interval:
+            return
+        self._checked_at = now
+        try:
+            rotated = os.stat(self.baseFilename).st_ino != os.fstat(self.stream.fileno()).st_ino
+        except FileNotFoundError:
+            rotated = True
+        if rotated:
+            self._reopen()
+
+    def emit(self, record):
+        self._reopen_if_rotated()
+        # Not flushed per record; BatchingQueueListener flushes once its queue is empty
+        self._emitting = True
+        try:
+            super().emit(record)
+        finally:
+            self._emitting = False
+
+    def flush(self):
+        if not self._emitting:
+            super().flush()
+
+    def doRollover(self):
+        with open(f"{self.baseFilename}.lock", "a") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another process may have rotated the file while this one waited for the lock
+                if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename) < self.maxBytes:
+                    self._reopen()
+                    return
+                super().doRollover()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def configure_logging(path=None, level="INFO", max_bytes=50 * 2**20, backup_count=5, max_field_chars=1000,
+                      sample_rates=None, console=True, max_queue=10000):
+    """Route all logging through one AsyncHandler on the root logger, writing JSON lines to `path`.
+
+    Calling it again returns the handler that is already installed.
+    """
+    root = logging.getLogger()
+    for handler in root.handlers:
+        if isinstance(handler, AsyncHandler):
+            return handler
+    handlers = []
+    if console:
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(console_handler)
+    if path:
+        file_handler = CompressedRotatingFileHandler(path, max_bytes, backup_count)
+        file_handler.setFormatter(JsonFormatter(max_field_chars))
+        handlers.append(file_handler)
+    handler = AsyncHandler(handlers, max_queue)
+    if sample_rates:
+        handler.sample(sample_rates)
+    root.addHandler(handler)
+    root.setLevel(level)
+    return handler
+
+
+def sampled(event):
+    """Whether the root logger keeps the records of `event` in the current request.
+
+    Lets callers skip building the payloads of records that would be sampled out.
+    """
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, AsyncHandler) and handler.sampling is not None:
+            return handler.sampling.keeps(event, request_id_var.get())
+    return True
+
+
+def stats():
+    """Queue counters of the root logger's AsyncHandler in this process, or None."""
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, AsyncHandler):
+            return handler.stats()
+    return None
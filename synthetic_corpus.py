@@ -0,0 +1,211 @@
+"""Synthetic researcher profiles in the researchers_crig.json schema, for scale-out tests.
+
+Profiles are sampled from the vocabulary of the scraped corpora (names,
+keywords, departments, research disciplines, project and publication titles),
+so their text lengths and field mix resemble the real ones. Every profile
+draws most of its fields from one seed profile ("topic"), which keeps it
+topically coherent and gives retrieval meaningful clusters. Profiles are
+written to disk one at a time, so a million of them do not need to fit in
+memory.
+
+Usage:
+    python synthetic_corpus.py --count 100000 --output synthetic_100k.json [--seed 0]
+"""
+import argparse
+import json
+import os
+import random
+import time
+
+from corpora import load_profiles
+
+FIRST_NAMES = ["An", "Bart", "Charlotte", "Dirk", "Els", "Filip", "Griet", "Hans", "Ine", "Jan", "Katrien", "Lieven",
+               "Marijke", "Nele", "Olivier", "Pieter", "Rik", "Sofie", "Tom", "Veerle", "Wim", "Yasmine"]
+LAST_NAMES = ["Claes", "De Smet", "Janssens", "Maes", "Mertens", "Peeters", "Vermeulen", "Willems", "Wouters",
+              "Van den Broeck", "Verstraete", "De Clercq", "Goossens", "Hermans", "Lambrecht", "Desmet"]
+POSITION_TITLES = ["Senior full professor", "Full professor", "Associate professor", "Assistant professor",
+                   "Postdoctoral fellow", "Doctoral fellow", "Research staff"]
+FACULTIES = ["Faculty of Medicine and Health Sciences", "Faculty of Sciences", "Faculty of Engineering and Architecture",
+             "Faculty of Bioscience Engineering", "Faculty of Pharmaceutical Sciences", "Faculty of Veterinary Medicine",
+             "Faculty of Psychology and Educational Sciences", "Faculty of Economics and Business Administration"]
+DEPARTMENTS = ["Department of Biomolecular Medicine", "Department of Human Structure and Repair",
+               "Department of Information Technology", "Department of Electronics and Information Systems",
+               "Department of Plant Biotechnology and Bioinformatics", "Department of Data Analysis and Mathematical Modelling",
+               "Department of Public Health and Primary Care", "Department of Internal Medicine and Pediatrics"]
+KEYWORDS = ["machine learning", "cancer biology", "immunology", "proteomics", "bioinformatics", "epidemiology",
+            "computer vision", "natural language processing", "cell signalling", "drug delivery", "genomics",
+            "human-robot interaction", "health economics", "radiotherapy", "metabolomics", "statistics"]
+VENUES = ["Nature Communications", "Cancer Research", "Bioinformatics", "PLOS ONE", "Scientific Reports",
+          "IEEE Transactions on Pattern Analysis and Machine Intelligence", "Journal of Clinical Oncology",
+          "Nucleic Acids Research", "Frontiers in Immunology", "NeurIPS"]
+PUBLICATION_TEMPLATES = ["{a} in {b}: a systematic review", "The role of {a} in {b}", "{a} and {b}: a prospective study",
+                         "Towards {a} for {b}", "Quantitative analysis of {a} in {b}", "{a} improves {b}"]
+PROJECT_TEMPLATES = ["{a} for {b}", "Unravelling {a} in {b}", "{a}: new approaches to {b}"]
+PROJECT_ROLES = ["promotor", "copromotor", "fellow"]
+SEED_CORPORA = [("scraping/researchers_crig.json", "crig"), ("researchers.json", "ai_ugent")]
+
+
+def tokens(text):
+    return [word for word in (text or "").split() if word]
+
+
+class Vocabulary:
+    """Pools of field values to sample from, with the seed profiles as topics."""
+
+    def __init__(self, profiles=()):
+        self.first_names, self.last_names = set(FIRST_NAMES), set(LAST_NAMES)
+        self.keywords, self.departments = set(KEYWORDS), set(DEPARTMENTS)
+        self.disciplines = {}
+        self.topics = []
+        for profile in profiles:
+            names = tokens(profile.get("name"))
+            if len(names) >= 2:
+                self.first_names.add(names[0])
+                self.last_names.add(" ".join(names[1:]))
+            keywords = [keyword for keyword in (profile.get("keywords") or []) + (profile.get("expertise") or []) if keyword]
+            self.keywords.update(keywords)
+            self.departments.update(position["department"] for position in profile.get("current_positions") or []
+                                    if position.get("department"))
+            for category in profile.get("research_disciplines") or []:
+                for discipline in category.get("disciplines") or []:
+                    self.disciplines.setdefault(discipline["name"], (category["category"], discipline))
+            titles = [p["title"] for p in profile.get("publications") or [] if p.get("title")]
+            projects = [(p.get("title"), p.get("description")) for ps in (profile.get("projects") or {}).values()
+                        for p in ps if p.get("title")]
+            # Only profiles with subject matter make useful topics
+            if keywords or titles or projects:
+                self.topics.append({"name": profile.get("name"), "keywords": keywords, "publications": titles,
+                                    "projects": projects, "description": profile.get("description")})
+        # Sets iterate in hash order, which changes between runs
+        for pool in ("first_names", "last_names", "keywords", "departments"):
+            setattr(self, pool, sorted(getattr(self, pool)))
+        self.disciplines = [self.disciplines[name] for name in sorted(self.disciplines)]
+        if not self.topics:
+            self.topics = [{"name": None, "keywords": [keyword], "publications": [], "projects": [], "description": None}
+                           for keyword in self.keywords]
+
+    @classmethod
+    def from_seed_corpora(cls, base_dir=os.path.dirname(os.path.abspath(__file__))):
+        """The vocabulary of the scraped corpora that exist (the built-in lists otherwise)."""
+        profiles = []
+        for path, schema in SEED_CORPORA:
+            path = os.path.join(base_dir, path)
+            if os.path.exists(path):
+                profiles.extend(load_profiles(path, schema))
+        return cls(profiles)
+
+
+def _count(rng, mean, maximum):
+    """A skewed count (most profiles have few items, some have many)."""
+    return min(int(rng.expovariate(1 / mean)), maximum) if mean else 0
+
+
+def _title(rng, templates, keywords):
+    first, second = rng.sample(keywords, 2) if len(keywords) >= 2 else (keywords[0], keywords[0])
+    title = rng.choice(templates).format(a=first, b=second)
+    return title[0].upper() + title[1:]
+
+
+def generate_profile(rng, vocabulary, index, publications_mean=8, projects_mean=3):
+    """One synthetic profile; `index` makes its name and URL unique."""
+    topic = rng.choice(vocabulary.topics)
+    first, last = rng.choice(vocabulary.first_names), rng.choice(vocabulary.last_names)
+    name = f"{first} {last}"
+    slug = f"{first}-{last}".lower().replace(" ", "-")
+    # Mostly the topic's keywords, with some from the whole corpus
+    keywords = list(dict.fromkeys(
+        rng.sample(topic["keywords"], min(len(topic["keywords"]), rng.randint(1, 6)))
+        + rng.sample(vocabulary.keywords, rng.randint(0, 3))
+    ))
+    subject = keywords or [rng.choice(vocabulary.keywords)]
+    department = rng.choice(vocabulary.departments)
+    faculty = rng.choice(FACULTIES)
+
+    profile = {
+        "name": name,
+        "profile_url": f"https://research.example.org/en/synthetic-{index}-{slug}",
+    }
+    if rng.random() < 0.9:
+        # The seed's biography, about the synthetic researcher instead
+        biography = (topic["description"] or "")[:rng.randint(200, 1200)]
+        if topic["name"]:
+            biography = biography.replace(topic["name"].strip(), name)
+        profile["description"] = f"{rng.choice(POSITION_TITLES).lower()} - {faculty} - {department}. {biography}".strip()
+    if rng.random() < 0.7:
+        profile["research_focus"] = ". ".join(_title(rng, PROJECT_TEMPLATES, subject) for _ in range(rng.randint(1, 4)))
+    profile["contact_info"] = f"{first}.{last.replace(' ', '')}@example.org"
+    profile["links"] = [{"text": department, "url": f"https://www.example.org/{slug}"}] if rng.random() < 0.5 else []
+    profile["current_positions"] = [
+        {"title": rng.choice(POSITION_TITLES), "faculty": faculty, "department": department}
+        for _ in range(1 + (rng.random() < 0.2))
+    ]
+    if vocabulary.disciplines:
+        categories = {}
+        for category, discipline in rng.sample(vocabulary.disciplines, min(len(vocabulary.disciplines), rng.randint(1, 5))):
+            categories.setdefault(category, []).append(dict(discipline))
+        profile["research_disciplines"] = [
+            {"category": category, "disciplines": disciplines} for category, disciplines in categories.items()
+        ]
+    profile["expertise"] = keywords
+
+    projects = {}
+    for _ in range(_count(rng, projects_mean, 60)):
+        if topic["projects"] and rng.random() < 0.7:
+            title, description = rng.choice(topic["projects"])
+        else:
+            title, description = _title(rng, PROJECT_TEMPLATES, subject), None
+        project = {"title": title, "url": f"https://research.example.org/project/{rng.getrandbits(64):016x}"}
+        if description:
+            project["description"] = description
+        projects.setdefault(rng.choice(PROJECT_ROLES), []).append(project)
+    profile["projects"] = projects
+
+    authors = [f"{rng.choice(vocabulary.last_names)}, {rng.choice(vocabulary.first_names)[0]}." for _ in range(8)]
+    publications = []
+    for _ in range(_count(rng, publications_mean, 400)):
+        if topic["publications"] and rng.random() < 0.5:
+            title = rng.choice(topic["publications"])[:300]
+        else:
+            title = _title(rng, PUBLICATION_TEMPLATES, subject)
+        publications.append({
+            "title": title,
+            "year": rng.randint(1995, 2025),
+            "authors": rng.sample(authors, rng.randint(1, 6)) + [f"{last}, {first[0]}."],
+            "type": rng.choice(["Journal Article", "Conference Paper", "Book Chapter"]),
+            "venue": rng.choice(VENUES),
+        })
+    profile["publications"] = publications
+    return profile
+
+
+def write_corpus(path, count, seed=0, vocabulary=None):
+    """Write `count` profiles to a JSON array file, one profile at a time. Returns the file size in bytes."""
+    vocabulary = vocabulary or Vocabulary.from_seed_corpora()
+    rng = random.Random(seed)
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i in range(count):
+            if i:
+                f.write(",\n")
+            f.write(json.dumps(generate_profile(rng, vocabulary, i), ensure_ascii=False))
+        f.write("\n]\n")
+    os.replace(tmp_path, path)
+    return os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic researcher profiles in the CRIG schema")
+    parser.add_argument("--count", type=int, required=True, help="number of profiles")
+    parser.add_argument("--output", required=True, help="JSON file to write")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    size = write_corpus(args.output, args.count, args.seed)
+    print(f"Wrote {args.count} profiles ({size / 2**20:.1f} MiB) to {args.output} in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
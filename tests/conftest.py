@@ -0,0 +1,11 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules import each other as top-level modules, like the scripts do when run
+for path in (ROOT, os.path.join(ROOT, "scraping")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+os.environ.setdefault("ANONYMIZED_TELEMETRY", "False")
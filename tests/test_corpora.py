@@ -0,0 +1,29 @@
+"""Merging the search results of several shards."""
+from langchain.schema import Document
+
+from corpora import merge_results
+
+
+def hit(name, profile_id, score):
+    return Document(page_content=name, metadata={"name": name, "profile_id": profile_id}), score
+
+
+def test_researcher_in_several_corpora_is_kept_once():
+    crig = [hit("Tony Belpaeme", "crig/1", 0.7)]
+    ai_ugent = [hit("Prof. Belpaeme, Tony", "ai/1", 0.9), hit("Jan Peeters", "ai/2", 0.5)]
+    merged = merge_results([crig, ai_ugent], 5)
+    assert [(doc.metadata["profile_id"], score) for doc, score in merged] == [("ai/1", 0.9), ("ai/2", 0.5)]
+
+
+def test_namesakes_within_one_corpus_are_all_kept():
+    crig = [hit("Jan Peeters", "crig/1", 0.9), hit("Jan Peeters", "crig/2", 0.8)]
+    ai_ugent = [hit("Peeters, Jan", "ai/1", 0.85)]
+    merged = merge_results([crig, ai_ugent], 5)
+    assert [doc.metadata["profile_id"] for doc, _ in merged] == ["crig/1", "crig/2"]
+
+
+def test_ties_keep_the_shard_order_and_k_limits():
+    primary = [hit("A", "p/a", 0.0), hit("B", "p/b", 0.0)]
+    shard = [hit("A", "s/a", 0.0), hit("C", "s/c", 0.0)]
+    assert [doc.metadata["profile_id"] for doc, _ in merge_results([primary, shard], 3)] == ["p/a", "p/b", "s/c"]
+    assert len(merge_results([primary, shard], 1)) == 1
@@ -0,0 +1,46 @@
+"""Failures in the query embedding batcher reach the callers instead of hanging them."""
+import threading
+from concurrent.futures import TimeoutError
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from embedding_service import QueryEmbeddingService
+
+
+class FlakyEmbeddings(Embeddings):
+    def __init__(self):
+        self.drop_vector = False
+        self.hold = None
+
+    def embed_documents(self, texts):
+        if self.hold is not None:
+            self.hold.wait()
+        vectors = [[float(len(text)), 1.0] for text in texts]
+        return vectors[:-1] if self.drop_vector else vectors
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_failed_batch_raises_and_the_batcher_keeps_running():
+    model = FlakyEmbeddings()
+    service = QueryEmbeddingService(model, max_wait_ms=1, timeout=5)
+    model.drop_vector = True
+    with pytest.raises(ValueError, match="1 texts"):
+        service.embed_query("vaccines")
+
+    model.drop_vector = False
+    assert service.embed_query("vaccines") == [8.0, 1.0]
+    assert service._thread.is_alive()
+
+
+def test_embed_query_times_out():
+    model = FlakyEmbeddings()
+    model.hold = threading.Event()
+    service = QueryEmbeddingService(model, max_wait_ms=1, timeout=0.2)
+    try:
+        with pytest.raises(TimeoutError):
+            service.embed_query("vaccines")
+    finally:
+        model.hold.set()
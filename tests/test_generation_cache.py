@@ -0,0 +1,51 @@
+"""Size-bounded generation cache shared between processes."""
+import os
+import sqlite3
+
+from generation_cache import GenerationCache
+
+
+def stored_bytes(path):
+    with sqlite3.connect(path) as conn:
+        return conn.execute("SELECT COALESCE(SUM(answer_bytes), 0) FROM generations").fetchone()[0]
+
+
+def test_running_total_follows_inserts_replacements_and_evictions(tmp_path):
+    path = str(tmp_path / "generation_cache.sqlite3")
+    cache = GenerationCache(path, max_bytes=100)
+    for i in range(8):
+        cache.put(f"q{i}", "x" * 20, 1.0)
+    cache.put("q7", "x" * 5, 1.0)
+    stats = cache.stats()
+    assert stats["bytes"] == stored_bytes(path) == 85
+    assert stats["evictions"] == 3
+    # The least recently used went first
+    assert cache.get("q0") is None
+    assert cache.get("q7") == "x" * 5
+
+
+def test_total_is_shared_between_processes(tmp_path):
+    path = str(tmp_path / "generation_cache.sqlite3")
+    cache = GenerationCache(path, max_bytes=100)
+    cache.put("parent", "x" * 40, 1.0)
+
+    pid = os.fork()
+    if pid == 0:
+        try:
+            GenerationCache(path, max_bytes=100).put("child", "y" * 40, 1.0)
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    cache.put("parent 2", "z" * 40, 1.0)
+    assert cache.stats()["bytes"] == stored_bytes(path) == 80
+    assert cache.get("parent") is None
+    assert cache.get("child") == "y" * 40
+
+
+def test_total_is_summed_for_an_existing_cache_file(tmp_path):
+    path = str(tmp_path / "generation_cache.sqlite3")
+    GenerationCache(path).put("q", "x" * 30, 1.0)
+    with sqlite3.connect(path) as conn:
+        conn.execute("DROP TABLE cache_size")
+    assert GenerationCache(path).stats()["bytes"] == 30
@@ -0,0 +1,139 @@
+"""LLM pool routing, circuit breaker, health checks and failover against stand-in Ollama servers."""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from bench_llm_pool import StandInOllama, make_pool
+from llm_pool import CLOSED, OPEN
+
+MODEL = "llama3"
+
+
+@pytest.fixture
+def servers():
+    servers = [StandInOllama([MODEL], latency=0.01, parallel=8) for _ in range(3)]
+    yield servers
+    for server in servers:
+        if server.gate is not None:
+            server.gate.set()
+        if not server.stopped:
+            server.down()
+
+
+def pool_for(servers, **kwargs):
+    # Health is checked explicitly by the tests
+    return make_pool(servers, MODEL, **{"health_interval": 0, **kwargs})
+
+
+def ask(pool, i=0):
+    return pool.invoke(f"Who works on topic {i}?").content
+
+
+def endpoint(pool, server):
+    return next(endpoint for endpoint in pool.endpoints if endpoint.url == server.url)
+
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise AssertionError("timed out")
+        time.sleep(0.005)
+
+
+def test_calls_go_to_the_endpoint_with_the_fewest_outstanding(servers):
+    pool = pool_for(servers)
+    for server in servers:
+        server.gate = threading.Event()
+    with ThreadPoolExecutor(8) as executor:
+        held = [executor.submit(ask, pool, i) for i in range(6)]
+        wait_until(lambda: sum(e.outstanding for e in pool.endpoints) == 6)
+        assert [e.outstanding for e in pool.endpoints] == [2, 2, 2]
+
+        # The first endpoint finishes its calls; new calls go to it while the others are still busy
+        servers[0].gate.set()
+        wait_until(lambda: endpoint(pool, servers[0]).outstanding == 0)
+        for i in range(4):
+            ask(pool, i)
+        assert servers[0].calls[MODEL] == 6
+        assert [e.outstanding for e in pool.endpoints[1:]] == [2, 2]
+
+        servers[1].gate.set()
+        servers[2].gate.set()
+        assert all(future.result(timeout=5) == f"Stand-in answer from {MODEL}" for future in held)
+    assert [server.calls[MODEL] for server in servers] == [6, 2, 2]
+
+
+def test_sick_endpoint_trips_its_breaker_and_leaves_rotation(servers):
+    pool = pool_for(servers, failure_threshold=2, reset_seconds=0.5)
+    sick = endpoint(pool, servers[1])
+    servers[1].failing = True
+    # Every call still gets an answer, from one of the healthy endpoints
+    answers = [ask(pool, i) for i in range(10)]
+    assert answers == [f"Stand-in answer from {MODEL}"] * 10
+    assert sick.breaker == OPEN
+    assert sick.stats["failures"] == 2
+    assert sick.stats["breaker_opened"] == 1
+
+    for i in range(10):
+        ask(pool, i)
+    assert sick.stats["calls"] == 2
+
+    # After reset_seconds one trial call closes the breaker again
+    servers[1].failing = False
+    time.sleep(0.5)
+    for i in range(6):
+        ask(pool, i)
+    assert sick.breaker == CLOSED
+    assert servers[1].calls[MODEL] > 0
+
+
+def test_endpoint_recovers_through_the_health_check(servers):
+    pool = pool_for(servers)
+    down = endpoint(pool, servers[2])
+    servers[2].down()
+    pool.check_health()
+    assert not down.healthy
+    for i in range(6):
+        ask(pool, i)
+    assert down.stats["calls"] == 0
+
+    servers[2].up()
+    pool.check_health()
+    assert down.healthy
+    for i in range(6):
+        ask(pool, i)
+    assert servers[2].calls[MODEL] == 2
+
+
+def test_health_check_requires_the_model(servers):
+    servers[0].models = ["llama3.2"]
+    pool = pool_for(servers)
+    pool.check_health()
+    assert [e.healthy for e in pool.endpoints] == [False, True, True]
+
+
+def test_failed_call_fails_over_to_another_endpoint(servers):
+    pool = pool_for(servers[:2])
+    servers[0].failing = True
+    for i in range(4):
+        assert ask(pool, i) == f"Stand-in answer from {MODEL}"
+    assert endpoint(pool, servers[0]).stats["failures"] >= 1
+    assert servers[1].calls[MODEL] == 4
+
+
+def test_timed_out_call_fails_over_to_another_endpoint(servers):
+    pool = pool_for(servers[:2], timeout=0.3)
+    hung = endpoint(pool, servers[0])
+    servers[0].gate = threading.Event()
+    latencies = []
+    # Ties rotate, so some of the calls are sent to the hung endpoint first
+    for i in range(4):
+        started = time.perf_counter()
+        assert ask(pool, i) == f"Stand-in answer from {MODEL}"
+        latencies.append(time.perf_counter() - started)
+    assert hung.stats["failures"] >= 1
+    assert max(latencies) >= 0.3
+    assert servers[1].calls[MODEL] == 4
@@ -0,0 +1,48 @@
+"""Targeted parsers against the baseline parsers of scraping/bench_parsers.py."""
+import importlib.util
+import os
+
+import pytest
+
+import bench_parsers
+import parsers
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "scraping")
+SAVED_PAGES = {
+    "researcher": "research_profile.html",
+    "crig_profile": "crig_profile.html",
+    "projects": "projects.html",
+    "project": "project.html",
+    "publications": "publications.html",
+}
+
+
+def fixtures(tmp_path, pages_per_type=20):
+    bench_parsers.synthesize(str(tmp_path), pages_per_type)
+    pages = bench_parsers.load_fixtures(str(tmp_path))
+    for kind, name in SAVED_PAGES.items():
+        with open(os.path.join(FIXTURES_DIR, name), "r", encoding="utf-8") as f:
+            pages[kind].append((name, f.read()))
+    return pages
+
+
+@pytest.mark.parametrize("html_parser", ["lxml", "html.parser"])
+def test_targeted_parsers_match_baseline(tmp_path, monkeypatch, html_parser):
+    if html_parser == "lxml" and importlib.util.find_spec("lxml") is None:
+        pytest.skip("lxml is not installed")
+    monkeypatch.setattr(parsers, "HTML_PARSER", html_parser)
+    assert bench_parsers.benchmark(fixtures(tmp_path), repeat=1)
+    assert parsers.TARGETED_PARSING
+
+
+def test_benchmark_reports_different_output(tmp_path, monkeypatch):
+    extract = parsers.extract_publication_info
+
+    def without_venue(pub_div, year):
+        publication = extract(pub_div, year)
+        if publication is not None:
+            publication.pop("venue", None)
+        return publication
+
+    monkeypatch.setattr(parsers, "extract_publication_info", without_venue)
+    assert not bench_parsers.benchmark(fixtures(tmp_path, 5), repeat=1)
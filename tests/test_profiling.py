@@ -0,0 +1,59 @@
+"""Request profiles include the threads that work for the query."""
+import threading
+import time
+
+from langchain_core.embeddings import Embeddings
+
+from embedding_service import QueryEmbeddingService
+from profiling import RequestProfile
+from rag_profiles import ShardedIndex
+
+
+class SlowEmbeddings(Embeddings):
+    def embed_documents(self, texts):
+        time.sleep(0.1)
+        return [[1.0, 0.0] for _ in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def search_shard(shard, started):
+    # Both searches run at once, whenever the pool threads get to start
+    started.wait()
+    time.sleep(0.1)
+    return shard
+
+
+def frame_names(profile, thread_prefix):
+    speedscope = profile.profiler.speedscope(profile.name)
+    names = set()
+    for thread in speedscope["profiles"]:
+        if thread["name"].startswith(f"{profile.name} [{thread_prefix}"):
+            names.update(speedscope["shared"]["frames"][i]["name"] for stack in thread["samples"] for i in stack)
+    return names
+
+
+def test_profile_samples_the_embedding_batcher(tmp_path):
+    service = QueryEmbeddingService(SlowEmbeddings(), max_wait_ms=1)
+    with RequestProfile("question", str(tmp_path), interval=0.005) as profile:
+        service.embed_query("vaccines")
+    assert profile.timings()["helper_thread_samples"]["query-embedding-batcher"] > 0
+    assert "SlowEmbeddings.embed_documents" in frame_names(profile, "query-embedding-batcher")
+
+    # An unprofiled query leaves no trace in a finished profile
+    service.embed_query("zebrafish")
+    assert list(profile.profiler.helper_samples) == ["query-embedding-batcher"]
+
+
+def test_profile_samples_the_shard_search_threads(tmp_path):
+    index = object.__new__(ShardedIndex)
+    index.shards = ["a", "b"]
+    index._executor, index._executor_pid = None, None
+    started = threading.Barrier(2)
+    with RequestProfile("question", str(tmp_path), interval=0.005) as profile:
+        assert index._map(lambda shard: search_shard(shard, started), index.shards) == ["a", "b"]
+    index._executor.shutdown()
+    counts = profile.timings()["helper_thread_samples"]
+    assert sorted(counts) == ["shard-search_0", "shard-search_1"] and all(counts.values())
+    assert "search_shard" in frame_names(profile, "shard-search")
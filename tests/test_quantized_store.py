@@ -0,0 +1,67 @@
+"""Quantized store export, search and loading."""
+import logging
+import os
+
+import chromadb
+import pytest
+
+import rag_profiles
+from bench_scaling import HashingEmbeddings
+from quantized_store import QuantizedVectorStore, export_collection
+from rag_profiles import Chroma, load_quantized_store
+
+TEXTS = [f"researcher {i} works on topic{i % 7} and method{i % 5}" for i in range(50)]
+
+
+@pytest.fixture
+def vectorstore(tmp_path):
+    embeddings = HashingEmbeddings(dim=64)
+    store = Chroma(persist_directory=str(tmp_path / "chroma"), embedding_function=embeddings, collection_name="profiles")
+    store.add_texts(TEXTS, metadatas=[{"profile_id": str(i)} for i in range(len(TEXTS))],
+                    ids=[str(i) for i in range(len(TEXTS))])
+    yield store
+    rag_profiles.close_vector_store(store)
+
+
+@pytest.mark.parametrize("mode", ["int8", "binary"])
+def test_search_reads_documents_from_disk(vectorstore, tmp_path, mode):
+    directory = str(tmp_path / "quantized")
+    export_collection(vectorstore._collection, directory, mode)
+    store = QuantizedVectorStore(directory)
+    try:
+        assert len(store.documents) == len(TEXTS)
+        query = HashingEmbeddings(dim=64).embed_query(TEXTS[12])
+        [best] = store.similarity_search_by_vector(query, k=1)
+        assert best.page_content == TEXTS[12]
+        assert best.metadata == {"profile_id": "12"}
+        # Only the offsets of the documents are held in memory
+        assert store.memory_bytes() == (store.codes.nbytes + store.documents.offsets.nbytes
+                                        + sum(value.nbytes for value in store.quantizer.values()))
+    finally:
+        store.close()
+
+
+def test_export_replaces_existing_store(vectorstore, tmp_path):
+    directory = str(tmp_path / "quantized")
+    export_collection(vectorstore._collection, directory, "binary")
+    export_collection(vectorstore._collection, directory, "int8")
+    assert QuantizedVectorStore(directory).mode == "int8"
+    assert sorted(os.listdir(tmp_path)) == ["chroma", "quantized"]
+
+
+def test_stale_store_falls_back_to_chroma(vectorstore, tmp_path, monkeypatch, caplog):
+    directory = str(tmp_path / "quantized")
+    monkeypatch.setattr(rag_profiles, "QUANTIZATION_MODE", "int8")
+    with caplog.at_level(logging.WARNING, logger=rag_profiles.logger.name):
+        assert load_quantized_store(vectorstore, directory) is None
+    assert not os.path.exists(directory)
+
+    export_collection(vectorstore._collection, directory, "int8")
+    assert load_quantized_store(vectorstore, directory) is not None
+
+    vectorstore.add_texts(["a new researcher"], ids=["new"])
+    with caplog.at_level(logging.WARNING, logger=rag_profiles.logger.name):
+        assert load_quantized_store(vectorstore, directory) is None
+    assert "searching Chroma instead" in caplog.text
+    # The stale store is left as it was; it is only rewritten by a build
+    assert len(QuantizedVectorStore(directory).documents) == len(TEXTS)
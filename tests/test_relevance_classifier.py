@@ -0,0 +1,37 @@
+"""Verdict log rotation and cross-validation of the relevance classifier."""
+import logging
+
+import numpy as np
+from langchain.schema import Document
+
+import relevance_classifier
+from relevance_classifier import configure_verdict_log, cross_validate, log_verdict, read_verdict_log
+
+
+def test_rotated_verdict_log_is_read_in_order(tmp_path, monkeypatch):
+    path = str(tmp_path / "grader_verdicts.jsonl")
+    monkeypatch.setattr(relevance_classifier, "verdict_logger", logging.getLogger("test_relevance_verdicts"))
+    relevance_classifier.verdict_logger.propagate = False
+    configure_verdict_log(path, max_bytes=2000, backup_count=50)
+    try:
+        for i in range(40):
+            log_verdict(f"question {i}", Document(page_content="x" * 100, metadata={"profile_id": str(i)}),
+                        i % 2 == 0, 1.0)
+    finally:
+        for handler in relevance_classifier.verdict_logger.handlers:
+            handler.close()
+            relevance_classifier.verdict_logger.removeHandler(handler)
+    assert (tmp_path / "grader_verdicts.jsonl.1.gz").exists()
+    assert [question for question, _, _ in read_verdict_log(path)] == [f"question {i}" for i in range(40)]
+
+
+def test_folds_whose_training_split_lacks_a_class_are_skipped():
+    rng = np.random.default_rng(0)
+    x = rng.normal(size=(12, 3))
+    # Every relevant verdict is in fold 0, so its training split only has irrelevant ones
+    y = np.array([1, 1, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0])
+    folds = np.array([0, 0, 0, 0, 1, 1, 1, 1, 2, 2, 2, 2])
+    probabilities, evaluated, skipped = cross_validate(x, y, folds, 3)
+    assert skipped == 1
+    assert evaluated.tolist() == [False] * 4 + [True] * 8
+    assert np.all(probabilities[~evaluated] == 0)
@@ -0,0 +1,365 @@
+"""Crawler, HTTP cache and checkpointed pipeline against a stand-in of the CRIG and research.ugent.be sites.
+
+The stand-in is an aiohttp server on localhost serving the saved pages in
+tests/fixtures/scraping. Each page is served with an ETag and answers a
+matching If-None-Match with 304 Not Modified.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import time
+
+from aiohttp import web
+
+import parsers
+import pipeline
+from checkpoint import JsonlCheckpoint
+from crawler import Crawler
+from http_cache import HttpCache
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "scraping")
+
+# (path pattern, fixture); the first matching pattern wins
+PAGES = [
+    (r"^/en/all-crig-group-leaders-and-members$", "member_list.html"),
+    (r"^/en/[^/]+$", "crig_profile.html"),
+    (r"^/web/person/[^/]+/projects/en$", "projects.html"),
+    (r"^/web/person/[^/]+/publications/en$", "publications.html"),
+    (r"^/web/person/[^/]+/en$", "research_profile.html"),
+    (r"^/web/result/project/[^/]+/en$", "project.html"),
+]
+
+
+class StandInSite:
+    """Local HTTP server serving the fixture pages, recording every request."""
+
+    def __init__(self, delay=0.0, port=0):
+        self.delay = delay
+        self.port = port
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        # path -> statuses to answer with first, e.g. [503]
+        self.statuses = {}
+        # path -> page text replacing the fixture
+        self.bodies = {}
+        # path -> asyncio.Event the request waits for
+        self.gates = {}
+        self.runner = None
+        self.url = None
+
+    def page(self, path):
+        if path in self.bodies:
+            return self.bodies[path]
+        for pattern, fixture in PAGES:
+            if re.match(pattern, path):
+                with open(os.path.join(FIXTURES_DIR, fixture), "r", encoding="utf-8") as f:
+                    return f.read()
+        return None
+
+    async def handle(self, request):
+        entry = {"path": request.path, "started": time.monotonic(),
+                 "if_none_match": request.headers.get("If-None-Match")}
+        self.requests.append(entry)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            if request.path in self.gates:
+                await self.gates[request.path].wait()
+            await asyncio.sleep(self.delay)
+            response = self.respond(request)
+            entry["status"] = response.status
+            return response
+        finally:
+            self.active -= 1
+
+    def respond(self, request):
+        if self.statuses.get(request.path):
+            return web.Response(status=self.statuses[request.path].pop(0))
+        body = self.page(request.path)
+        if body is None:
+            return web.Response(status=404, text="Not found")
+        etag = '"' + hashlib.sha1(body.encode("utf-8")).hexdigest()[:16] + '"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.Response(text=body, content_type="text/html", headers={"ETag": etag})
+
+    def paths(self):
+        return [entry["path"] for entry in self.requests]
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/{tail:.*}", self.handle)
+        self.runner = web.AppRunner(app)
+        await self.runner.setup()
+        site = web.TCPSite(self.runner, "127.0.0.1", self.port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        for gate in self.gates.values():
+            gate.set()
+        await self.runner.cleanup()
+
+
+def fetch_urls(crawler_kwargs, paths, site=None):
+    """Fetch paths of a stand-in site concurrently; returns the site and the responses."""
+    site = site or StandInSite()
+
+    async def scenario():
+        async with site, Crawler(**crawler_kwargs) as crawler:
+            responses = await crawler.fetch_all([site.url + path for path in paths])
+        return responses
+
+    return site, asyncio.run(scenario())
+
+
+def test_per_host_concurrency_limit():
+    site, responses = fetch_urls({"per_host": 3, "rate_per_host": 0},
+                                 [f"/web/result/project/p{i}/en" for i in range(12)], StandInSite(delay=0.05))
+    assert all(response.ok for response in responses)
+    assert site.max_active == 3
+
+
+def test_total_concurrency_limit():
+    site, _ = fetch_urls({"concurrency": 2, "per_host": 8, "rate_per_host": 0},
+                         [f"/web/result/project/p{i}/en" for i in range(8)], StandInSite(delay=0.05))
+    assert site.max_active == 2
+
+
+def test_rate_limit_spaces_request_starts():
+    site, _ = fetch_urls({"per_host": 8, "rate_per_host": 20}, [f"/web/result/project/p{i}/en" for i in range(6)])
+    starts = sorted(entry["started"] for entry in site.requests)
+    gaps = [later - earlier for earlier, later in zip(starts, starts[1:])]
+    # 20 requests per second: starts at least 50 ms apart, less scheduling jitter
+    assert min(gaps) >= 0.04
+    assert starts[-1] - starts[0] >= 0.2
+
+
+def test_transient_errors_are_retried():
+    path = "/web/result/project/flaky/en"
+    site = StandInSite()
+    site.statuses[path] = [503, 502]
+
+    async def scenario():
+        async with site, Crawler(retries=3, backoff=0.01) as crawler:
+            return await crawler.fetch(site.url + path), crawler.stats
+
+    response, stats = asyncio.run(scenario())
+    assert response.status == 200
+    assert "dendritic cell vaccines" in response.text
+    assert stats["retries"] == 2
+    assert site.paths() == [path] * 3
+
+
+def test_missing_page_is_returned_not_retried():
+    site, responses = fetch_urls({"retries": 3, "backoff": 0.01}, ["/nothing/here"])
+    assert responses[0].status == 404
+    assert len(site.requests) == 1
+
+
+def test_concurrent_fetches_of_a_url_share_one_request():
+    path = "/web/result/project/shared/en"
+    site, responses = fetch_urls({}, [path] * 5, StandInSite(delay=0.05))
+    assert len({response.text for response in responses}) == 1
+    assert site.paths() == [path]
+
+
+def cached_fetch(site, cache_path, path, max_age):
+    """Fetch a path through an HttpCache in a new crawler; returns the response and cache stats."""
+    async def scenario():
+        cache = HttpCache(cache_path, policies=[(r".", max_age)])
+        try:
+            async with Crawler(cache=cache) as crawler:
+                response = await crawler.fetch(site.url + path)
+            return response, dict(cache.stats)
+        finally:
+            cache.close()
+
+    return asyncio.run(scenario())
+
+
+def run_with_site(site, function):
+    async def scenario():
+        async with site:
+            return await asyncio.to_thread(function)
+
+    return asyncio.run(scenario())
+
+
+def test_cache_revalidates_stale_page_with_304(tmp_path):
+    site = StandInSite()
+    path = "/en/jane-doe"
+    cache_path = str(tmp_path / "http_cache.sqlite3")
+
+    def fetch_twice():
+        # Max-age 0: every later fetch revalidates; the second crawler reopens the SQLite file
+        return cached_fetch(site, cache_path, path, 0), cached_fetch(site, cache_path, path, 0)
+
+    (first, first_stats), (second, second_stats) = run_with_site(site, fetch_twice)
+    assert first_stats["misses"] == 1
+    assert [entry["status"] for entry in site.requests] == [200, 304]
+    assert site.requests[1]["if_none_match"] is not None
+    assert second.status == 200
+    assert second.text == first.text
+    assert second_stats["revalidated"] == 1
+    assert second_stats["bytes_saved"] == len(first.text.encode("utf-8"))
+
+
+def test_cache_serves_fresh_page_without_request(tmp_path):
+    site = StandInSite()
+    path = "/en/jane-doe"
+    cache_path = str(tmp_path / "http_cache.sqlite3")
+
+    def fetch_twice():
+        return cached_fetch(site, cache_path, path, 3600), cached_fetch(site, cache_path, path, 3600)
+
+    (first, _), (second, stats) = run_with_site(site, fetch_twice)
+    assert len(site.requests) == 1
+    assert second.text == first.text
+    assert stats["fresh_hits"] == 1
+
+
+def test_cache_replaces_changed_page(tmp_path):
+    site = StandInSite()
+    path = "/en/jane-doe"
+    cache_path = str(tmp_path / "http_cache.sqlite3")
+
+    def fetch_changed():
+        cached_fetch(site, cache_path, path, 0)
+        site.bodies[path] = "<html><body>Updated profile</body></html>"
+        changed, _ = cached_fetch(site, cache_path, path, 0)
+        # The new page and its ETag are stored, so the next fetch revalidates it
+        again, stats = cached_fetch(site, cache_path, path, 0)
+        return changed, again, stats
+
+    changed, again, stats = run_with_site(site, fetch_changed)
+    assert [entry["status"] for entry in site.requests] == [200, 200, 304]
+    assert "Updated profile" in changed.text
+    assert again.text == changed.text
+    assert stats["revalidated"] == 1
+
+
+def point_pipeline_at(site, monkeypatch):
+    monkeypatch.setattr(pipeline, "CRIG_MEMBERS_URL", site.url + "/en/all-crig-group-leaders-and-members")
+    monkeypatch.setattr(parsers, "CRIG_BASE_URL", site.url)
+    monkeypatch.setattr(parsers, "RESEARCH_BASE_URL", site.url)
+    monkeypatch.setattr(pipeline, "get_research_profile_url",
+                        lambda name: f"{site.url}/web/person/{name.lower().replace(' ', '-')}-0/en")
+
+
+def test_pipeline_resumes_from_checkpoint_after_interrupted_run(tmp_path, monkeypatch):
+    jsonl_path = str(tmp_path / "researchers.jsonl")
+    output_path = str(tmp_path / "researchers.json")
+    interrupted = "/web/person/john-smith-0/en"
+
+    first_site = StandInSite()
+
+    async def interrupted_run():
+        site = first_site
+        # John Smith's research profile never answers: the run is stopped while it waits
+        site.gates[interrupted] = asyncio.Event()
+        async with site, Crawler(retries=0, rate_per_host=0) as crawler:
+            point_pipeline_at(site, monkeypatch)
+            checkpoint = JsonlCheckpoint(jsonl_path)
+            run = asyncio.ensure_future(pipeline.ScrapePipeline(crawler, checkpoint, workers=3).run())
+            deadline = time.monotonic() + 10
+            while len(checkpoint.done) < 2 and time.monotonic() < deadline:
+                await asyncio.sleep(0.01)
+            run.cancel()
+        return checkpoint.done
+
+    done = asyncio.run(interrupted_run())
+    assert done == {f"{first_site.url}/en/jane-doe", f"{first_site.url}/en/ann-peeters"}
+
+    async def resumed_run():
+        # The same site again, so the researchers have the same URLs
+        site = StandInSite(port=first_site.port)
+        async with site, Crawler(retries=0, rate_per_host=0) as crawler:
+            point_pipeline_at(site, monkeypatch)
+            checkpoint = JsonlCheckpoint(jsonl_path)
+            researchers = await pipeline.ScrapePipeline(crawler, checkpoint, workers=3).run()
+        return site, checkpoint, researchers
+
+    site, checkpoint, researchers = asyncio.run(resumed_run())
+    person_paths = [path for path in site.paths() if path.startswith(("/en/", "/web/person/"))]
+    assert person_paths and all("john-smith" in path or "all-crig" in path for path in person_paths)
+    assert all(checkpoint.is_done(researcher["profile_url"]) for researcher in researchers)
+
+    order = [researcher["profile_url"] for researcher in researchers]
+    assert checkpoint.compact(output_path, key="profile_url", order=order) == 3
+    with open(output_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    assert [record["name"] for record in records] == ["Jane Doe", "John Smith", "Ann Peeters"]
+    for record in records:
+        assert record["research_focus"] == "Harnessing dendritic cells to improve cancer immunotherapy."
+        assert record["expertise"] == ["tumour immunology", "vaccines"]
+        assert record["orcid"] == "0000-0002-1825-0097"
+        assert [project["title"] for project in record["projects"]["promotor"]] == [
+            "Dendritic cell vaccines against melanoma", "Immune profiling of solid tumours"]
+        assert record["projects"]["promotor"][0]["keywords"] == ["melanoma", "vaccination"]
+
+
+def test_checkpoint_ignores_truncated_last_record(tmp_path):
+    checkpoint = JsonlCheckpoint(str(tmp_path / "researchers.jsonl"))
+    checkpoint.write({"profile_url": "a", "name": "A"}, "a")
+    checkpoint.write({"profile_url": "b", "name": "B"}, "b")
+    # A run killed while appending leaves half a line behind
+    with open(checkpoint.jsonl_path, "a", encoding="utf-8") as f:
+        f.write('{"profile_url": "c", "na')
+
+    resumed = JsonlCheckpoint(checkpoint.jsonl_path)
+    assert resumed.done == {"a", "b"}
+    resumed.write({"profile_url": "c", "name": "C"}, "c")
+    output_path = str(tmp_path / "researchers.json")
+    assert resumed.compact(output_path, key="profile_url") == 3
+    with open(output_path, "r", encoding="utf-8") as f:
+        assert [record["name"] for record in json.load(f)] == ["A", "B", "C"]
+
+
+def run_pipeline(site, jsonl_path, monkeypatch, workers=3):
+    async def scenario():
+        async with site, Crawler(retries=0, rate_per_host=0) as crawler:
+            point_pipeline_at(site, monkeypatch)
+            checkpoint = JsonlCheckpoint(jsonl_path)
+            # A worker that died would leave the run waiting forever
+            researchers = await asyncio.wait_for(pipeline.ScrapePipeline(crawler, checkpoint, workers=workers).run(), 10)
+        return checkpoint, researchers
+
+    return asyncio.run(scenario())
+
+
+def test_failed_project_page_is_retried_on_resume(tmp_path, monkeypatch):
+    jsonl_path = str(tmp_path / "researchers.jsonl")
+    site = StandInSite()
+    # The project page every researcher shares fails once
+    site.statuses["/web/result/project/a1b2c3/en"] = [500]
+    checkpoint, researchers = run_pipeline(site, jsonl_path, monkeypatch)
+    assert len(researchers) == 3
+    assert checkpoint.done == set()
+
+    resumed, researchers = run_pipeline(StandInSite(port=site.port), jsonl_path, monkeypatch)
+    assert all(resumed.is_done(researcher["profile_url"]) for researcher in researchers)
+
+
+def test_unexpected_error_fails_the_researcher_not_the_worker(tmp_path, monkeypatch):
+    calls = []
+
+    def parse_researcher_details(html):
+        calls.append(html)
+        if len(calls) == 1:
+            raise ValueError("unexpected page layout")
+        return parsers.parse_researcher_details(html)
+
+    monkeypatch.setattr(pipeline, "parse_researcher_details", parse_researcher_details)
+    # One worker: if the error killed it, nobody would process the other researchers
+    checkpoint, researchers = run_pipeline(StandInSite(), str(tmp_path / "researchers.jsonl"), monkeypatch, workers=1)
+    assert len(checkpoint.done) == 2
+    failed = [researcher for researcher in researchers if not checkpoint.is_done(researcher["profile_url"])]
+    assert [researcher["name"] for researcher in failed] == ["Jane Doe"]
+    with open(checkpoint.jsonl_path, "r", encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
@@ -0,0 +1,64 @@
+"""Conversation sessions shared between processes through SQLite."""
+import os
+import time
+
+import pytest
+
+from sessions import SessionStore
+
+
+def test_session_is_shared_between_processes(tmp_path):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"))
+    store.get("conversation")
+
+    pid = os.fork()
+    if pid == 0:
+        # A different worker answers the first question
+        try:
+            session = store.get("conversation")
+            store.add_turn(session, "who works on vaccines?", ["a", "b"], {"a": True, "b": False})
+        finally:
+            os._exit(0)
+    os.waitpid(pid, 0)
+
+    session = store.get("conversation")
+    assert session.last_turn().question == "who works on vaccines?"
+    assert session.is_follow_up("which of those has worked on zebrafish?")
+    assert session.cached_verdict("Who works on  vaccines?", "b") is False
+
+
+def test_add_turn_keeps_turns_added_elsewhere(tmp_path):
+    path = str(tmp_path / "sessions.sqlite3")
+    first, second = SessionStore(path, max_turns=2), SessionStore(path, max_turns=2)
+    stale = first.get("conversation")
+    second.add_turn(second.get("conversation"), "q1", [], {})
+    first.add_turn(stale, "q2", [], {})
+    first.add_turn(stale, "q3", [], {})
+    assert [turn.question for turn in second.get("conversation").turns] == ["q2", "q3"]
+
+
+def test_idle_sessions_expire(tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"), ttl_seconds=60)
+    store.add_turn(store.get("conversation"), "q1", ["a"], {"a": True})
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 61)
+    assert store.get("conversation").last_turn() is None
+    assert store.stats()["evicted_expired"] == 1
+
+
+def test_least_recently_used_sessions_are_dropped(tmp_path, monkeypatch):
+    store = SessionStore(str(tmp_path / "sessions.sqlite3"), max_sessions=2)
+    clock = iter(range(1000, 2000))
+    monkeypatch.setattr(time, "time", lambda: next(clock))
+    for session_id in ("a", "b", "a", "c"):
+        store.add_turn(store.get(session_id), "q", [], {})
+    stats = store.stats()
+    assert stats["active"] == 2
+    assert stats["evicted_lru"] == 1
+    assert store.get("a").last_turn() is not None
+
+
+@pytest.mark.parametrize("session_id", [5, None, {"id": "a"}, "", "a b", "x" * 65])
+def test_invalid_session_ids(tmp_path, session_id):
+    with pytest.raises(ValueError):
+        SessionStore(str(tmp_path / "sessions.sqlite3")).get(session_id)
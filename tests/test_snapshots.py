@@ -0,0 +1,72 @@
+"""Snapshot versions and the retirement time shared by the engine and gc."""
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+import pytest
+
+import rag_profiles
+import snapshots
+
+
+def build(root, json_path):
+    return snapshots.build_snapshot(str(root), str(json_path), lambda profiles_path, chroma_dir: {})
+
+
+@pytest.fixture
+def profiles(tmp_path):
+    path = tmp_path / "profiles.json"
+    path.write_text(json.dumps([{"name": "A"}]), encoding="utf-8")
+    return path
+
+
+def test_builds_within_one_second_get_their_own_version(tmp_path, profiles):
+    versions = [build(tmp_path / "snapshots", profiles) for _ in range(3)]
+    assert len(set(versions)) == 3
+    assert snapshots.list_snapshots(str(tmp_path / "snapshots")) == versions
+
+
+def test_build_never_reuses_a_version(tmp_path, profiles, monkeypatch):
+    created = datetime(2024, 5, 1, 12, 0, 0, tzinfo=timezone.utc)
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return created
+
+    monkeypatch.setattr(snapshots, "datetime", FrozenDatetime)
+    build(tmp_path / "snapshots", profiles)
+    with pytest.raises(FileExistsError):
+        build(tmp_path / "snapshots", profiles)
+
+
+class FakeIndex:
+    def __init__(self, version):
+        self.version = version
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def test_retired_index_is_closed_with_its_snapshot(tmp_path, profiles, monkeypatch):
+    root = tmp_path / "snapshots"
+    first, second = build(root, profiles), build(root, profiles)
+    monkeypatch.setattr(rag_profiles, "SNAPSHOTS_DIR", str(root))
+    monkeypatch.setattr(rag_profiles, "load_index", lambda embeddings, version=None: FakeIndex(version))
+    engine = object.__new__(rag_profiles.RAGQueryEngine)
+    engine.embeddings, engine.shards, engine.index = None, [], FakeIndex(first)
+    engine._swap_lock, engine._retired_indexes = threading.Lock(), []
+
+    snapshots.activate(str(root), first)
+    snapshots.activate(str(root), second)
+    activated_at = snapshots.activation_time(str(root), second)
+    # The worker swaps a while after the activation, as its watcher does
+    monkeypatch.setattr(time, "time", lambda: activated_at + 5)
+    engine.swap_index()
+    old = engine._retired_indexes[0][1]
+
+    monkeypatch.setattr(time, "time", lambda: activated_at + rag_profiles.SNAPSHOT_GRACE_SECONDS)
+    assert engine.collect_garbage() == [first]
+    assert old.closed